@@ -4,16 +4,27 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional
+import os
+import time
 
-from database import get_db
+from cache import TTLCache
+from database import get_async_db
+from http_cache import bump_data_version
 from models import User
+from workers import worker_pool
 
 # Configurações
 SECRET_KEY = "sua_chave_secreta_super_segura"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+# Custo do bcrypt (log2 das iterações); hashes abaixo disso são atualizados no login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
 # Schemas
 class Token(BaseModel):
@@ -27,20 +38,63 @@ class UserCreate(BaseModel):
     username: str
     password: str
 
+class AuthenticatedUser(BaseModel):
+    """Snapshot imutável do usuário autenticado, seguro para cache entre requests."""
+    id: int
+    username: str
+    email: Optional[str] = None
+    is_active: bool = True
+
+    class Config:
+        from_attributes = True
+        frozen = True
+
 # Utilitários
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Caches por processo: token -> (username, exp) (evita jwt.decode) e username -> usuário
+# (evita a consulta ao banco). O TTL limita por quanto tempo outro worker pode
+# enxergar um usuário desativado.
+token_cache = TTLCache("auth_tokens", maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+user_cache = TTLCache("auth_users", maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not verify_password(password, user.hashed_password):
+async def hash_password(password: str) -> str:
+    """get_password_hash fora do event loop, no pool de hashing."""
+    return await worker_pool.run_hash(get_password_hash, password)
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    """Verifica a senha no pool de hashing e atualiza hashes com custo antigo.
+
+    A conexão volta ao pool antes do bcrypt, para que um pico de logins não
+    esgote as conexões do banco.
+    """
+    user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
+    if not user:
         return False
+    db.expunge(user)
+    await db.rollback()
+
+    verified, new_hash = await worker_pool.run_hash(
+        pwd_context.verify_and_update, password, user.hashed_password
+    )
+    if not verified:
+        return False
+    if new_hash is not None:
+        await db.execute(update(User).where(User.id == user.id).values(hashed_password=new_hash))
+        await db.commit()
+        user.hashed_password = new_hash
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -53,22 +107,54 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _decode_token(token: str) -> Optional[tuple]:
+    """(username, expiração) do token, ou None se inválido."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    username: str = payload.get("sub")
+    if username is None:
+        return None
+    return username, payload.get("exp")
+
+async def _load_user(db: AsyncSession, username: str) -> Optional[AuthenticatedUser]:
+    user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
+    if user is None:
+        return None
+    return AuthenticatedUser.model_validate(user)
+
+def invalidate_user(username: str):
+    """Remove o usuário do cache (ex.: após desativação ou alteração)."""
+    user_cache.pop(username)
+
+def deactivate_user(db: Session, username: str):
+    db.query(User).filter(User.username == username).update({User.is_active: False})
+    user_id = db.query(User.id).filter(User.username == username).scalar()
+    if user_id is not None:
+        bump_data_version(db, user_id)
+    db.commit()
+    invalidate_user(username)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
+    decoded = token_cache.get_or_load(token, lambda: _decode_token(token))
+    if decoded is None:
         raise credentials_exception
+    username, expires_at = decoded
+    # Entradas em cache podem sobreviver ao JWT: revalida a expiração
+    if expires_at is not None and expires_at < time.time():
+        token_cache.pop(token)
+        raise credentials_exception
+    token_data = TokenData(username=username)
     
-    user = db.query(User).filter(User.username == token_data.username).first()
+    user = await user_cache.get_or_load_async(token_data.username, lambda: _load_user(db, token_data.username))
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+    return user
@@ -0,0 +1,925 @@
+"""Benchmarks de performance do backend.
+
+Uso:
+    python benchmark.py records [--file uploads/1.fit] [--repeat 3]
+    python benchmark.py upload-load [--uploads 8] [--probes 50]
+    python benchmark.py listing [--workouts 100000] [--page-size 50]
+    python benchmark.py ingest-memory [--size-mb 50] [--max-peak-mb 8] [--max-rss-mb 400]
+    python benchmark.py summary [--file uploads/1.fit] [--repeat 3]
+    python benchmark.py login-load [--logins 32] [--probes 50]
+    python benchmark.py curves [--duration 14400] [--repeat 3]
+    python benchmark.py compare [--workouts 50] [--duration 3600]
+    python benchmark.py startup [--budget-ms 1500]
+    python benchmark.py concurrency [--uploads 16] [--readers 8] [--requests 50]
+    python benchmark.py parse [--duration 14400] [--interval 1] [--channels gps,heart_rate]
+    python benchmark.py upload [--uploads 10] [--duration 7200]
+    python benchmark.py report [--workouts 5] [--duration 3600]
+    python benchmark.py export [--workouts 50000] [--max-peak-mb 16]
+    python benchmark.py suite [--output run.json] [--baseline baseline.json] [--tolerance 0.25]
+
+Os arquivos .FIT de teste são gerados por ``synthetic_fit.py``. Para
+acompanhar regressões, grave uma execução de referência com
+``suite --output baseline.json`` e compare as seguintes com
+``suite --baseline baseline.json`` (sai com erro se alguma métrica piorar
+mais que a tolerância).
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import fitparse
+
+import fit_parser
+from fit_parser import FITParser
+
+DEFAULT_FIT_FILE = str(Path(__file__).parent / "uploads" / "1.fit")
+
+
+def _measure(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Best wall time over ``repeat`` runs plus retained/peak traced memory."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = func()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    return {
+        'best_seconds': min(timings),
+        'retained_mb': retained / 2**20,
+        'peak_mb': peak / 2**20
+    }
+
+
+def bench_records(args) -> Dict[str, Any]:
+    """Compare list-of-dicts record output against columnar RecordStreams."""
+    parser = FITParser()
+    fitfile = fitparse.FitFile(args.file)
+    fitfile.parse()
+
+    results = {
+        'file': args.file,
+        'conversion': {
+            'dicts': _measure(lambda: parser._process_records(fitfile.get_messages("record")), args.repeat),
+            'columnar': _measure(lambda: parser._process_records_columnar(fitfile.get_messages("record")),
+                                 args.repeat)
+        },
+        'full_parse': {
+            'dicts': _measure(lambda: parser.parse(args.file), 1),
+            'columnar': _measure(lambda: parser.parse(args.file, columnar=True), args.repeat)
+        }
+    }
+    fit_parser.FAST_RECORD_DECODER = False
+    try:
+        results['full_parse']['columnar_fitparse'] = _measure(lambda: parser.parse(args.file, columnar=True), 1)
+    finally:
+        fit_parser.FAST_RECORD_DECODER = True
+    records = len(parser._process_records_columnar(fitfile.get_messages("record")))
+    results['records'] = records
+    results['records_per_second'] = {
+        name: records / timing['best_seconds'] for name, timing in results['full_parse'].items()
+    }
+    return results
+
+
+def _percentiles(samples) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        'p50_ms': 1000 * ordered[len(ordered) // 2],
+        'p95_ms': 1000 * ordered[int(len(ordered) * 0.95) - 1],
+        'max_ms': 1000 * ordered[-1],
+        'mean_ms': 1000 * statistics.mean(ordered)
+    }
+
+
+async def _probe_listing(client, headers, probes: int, path: str = "/workouts/"):
+    latencies = []
+    for _ in range(probes):
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def _upload_load(args) -> Dict[str, Any]:
+    import httpx
+    from main import app, init_db
+
+    # ASGITransport não dispara os eventos de startup
+    init_db()
+
+    with open(args.file, 'rb') as f:
+        contents = f.read()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/register", json={"username": "bench", "password": "bench-password"})
+        token = (await client.post("/token", data={"username": "bench", "password": "bench-password"})).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+        idle = await _probe_listing(client, headers, args.probes)
+
+        uploads = [
+            client.post("/upload-workout/", headers=headers,
+                        files={"file": (f"bench-{i}.fit", contents)})
+            for i in range(args.uploads)
+        ]
+        probe = asyncio.ensure_future(_probe_listing(client, headers, args.probes))
+        responses = await asyncio.gather(*uploads)
+        loaded = await probe
+
+    return {
+        'uploads': args.uploads,
+        'upload_status': [r.status_code for r in responses],
+        'listing_idle': _percentiles(idle),
+        'listing_during_uploads': _percentiles(loaded)
+    }
+
+
+def bench_upload_load(args) -> Dict[str, Any]:
+    """/workouts/ latency with and without uploads in flight."""
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    return asyncio.run(_upload_load(args))
+
+
+def _seed_workouts(user_id: int, count: int, raw_bytes: int):
+    """Insert ``count`` synthetic workouts in a single transaction."""
+    from datetime import datetime, timedelta
+    from database import engine
+    from models import Workout
+
+    raw_data = json.dumps({'metadata': {'padding': 'x' * raw_bytes}})
+    base = datetime(2015, 1, 1)
+    activities = ['running', 'cycling', 'swimming', 'walking']
+    rows = [
+        {
+            'user_id': user_id,
+            'filename': f"seed-{i}.fit",
+            'activity_type': activities[i % len(activities)],
+            'start_time': base + timedelta(hours=2 * i),
+            'duration': 3600.0,
+            'distance': 10000.0 + i % 5000,
+            'calories': 600,
+            'raw_data': raw_data,
+            'processed': True
+        }
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Workout.__table__.insert(), rows)
+
+
+def bench_listing(args) -> Dict[str, Any]:
+    """Full-row listing (legacy query) vs keyset-paginated /workouts/."""
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    from fastapi.testclient import TestClient
+    from auth import create_access_token, get_password_hash
+    from database import SessionLocal
+    from main import app, init_db
+    from models import User, Workout
+
+    init_db()
+    db = SessionLocal()
+    user = User(username="bench", hashed_password=get_password_hash("bench-password"))
+    db.add(user)
+    db.commit()
+    _seed_workouts(user.id, args.workouts, args.raw_bytes)
+
+    start = time.perf_counter()
+    legacy = db.query(Workout).filter(Workout.user_id == user.id).all()
+    legacy_seconds = time.perf_counter() - start
+    del legacy
+    db.close()
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench'})}"}
+    pages = []
+    params = {"limit": args.page_size}
+    while len(pages) < args.pages:
+        start = time.perf_counter()
+        response = client.get("/workouts/", headers=headers, params=params)
+        response.raise_for_status()
+        pages.append(time.perf_counter() - start)
+        params["cursor"] = response.headers.get("X-Next-Cursor")
+        if not params["cursor"]:
+            break
+
+    return {
+        'workouts': args.workouts,
+        'legacy_full_load_seconds': legacy_seconds,
+        'page_size': args.page_size,
+        'paginated': _percentiles(pages)
+    }
+
+
+# Ingestão completa (gravação, parse e persistência) em um interpretador limpo;
+# imprime o RSS antes e o pico depois de cada etapa, em MB
+_INGEST_RSS_SCRIPT = """
+import json, resource, sys
+from migrations import init_schema
+from database import SessionLocal
+from fit_parser import parse_fit_file
+from ingest import store_workout
+from models import User
+from utils import save_stream
+
+def peak():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def current():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+
+init_schema()
+db = SessionLocal()
+user = User(username='memoria', hashed_password='-', is_active=True)
+db.add(user)
+db.commit()
+user_id = user.id
+db.close()
+
+result = {'baseline': current()}
+with open(sys.argv[1], 'rb') as f:
+    path, content_hash = save_stream(f)
+result['save'] = peak()
+workout_data = parse_fit_file(str(path), content_hash)
+result['parse'] = peak()
+store_workout(user_id, 'synthetic.fit', content_hash, workout_data)
+result['store'] = peak()
+result['records'] = len(workout_data['records'])
+print(json.dumps(result))
+"""
+
+# Teto do crescimento do RSS na ingestão completa de um arquivo de 50 MB
+INGEST_MAX_RSS_MB = float(os.getenv("INGEST_MAX_RSS_MB", "400"))
+
+
+def measure_ingest_rss(source: Path, workdir: Path) -> Dict[str, float]:
+    """Peak RSS of saving, parsing and storing ``source`` in a fresh process.
+
+    Runs against its own database, upload dir and parse cache under
+    ``workdir``. ``peak_growth_mb`` is the high-water mark above the RSS
+    right before the upload, so interpreter and import costs don't count.
+    """
+    workdir.mkdir(parents=True, exist_ok=True)
+    env = {
+        **os.environ,
+        'DATABASE_URL': f"sqlite:///{workdir / 'ingest.db'}",
+        'UPLOAD_DIR': str(workdir / 'uploads'),
+        'PARSE_CACHE_DIR': str(workdir / 'parse'),
+        'PYTHONWARNINGS': 'ignore',
+    }
+    proc = subprocess.run([sys.executable, '-c', _INGEST_RSS_SCRIPT, str(source)], cwd=Path(__file__).parent,
+                          env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Ingestão falhou:\n{proc.stderr}")
+    stages = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {
+        'records': stages['records'],
+        'baseline_mb': stages['baseline'],
+        'peak_mb': {stage: stages[stage] for stage in ('save', 'parse', 'store')},
+        'peak_growth_mb': stages['store'] - stages['baseline']
+    }
+
+
+def bench_ingest_memory(args) -> Dict[str, Any]:
+    """Memory of ingesting a large synthetic upload.
+
+    Measures the traced peak while streaming the upload to disk, then the
+    peak RSS of the whole ingest (save, parse, store) in a fresh process.
+    Exits with an error when either exceeds ``--max-peak-mb`` /
+    ``--max-rss-mb``.
+    """
+    from starlette.datastructures import UploadFile
+    from synthetic_fit import write_activity
+    import utils
+
+    workdir = Path(tempfile.mkdtemp())
+    utils.UPLOAD_DIR = workdir / "uploads"
+    source = workdir / "synthetic.fit"
+    # ~25 bytes por record com todos os canais
+    write_activity(str(source), duration=args.size_mb * 2**20 // 25)
+    size_mb = source.stat().st_size / 2**20
+
+    async def ingest():
+        with open(source, 'rb') as f:
+            return await utils.save_upload(UploadFile(f, filename="synthetic.fit"))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    path, content_hash = asyncio.run(ingest())
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    full = measure_ingest_rss(source, workdir / "full")
+    full['seconds'] = time.perf_counter() - start
+
+    result = {
+        'file_mb': size_mb,
+        'ingest_seconds': seconds,
+        'peak_mb': peak / 2**20,
+        'max_peak_mb': args.max_peak_mb,
+        'content_hash': content_hash,
+        'full_ingest': full,
+        'max_rss_mb': args.max_rss_mb
+    }
+    if peak / 2**20 > args.max_peak_mb:
+        raise SystemExit(f"Pico de memória acima do limite: {json.dumps(result)}")
+    if full['peak_growth_mb'] > args.max_rss_mb:
+        raise SystemExit(f"RSS da ingestão completa acima do limite: {json.dumps(result)}")
+    return result
+
+
+def bench_summary(args) -> Dict[str, Any]:
+    """Summary-only scan vs full parse vs lazily iterating the record chunks."""
+    parser = FITParser()
+
+    def first_chunk():
+        return next(parser.iter_records(args.file))
+
+    summary = parser.parse_summary(args.file)
+    full = parser.parse(args.file, columnar=True)
+    mismatches = {
+        field: [summary['metadata'].get(field), full['metadata'].get(field)]
+        for field in parser.essential_fields['session']
+        if summary['metadata'].get(field) != full['metadata'].get(field)
+    }
+    return {
+        'file': args.file,
+        'summary_only': _measure(lambda: parser.parse_summary(args.file), args.repeat),
+        'first_record_chunk': _measure(first_chunk, args.repeat),
+        'full_parse': _measure(lambda: parser.parse(args.file, columnar=True), 1),
+        'summary_mismatches': mismatches
+    }
+
+
+async def _login_load(args) -> Dict[str, Any]:
+    import httpx
+    from main import app, init_db
+
+    init_db()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        credentials = {"username": "bench", "password": "bench-password"}
+        await client.post("/register", json=credentials)
+        token = (await client.post("/token", data=credentials)).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+        idle = await _probe_listing(client, headers, args.probes, "/users/me")
+
+        probe = asyncio.ensure_future(_probe_listing(client, headers, args.probes, "/users/me"))
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/token", data=credentials) for _ in range(args.logins)
+        ])
+        elapsed = time.perf_counter() - start
+        loaded = await probe
+
+    return {
+        'logins': args.logins,
+        'login_status': sorted({r.status_code for r in responses}),
+        'logins_per_second': args.logins / elapsed,
+        'me_idle': _percentiles(idle),
+        'me_during_logins': _percentiles(loaded)
+    }
+
+
+def bench_login_load(args) -> Dict[str, Any]:
+    """Concurrent-login throughput and /users/me latency during the burst."""
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    return asyncio.run(_login_load(args))
+
+
+def bench_curves(args) -> Dict[str, Any]:
+    """Cumulative-sum mean-max curve vs a sliding-window sum per duration."""
+    import numpy as np
+    from curves import CURVE_DURATIONS, compute_curves, mean_max, resample_1hz
+    from fit_parser import parse_fit_file
+    from synthetic_fit import write_activity
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "curves.fit")
+        write_activity(path, duration=args.duration)
+        streams = parse_fit_file(path)['records']
+
+    power = streams['power'].astype(np.float64)
+    grid = resample_1hz(streams['timestamp'], power, streams.valid('power'))
+
+    def naive():
+        return [
+            (d, float(np.lib.stride_tricks.sliding_window_view(grid, d).sum(axis=1).max() / d))
+            for d in CURVE_DURATIONS if d <= len(grid)
+        ]
+
+    vectorized = [(d, v) for d, v, _ in mean_max(grid)]
+    mismatches = [
+        d for (d, expected), (_, value) in zip(naive(), vectorized)
+        if abs(expected - value) > 1e-6 * max(1.0, abs(expected))
+    ]
+    return {
+        'samples': len(grid),
+        'durations': len(vectorized),
+        'naive': _measure(naive, args.repeat),
+        'cumsum': _measure(lambda: mean_max(grid), args.repeat),
+        'all_channels': _measure(lambda: compute_curves(streams), args.repeat),
+        'mismatches': mismatches
+    }
+
+
+def _synthetic_files(workdir: str, count: int, duration: int, prefix: str,
+                     interval: int = 1, channels=None) -> List[str]:
+    """``count`` distinct synthetic activities, one day apart."""
+    from datetime import datetime, timedelta, timezone
+    from synthetic_fit import DEFAULT_CHANNELS, write_activity
+
+    start = datetime(2025, 1, 1, 7, tzinfo=timezone.utc)
+    paths = []
+    for i in range(count):
+        path = os.path.join(workdir, f"{prefix}-{i}.fit")
+        write_activity(path, duration=duration, interval=interval, channels=channels or DEFAULT_CHANNELS,
+                       seed=i, start_time=start + timedelta(days=i))
+        paths.append(path)
+    return paths
+
+
+def _seed_synthetic(workdir: str, count: int, duration: int, prefix: str) -> List[int]:
+    """Parse and store ``count`` synthetic workouts for user 1; returns their ids."""
+    from fit_parser import parse_fit_file
+    from ingest import store_workout
+    from migrations import init_schema
+
+    init_schema()
+    return [
+        store_workout(1, os.path.basename(path), None, parse_fit_file(path)).id
+        for path in _synthetic_files(workdir, count, duration, prefix)
+    ]
+
+
+def bench_compare(args) -> Dict[str, Any]:
+    """Stream comparison of N workouts, cold (grids built) and warm (cached)."""
+    workdir = tempfile.mkdtemp()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{workdir}/bench.db")
+    from comparison import WorkoutComparator, grid_cache
+    from database import SessionLocal
+
+    ids = _seed_synthetic(workdir, args.workouts, args.duration, "compare")
+    db = SessionLocal()
+    try:
+        def compare():
+            return WorkoutComparator.compare_workouts(db, ids, axis=args.axis)
+
+        def cold():
+            grid_cache.clear()
+            return compare()
+
+        result = compare()
+        return {
+            'workouts': len(ids),
+            'splits': len(result['splits']['start']),
+            'cold': _measure(cold, args.repeat),
+            'warm': _measure(compare, args.repeat)
+        }
+    finally:
+        db.close()
+
+
+def bench_parse(args) -> Dict[str, Any]:
+    """Parser throughput (records/s) on a synthetic activity."""
+    from fit_parser import parse_fit_file_timed
+
+    workdir = tempfile.mkdtemp()
+    path, = _synthetic_files(workdir, 1, args.duration, "parse", args.interval, args.channels.split(','))
+    records = len(parse_fit_file_timed(path)[0]['records'])
+    runs = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        _, timings = parse_fit_file_timed(path)
+        runs.append((time.perf_counter() - start, timings))
+    seconds, timings = min(runs, key=lambda run: run[0])
+    return {
+        'records': records,
+        'file_mb': os.path.getsize(path) / 2**20,
+        'best_seconds': seconds,
+        'records_per_second': records / seconds,
+        'stages_seconds': timings
+    }
+
+
+async def _upload(args, paths: List[str]) -> Dict[str, Any]:
+    import httpx
+    from main import app, init_db
+
+    init_db()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        credentials = {"username": "bench", "password": "bench-password"}
+        await client.post("/register", json=credentials)
+        token = (await client.post("/token", data=credentials)).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+        latencies = []
+        # O primeiro upload inclui a criação do pool de processos e fica de fora
+        for i, path in enumerate(paths):
+            with open(path, 'rb') as f:
+                contents = f.read()
+            start = time.perf_counter()
+            response = await client.post("/upload-workout/", headers=headers,
+                                         files={"file": (os.path.basename(path), contents)})
+            response.raise_for_status()
+            if i > 0:
+                latencies.append(time.perf_counter() - start)
+
+    return {'uploads': len(latencies), 'duration': args.duration, 'latency': _percentiles(latencies)}
+
+
+def bench_upload(args) -> Dict[str, Any]:
+    """End-to-end latency of sequential uploads (save, parse, ingest, commit)."""
+    workdir = tempfile.mkdtemp()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{workdir}/bench.db")
+    os.environ.setdefault("UPLOAD_DIR", os.path.join(workdir, "uploads"))
+    # Sem cache de parse de execuções anteriores (os arquivos são determinísticos)
+    os.environ.setdefault("PARSE_CACHE_DIR", os.path.join(workdir, "parse-cache"))
+    paths = _synthetic_files(workdir, args.uploads + 1, args.duration, "upload")
+    return asyncio.run(_upload(args, paths))
+
+
+def bench_report(args) -> Dict[str, Any]:
+    """Cold PDF report generation for one workout and for N workouts."""
+    workdir = tempfile.mkdtemp()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{workdir}/bench.db")
+    os.environ.setdefault("REPORT_CACHE_DIR", os.path.join(workdir, "reports"))
+    import shutil
+    from reports import REPORT_CACHE_DIR, build_report
+    from workers import worker_pool
+
+    ids = _seed_synthetic(workdir, args.workouts, args.duration, "report")
+
+    def render(workout_ids):
+        def run():
+            shutil.rmtree(REPORT_CACHE_DIR, ignore_errors=True)
+            return asyncio.run(build_report(workout_ids, ''))
+        return run
+
+    try:
+        # Aquecimento: importa matplotlib/fpdf fora da medição
+        render(ids[:1])()
+        return {
+            'workouts': len(ids),
+            'single': _measure(render(ids[:1]), args.repeat),
+            'multi': _measure(render(ids), args.repeat),
+            'multi_pdf_kb': sum(p.stat().st_size for p in REPORT_CACHE_DIR.glob('*.pdf')) / 1024
+        }
+    finally:
+        worker_pool.shutdown()
+
+
+async def _concurrency(args, workdir: str) -> Dict[str, Any]:
+    import httpx
+    from datetime import datetime, timedelta, timezone
+    from database import engine
+    from main import app, init_db
+    from synthetic_fit import write_activity
+
+    init_db()
+    start_time = datetime(2025, 1, 1, 7, tzinfo=timezone.utc)
+    files = []
+    for i in range(args.uploads):
+        path = os.path.join(workdir, f"concurrency-{i}.fit")
+        write_activity(path, duration=args.duration, seed=i, start_time=start_time + timedelta(days=i))
+        with open(path, 'rb') as f:
+            files.append(f.read())
+
+    statuses: Dict[int, int] = {}
+    upload_latencies, read_latencies = [], []
+
+    async def timed(request, latencies):
+        start = time.perf_counter()
+        response = await request
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async def reader(client, headers):
+        for i in range(args.requests):
+            path = "/workouts/" if i % 2 == 0 else "/users/me"
+            await timed(client.get(path, headers=headers), read_latencies)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        credentials = {"username": "bench", "password": "bench-password"}
+        await client.post("/register", json=credentials)
+        token = (await client.post("/token", data=credentials)).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[timed(client.post("/upload-workout/", headers=headers,
+                                files={"file": (f"concurrency-{i}.fit", contents)}), upload_latencies)
+              for i, contents in enumerate(files)],
+            *[reader(client, headers) for _ in range(args.readers)]
+        )
+        elapsed = time.perf_counter() - start
+
+    with engine.connect() as connection:
+        journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar() \
+            if engine.url.get_backend_name() == 'sqlite' else None
+
+    return {
+        'database': engine.url.get_backend_name(),
+        'journal_mode': journal_mode,
+        'uploads': args.uploads,
+        'reads': len(read_latencies),
+        'status_codes': statuses,
+        'requests_per_second': (len(read_latencies) + len(upload_latencies)) / elapsed,
+        'uploads_latency': _percentiles(upload_latencies),
+        'reads_latency': _percentiles(read_latencies)
+    }
+
+
+def bench_concurrency(args) -> Dict[str, Any]:
+    """Concurrent uploads mixed with listings; 5xx means lock contention or pool exhaustion."""
+    workdir = tempfile.mkdtemp()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{workdir}/bench.db")
+    return asyncio.run(_concurrency(args, workdir))
+
+
+def bench_export(args) -> Dict[str, Any]:
+    """Peak traced memory of the streaming CSV export, for a tenth of the workouts and all of them.
+
+    Exits with an error when the full export's peak exceeds ``--max-peak-mb``.
+    """
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    from export import export_csv
+    from migrations import init_schema
+
+    init_schema()
+    _seed_workouts(1, args.workouts // 10, args.raw_bytes)
+    _seed_workouts(2, args.workouts, args.raw_bytes)
+
+    def measure(user_id: int) -> Dict[str, float]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = sum(len(chunk) for chunk in export_csv(user_id))
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {'export_mb': size / 2**20, 'seconds': seconds, 'peak_mb': peak / 2**20}
+
+    result = {
+        'workouts': args.workouts,
+        'small': measure(1),
+        'full': measure(2),
+        'max_peak_mb': args.max_peak_mb
+    }
+    if result['full']['peak_mb'] > args.max_peak_mb:
+        raise SystemExit(f"Pico de memória acima do limite: {json.dumps(result)}")
+    return result
+
+
+# Dependências pesadas que só devem ser importadas sob demanda
+LAZY_MODULES = ('fitparse', 'matplotlib', 'fpdf', 'pandas', 'pyarrow', 'aiosqlite')
+
+# Orçamento do `import main` a frio (também verificado em tests/test_startup.py)
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+
+
+def measure_import_main():
+    """``(ms, slowest top-level imports, LAZY_MODULES loaded)`` of one cold ``import main``."""
+    check = f"import sys, main; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', check],
+                          cwd=Path(__file__).parent, capture_output=True, text=True, check=True)
+    match = re.search(r'^import time:\s+\d+ \|\s+(\d+) \| main$', proc.stderr, re.MULTILINE)
+    slowest = sorted(
+        (int(m.group(1)) / 1000, m.group(2).strip())
+        for m in re.finditer(r'^import time:\s+\d+ \|\s+(\d+) \|( {3}\S+)$', proc.stderr, re.MULTILINE)
+    )[-5:]
+    loaded = proc.stdout.strip()
+    return (int(match.group(1)) / 1000, dict(reversed([(name, ms) for ms, name in slowest])),
+            loaded.split(',') if loaded else [])
+
+
+def bench_startup(args) -> Dict[str, Any]:
+    """Cold ``import main`` time (``-X importtime``) in a fresh interpreter.
+
+    Exits with an error when the import exceeds ``--budget-ms`` or pulls in
+    one of ``LAZY_MODULES``.
+    """
+    samples = [measure_import_main() for _ in range(args.repeat)]
+    import_ms, top_level, loaded = min(samples, key=lambda sample: sample[0])
+    result = {
+        'import_main_ms': import_ms,
+        'budget_ms': args.budget_ms,
+        'top_level_imports_ms': top_level,
+        'lazy_modules_loaded': loaded
+    }
+    if result['lazy_modules_loaded']:
+        raise SystemExit(f"Dependências pesadas importadas por main: {json.dumps(result)}")
+    if result['import_main_ms'] > args.budget_ms:
+        raise SystemExit(f"Import de main acima do orçamento: {json.dumps(result)}")
+    return result
+
+
+# Benchmarks da suíte: (nome, argumentos, {métrica: 'lower' | 'higher' é melhor})
+SUITE = [
+    ('parse', ['parse', '--duration', '14400'],
+     {'records_per_second': 'higher'}),
+    ('upload', ['upload', '--uploads', '10', '--duration', '7200'],
+     {'latency.p50_ms': 'lower', 'latency.p95_ms': 'lower'}),
+    ('listing', ['listing', '--workouts', '50000', '--pages', '50'],
+     {'paginated.p50_ms': 'lower', 'paginated.p95_ms': 'lower'}),
+    ('compare', ['compare', '--workouts', '20', '--duration', '3600'],
+     {'cold.best_seconds': 'lower', 'warm.best_seconds': 'lower'}),
+    ('report', ['report', '--workouts', '5', '--duration', '3600'],
+     {'single.best_seconds': 'lower', 'multi.best_seconds': 'lower'}),
+    ('startup', ['startup'],
+     {'import_main_ms': 'lower'}),
+]
+
+
+def _lookup(result: Dict[str, Any], path: str) -> float:
+    for key in path.split('.'):
+        result = result[key]
+    return float(result)
+
+
+def compare_to_baseline(metrics: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+                        tolerance: float) -> List[Dict[str, Any]]:
+    """Metrics worse than the baseline by more than ``tolerance`` (fração)."""
+    regressions = []
+    for name, metric in metrics.items():
+        if name not in baseline:
+            continue
+        previous = baseline[name]['value']
+        change = (metric['value'] - previous) / previous if previous else 0.0
+        worse = change > tolerance if metric['better'] == 'lower' else change < -tolerance
+        metric['baseline'] = previous
+        metric['change'] = change
+        if worse:
+            regressions.append({'metric': name, **metric})
+    return regressions
+
+
+def bench_suite(args) -> Dict[str, Any]:
+    """Run the suite, each benchmark in its own process (banco e caches isolados).
+
+    ``--output`` saves the results; ``--baseline`` compares against a saved
+    run and exits with an error when a metric regresses by more than
+    ``--tolerance``.
+    """
+    import platform
+
+    selected = set(args.only.split(',')) if args.only else None
+    results, metrics = {}, {}
+    for name, argv, tracked in SUITE:
+        if selected and name not in selected:
+            continue
+        print(f"[suite] {name}...", file=sys.stderr)
+        proc = subprocess.run([sys.executable, __file__, *argv], cwd=Path(__file__).parent,
+                              env={**os.environ, 'PYTHONWARNINGS': 'ignore'},
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise SystemExit(f"Benchmark '{name}' falhou:\n{proc.stderr}")
+        results[name] = json.loads(proc.stdout)
+        for path, better in tracked.items():
+            metrics[f"{name}.{path}"] = {'value': _lookup(results[name], path), 'better': better}
+
+    run = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'metrics': metrics,
+        'results': results
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(metrics, json.load(f)['metrics'], args.tolerance)
+        run['baseline'] = args.baseline
+        run['regressions'] = regressions
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(run, f, indent=2)
+    if regressions:
+        raise SystemExit(f"Regressões acima de {args.tolerance:.0%}: {json.dumps(regressions, indent=2)}")
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    records = subparsers.add_parser('records', help='dicts vs columnar record streams')
+    records.add_argument('--file', default=DEFAULT_FIT_FILE)
+    records.add_argument('--repeat', type=int, default=3)
+    records.set_defaults(func=bench_records)
+
+    load = subparsers.add_parser('upload-load', help='/workouts/ latency under upload load')
+    load.add_argument('--file', default=DEFAULT_FIT_FILE)
+    load.add_argument('--uploads', type=int, default=8)
+    load.add_argument('--probes', type=int, default=50)
+    load.set_defaults(func=bench_upload_load)
+
+    listing = subparsers.add_parser('listing', help='/workouts/ on a large seeded database')
+    listing.add_argument('--workouts', type=int, default=100000)
+    listing.add_argument('--raw-bytes', type=int, default=2048)
+    listing.add_argument('--page-size', type=int, default=50)
+    listing.add_argument('--pages', type=int, default=100)
+    listing.set_defaults(func=bench_listing)
+
+    ingest = subparsers.add_parser('ingest-memory', help='memory ceiling of streaming ingestion')
+    ingest.add_argument('--size-mb', type=int, default=50)
+    ingest.add_argument('--max-peak-mb', type=float, default=8)
+    ingest.add_argument('--max-rss-mb', type=float, default=INGEST_MAX_RSS_MB)
+    ingest.set_defaults(func=bench_ingest_memory)
+
+    summary = subparsers.add_parser('summary', help='summary-only vs full parse')
+    summary.add_argument('--file', default=DEFAULT_FIT_FILE)
+    summary.add_argument('--repeat', type=int, default=3)
+    summary.set_defaults(func=bench_summary)
+
+    login = subparsers.add_parser('login-load', help='concurrent logins vs other endpoints')
+    login.add_argument('--logins', type=int, default=32)
+    login.add_argument('--probes', type=int, default=50)
+    login.set_defaults(func=bench_login_load)
+
+    curves = subparsers.add_parser('curves', help='mean-max curve computation')
+    curves.add_argument('--duration', type=int, default=14400, help='segundos')
+    curves.add_argument('--repeat', type=int, default=3)
+    curves.set_defaults(func=bench_curves)
+
+    compare = subparsers.add_parser('compare', help='stream comparison of many workouts')
+    compare.add_argument('--workouts', type=int, default=50)
+    compare.add_argument('--duration', type=int, default=3600)
+    compare.add_argument('--axis', default='distance', choices=['distance', 'time'])
+    compare.add_argument('--repeat', type=int, default=3)
+    compare.set_defaults(func=bench_compare)
+
+    startup = subparsers.add_parser('startup', help='cold import time of the app')
+    startup.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS)
+    startup.add_argument('--repeat', type=int, default=3)
+    startup.set_defaults(func=bench_startup)
+
+    concurrency = subparsers.add_parser('concurrency', help='mixed uploads and listings')
+    concurrency.add_argument('--uploads', type=int, default=16)
+    concurrency.add_argument('--readers', type=int, default=8)
+    concurrency.add_argument('--requests', type=int, default=50, help='por leitor')
+    concurrency.add_argument('--duration', type=int, default=3600, help='segundos por upload')
+    concurrency.set_defaults(func=bench_concurrency)
+
+    parse = subparsers.add_parser('parse', help='parser throughput on a synthetic file')
+    parse.add_argument('--duration', type=int, default=14400, help='segundos')
+    parse.add_argument('--interval', type=int, default=1, help='segundos entre samples')
+    parse.add_argument('--channels', default='gps,heart_rate,power,cadence')
+    parse.add_argument('--repeat', type=int, default=3)
+    parse.set_defaults(func=bench_parse)
+
+    upload = subparsers.add_parser('upload', help='end-to-end upload latency')
+    upload.add_argument('--uploads', type=int, default=10)
+    upload.add_argument('--duration', type=int, default=7200, help='segundos')
+    upload.set_defaults(func=bench_upload)
+
+    report = subparsers.add_parser('report', help='cold PDF report generation')
+    report.add_argument('--workouts', type=int, default=5)
+    report.add_argument('--duration', type=int, default=3600, help='segundos')
+    report.add_argument('--repeat', type=int, default=3)
+    report.set_defaults(func=bench_report)
+
+    export = subparsers.add_parser('export', help='memory of the streaming CSV export')
+    export.add_argument('--workouts', type=int, default=50000)
+    export.add_argument('--raw-bytes', type=int, default=2048)
+    export.add_argument('--max-peak-mb', type=float, default=16)
+    export.set_defaults(func=bench_export)
+
+    suite = subparsers.add_parser('suite', help='benchmark suite with baseline comparison')
+    suite.add_argument('--output', help='grava os resultados em JSON')
+    suite.add_argument('--baseline', help='JSON de uma execução anterior')
+    suite.add_argument('--tolerance', type=float, default=0.25, help='piora máxima aceita (fração)')
+    suite.add_argument('--only', help='benchmarks separados por vírgula')
+    suite.set_defaults(func=bench_suite)
+
+    args = parser.parse_args()
+    print(json.dumps(args.func(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Importação em lote de arquivos .FIT a partir de um ZIP (ex.: export do Garmin).
+
+Uso:
+    python bulk_import.py export.zip --username ana [--workers 8] [--batch-size 100]
+
+Rodar de novo com o mesmo arquivo retoma a importação de onde parou.
+"""
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, Iterator, List, Optional, Tuple
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from ingest import add_workout, build_workout, find_duplicate
+from models import ImportItem, ImportJob, User
+from utils import UPLOAD_DIR, generate_file_hash, save_stream
+
+# Configurações
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "100"))
+IMPORT_DIR = UPLOAD_DIR / "imports"
+
+logger = logging.getLogger(__name__)
+
+# Jobs em execução neste processo (evita rodar o mesmo job duas vezes)
+_running_jobs = set()
+_running_lock = threading.Lock()
+
+
+def iter_fit_members(archive: zipfile.ZipFile, workdir: Path,
+                     prefix: str = '') -> Iterator[Tuple[str, Callable[[], IO[bytes]]]]:
+    """Yield ``(member_name, opener)`` for every .fit file in the archive.
+
+    Nested ZIPs (Garmin exports ship the uploaded files inside inner ZIPs)
+    are copied to ``workdir`` first, since seeking inside a compressed
+    member would re-decompress it on every backwards seek.
+    """
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        name = info.filename.lower()
+        if name.endswith('.fit'):
+            yield prefix + info.filename, (lambda info=info: archive.open(info))
+        elif name.endswith('.zip'):
+            fd, nested_path = tempfile.mkstemp(dir=workdir, suffix='.zip')
+            try:
+                with os.fdopen(fd, 'wb') as out, archive.open(info) as src:
+                    shutil.copyfileobj(src, out)
+                with zipfile.ZipFile(nested_path) as nested:
+                    yield from iter_fit_members(nested, workdir, f"{prefix}{info.filename}/")
+            finally:
+                os.unlink(nested_path)
+
+
+def is_import_running(job_id: int) -> bool:
+    with _running_lock:
+        return job_id in _running_jobs
+
+
+def create_or_resume_job(user_id: int, archive_path: str, archive_hash: str) -> Dict[str, Any]:
+    """Job de importação do arquivo; o mesmo arquivo reaproveita o job existente."""
+    db = SessionLocal()
+    try:
+        job = db.query(ImportJob).filter(
+            ImportJob.user_id == user_id,
+            ImportJob.archive_hash == archive_hash
+        ).first()
+        if job is None:
+            job = ImportJob(user_id=user_id, archive_path=archive_path,
+                            archive_hash=archive_hash, status='pending')
+            db.add(job)
+        else:
+            job.archive_path = archive_path
+        db.commit()
+        return {'id': job.id, 'status': job.status}
+    finally:
+        db.close()
+
+
+def import_status(db: Session, job_id: int, details: bool = False) -> Dict[str, Any]:
+    """Progresso do job: contagem por status e os arquivos com falha.
+
+    Com ``details=True`` lista todos os arquivos processados.
+    """
+    job = db.get(ImportJob, job_id)
+    counts = dict(
+        db.query(ImportItem.status, func.count(ImportItem.id))
+        .filter(ImportItem.job_id == job_id)
+        .group_by(ImportItem.status)
+        .all()
+    )
+    items = db.query(ImportItem).filter(ImportItem.job_id == job_id)
+    if not details:
+        items = items.filter(ImportItem.status == 'failed')
+    return {
+        'import_id': job.id,
+        'status': job.status,
+        'error': job.error,
+        'counts': {status: counts.get(status, 0) for status in ('done', 'duplicate', 'failed')},
+        'items': [
+            {'file': item.member_name, 'status': item.status,
+             'workout_id': item.workout_id, 'error': item.error}
+            for item in items.order_by(ImportItem.id)
+        ]
+    }
+
+
+def run_import(job_id: int, executor: Optional[Executor] = None, workers: Optional[int] = None,
+               batch_size: int = IMPORT_BATCH_SIZE) -> Dict[str, Any]:
+    """Import every .fit member not yet processed by this job.
+
+    Members are extracted one at a time to the content-addressed uploads
+    directory, parsed in parallel on ``executor`` (a process pool by
+    default) and written in transactions of ``batch_size`` workouts. Each
+    transaction also records the per-file outcome, so an interrupted
+    import resumes exactly after the last committed batch.
+    """
+    with _running_lock:
+        if job_id in _running_jobs:
+            raise RuntimeError(f"Importação {job_id} já em execução")
+        _running_jobs.add(job_id)
+
+    # fitparse só é necessário quando há importação
+    from fit_parser import parse_fit_file
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    # Limita quantos resultados de parse ficam em memória ao mesmo tempo
+    max_in_flight = 2 * (workers or os.cpu_count() or 2)
+
+    db = SessionLocal()
+    workdir = Path(tempfile.mkdtemp())
+    try:
+        job = db.get(ImportJob, job_id)
+        job.status = 'running'
+        job.error = None
+        db.commit()
+
+        processed = {
+            name for (name,) in db.query(ImportItem.member_name).filter(ImportItem.job_id == job_id)
+        }
+        seen: Dict[str, int] = {}
+        in_flight = deque()
+        batch: List[tuple] = []
+
+        def drain(limit: int):
+            while len(in_flight) > limit:
+                member_name, content_hash, future = in_flight.popleft()
+                try:
+                    batch.append((member_name, content_hash, future.result(), None))
+                except Exception as e:
+                    batch.append((member_name, content_hash, None, e))
+                if len(batch) >= batch_size:
+                    _write_batch(db, job, batch, seen)
+                    batch.clear()
+
+        with zipfile.ZipFile(job.archive_path) as archive:
+            for member_name, opener in iter_fit_members(archive, workdir):
+                if member_name in processed:
+                    continue
+                try:
+                    with opener() as member:
+                        path, content_hash = save_stream(member)
+                except Exception as e:
+                    batch.append((member_name, None, None, e))
+                    continue
+                in_flight.append((member_name, content_hash,
+                                  executor.submit(parse_fit_file, str(path), content_hash)))
+                drain(max_in_flight)
+            drain(0)
+
+        if batch:
+            _write_batch(db, job, batch, seen)
+        job.status = 'done'
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        return import_status(db, job_id)
+    except Exception as e:
+        db.rollback()
+        job = db.get(ImportJob, job_id)
+        job.status = 'failed'
+        job.error = str(e)[:1024]
+        db.commit()
+        raise
+    finally:
+        db.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+        if own_executor:
+            executor.shutdown()
+        with _running_lock:
+            _running_jobs.discard(job_id)
+
+
+def _write_batch(db: Session, job: ImportJob, batch: List[tuple], seen: Dict[str, int]):
+    """Commit a batch of parse results and their per-file outcomes together."""
+    try:
+        for entry in batch:
+            _add_item(db, job, seen, *entry)
+        db.commit()
+    except IntegrityError:
+        # Algum arquivo foi enviado em paralelo por outro caminho: refaz item a item
+        db.rollback()
+        seen.clear()
+        for entry in batch:
+            try:
+                _add_item(db, job, seen, *entry)
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                seen.pop(entry[1], None)
+                _add_item(db, job, seen, *entry)
+                db.commit()
+    logger.info(f"Importação {job.id}: lote de {len(batch)} arquivos gravado")
+
+
+def _add_item(db: Session, job: ImportJob, seen: Dict[str, int], member_name: str,
+              content_hash: Optional[str], workout_data: Optional[Dict[str, Any]],
+              error: Optional[Exception]):
+    item = ImportItem(job_id=job.id, member_name=member_name)
+    if error is not None:
+        item.status = 'failed'
+        item.error = str(error)[:1024]
+    else:
+        workout_id = seen.get(content_hash)
+        if workout_id is None:
+            existing = find_duplicate(db, job.user_id, content_hash)
+            workout_id = existing.id if existing else None
+        if workout_id is not None:
+            item.status = 'duplicate'
+        else:
+            workout = build_workout(job.user_id, os.path.basename(member_name), content_hash, workout_data)
+            workout_id = add_workout(db, workout, workout_data).id
+            item.status = 'done'
+        item.workout_id = workout_id
+        seen[content_hash] = workout_id
+    db.add(item)
+
+
+def main():
+    from migrations import init_schema
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('archive')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_schema()
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == args.username).first()
+        if user is None:
+            raise SystemExit(f"Usuário {args.username} não encontrado")
+        user_id = user.id
+    finally:
+        db.close()
+
+    archive_path = os.path.abspath(args.archive)
+    job = create_or_resume_job(user_id, archive_path, generate_file_hash(archive_path))
+    result = run_import(job['id'], workers=args.workers, batch_size=args.batch_size)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
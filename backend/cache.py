@@ -0,0 +1,185 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+import threading
+import time
+
+# Registro de caches nomeados, para expor estatísticas
+CACHES: Dict[str, 'TTLCache'] = {}
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss statistics.
+
+    Entries are evicted least-recently-used first once ``maxsize`` is
+    reached, and are dropped on access after their TTL.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+        CACHES[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def pop_matching(self, predicate: Callable[[Hashable], bool]):
+        """Remove every entry whose key satisfies ``predicate``."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any],
+                    ttl: Optional[float] = None) -> Any:
+        """Return the cached value or call ``loader``; ``None`` results are not cached."""
+        start = time.perf_counter()
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            self.hit_seconds += time.perf_counter() - start
+            return value
+
+        value = loader()
+        if value is not None:
+            self.set(key, value, ttl)
+        self.misses += 1
+        self.miss_seconds += time.perf_counter() - start
+        return value
+
+    async def get_or_load_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                                ttl: Optional[float] = None) -> Any:
+        """``get_or_load`` for an async loader (ex.: consulta com sessão async)."""
+        start = time.perf_counter()
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            self.hit_seconds += time.perf_counter() - start
+            return value
+
+        value = await loader()
+        if value is not None:
+            self.set(key, value, ttl)
+        self.misses += 1
+        self.miss_seconds += time.perf_counter() - start
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'avg_hit_ms': 1000 * self.hit_seconds / self.hits if self.hits else 0.0,
+            'avg_miss_ms': 1000 * self.miss_seconds / self.misses if self.misses else 0.0,
+        }
+
+
+class SizedLRUCache:
+    """Thread-safe LRU cache of ``bytes``-like values capped by total size.
+
+    Meant for serialized responses whose keys already carry a version, so
+    stale entries are never read and simply age out.
+    """
+
+    def __init__(self, name: str, max_bytes: int, maxsize: int = 100_000):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.maxsize = maxsize
+        self.bytes = 0
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        CACHES[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, size: int):
+        """Store ``value`` accounting ``size`` bytes; values larger than the cap are skipped."""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._data[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes or len(self._data) > self.maxsize:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.bytes -= evicted
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def pop_matching(self, predicate: Callable[[Hashable], bool]):
+        """Remove every entry whose key satisfies ``predicate``."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                self.bytes -= self._data.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: cache.stats() for name, cache in CACHES.items()}
@@ -1,51 +1,242 @@
-from typing import List, Dict, Any
-import pandas as pd
-from datetime import datetime
+from typing import List, Dict, Any, Optional
+import os
+
+import numpy as np
 from sqlalchemy.orm import Session
 
+from cache import SizedLRUCache
 from models import Workout
+from stream_store import read_streams
+
+# Eixos de alinhamento: passo da grade e tamanho padrão dos splits
+AXES = {
+    'distance': {'step': 10.0, 'split': 1000.0},  # metros
+    'time': {'step': 5.0, 'split': 600.0},        # segundos
+}
+
+GRID_CHANNELS = ('distance', 'speed', 'heart_rate', 'power')
+SUMMARY_FIELDS = ('distance', 'duration', 'avg_hr', 'max_hr', 'ascent', 'descent')
+
+# Configurações
+COMPARISON_CACHE_MB = float(os.getenv("COMPARISON_CACHE_MB", "128"))
+
+# Grades alinhadas por (workout_id, versão do parser, eixo, passo), limitadas
+# pelo tamanho dos arrays; reprocessar o workout muda a versão e a chave
+grid_cache = SizedLRUCache("comparison_grids", max_bytes=int(COMPARISON_CACHE_MB * 2**20))
+
+
+def _resample(x: np.ndarray, y: np.ndarray, valid: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """Linear interpolation of the valid samples onto ``grid``, NaN outside them."""
+    ok = valid & np.isfinite(y)
+    if ok.sum() < 2:
+        return np.full(len(grid), np.nan)
+    return np.interp(grid, x[ok], y[ok].astype(np.float64), left=np.nan, right=np.nan)
+
+
+def build_grid(db: Session, workout_id: int, axis: str, step: float) -> Dict[str, np.ndarray]:
+    """Resample a workout's streams onto a regular grid of elapsed distance or time.
+
+    The result always has ``elapsed`` (seconds) and ``distance`` (meters)
+    so pace can be derived on either axis.
+    """
+    streams = read_streams(db, workout_id, channels=GRID_CHANNELS)
+    empty = {'axis': np.empty(0), 'elapsed': np.empty(0), 'distance': np.empty(0)}
+    if len(streams) < 2:
+        return empty
+
+    elapsed = (streams['timestamp'] - streams['timestamp'][0]).astype(np.float64)
+    if 'distance' in streams:
+        distance = streams['distance'].astype(np.float64)
+        has_distance = np.isfinite(distance)
+        # Distância acumulada nunca diminui (corrige ruído do GPS)
+        distance = np.where(has_distance, distance, -np.inf)
+        np.maximum.accumulate(distance, out=distance)
+        has_distance &= np.isfinite(distance)
+    else:
+        distance = np.full(len(elapsed), np.nan)
+        has_distance = np.zeros(len(elapsed), dtype=bool)
+
+    if axis == 'distance':
+        if has_distance.sum() < 2:
+            return empty
+        x, x_valid = distance, has_distance
+    else:
+        x, x_valid = elapsed, np.ones(len(elapsed), dtype=bool)
+
+    end = x[x_valid][-1]
+    grid = np.arange(0.0, end + step / 2, step)
+    resampled = {
+        'axis': grid,
+        'elapsed': _resample(x, elapsed, x_valid, grid),
+        'distance': _resample(x, distance, x_valid & has_distance, grid),
+    }
+    for channel in ('heart_rate', 'power', 'speed'):
+        if channel in streams:
+            resampled[channel] = _resample(x, streams[channel], x_valid & streams.valid(channel), grid)
+    return resampled
+
+
+def get_grid(db: Session, workout_id: int, axis: str, step: float,
+             parser_version: Optional[int] = None) -> Dict[str, np.ndarray]:
+    key = (workout_id, parser_version, axis, step)
+    grid = grid_cache.get(key)
+    if grid is None:
+        grid = build_grid(db, workout_id, axis, step)
+        grid_cache.set(key, grid, sum(values.nbytes for values in grid.values()))
+    return grid
+
+
+def invalidate_grids(workout_id: int):
+    """Descarta as grades do workout (ex.: ao removê-lo; ids podem ser reutilizados)."""
+    grid_cache.pop_matching(lambda key: key[0] == workout_id)
+
+
+def _split_means(values: np.ndarray, per_split: int, splits: int) -> np.ndarray:
+    """Mean of each ``per_split`` block of a (workouts, points) matrix, ignoring NaN."""
+    blocks = values[:, :splits * per_split].reshape(len(values), splits, per_split)
+    valid = np.isfinite(blocks)
+    counts = valid.sum(axis=2)
+    totals = np.where(valid, blocks, 0.0).sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, totals / np.maximum(counts, 1), np.nan)
+
+
+def _stack(grids: List[Dict[str, np.ndarray]], channel: str, length: int) -> np.ndarray:
+    matrix = np.full((len(grids), length), np.nan)
+    for row, grid in enumerate(grids):
+        values = grid.get(channel)
+        if values is not None:
+            n = min(length, len(values))
+            matrix[row, :n] = values[:n]
+    return matrix
+
+
+def _nan_to_none(values: np.ndarray) -> List[Optional[float]]:
+    return [None if not np.isfinite(v) else round(float(v), 3) for v in values]
+
+
+def compare_splits(grids: List[Dict[str, np.ndarray]], axis: str, step: float,
+                   split: float) -> Dict[str, Any]:
+    """Per-split pace, HR and power for every workout plus deltas to the first.
+
+    Splits run up to the longest workout; shorter ones have ``None`` past
+    their end. Pace is seconds per km, from the elapsed time (distance
+    axis) or distance covered (time axis) across each split boundary.
+    """
+    per_split = max(1, int(round(split / step)))
+    length = max(len(g['axis']) for g in grids)
+    splits = max(0, (length - 1) // per_split)
+    boundaries = np.arange(splits + 1) * per_split
+
+    elapsed = _stack(grids, 'elapsed', length)
+    distance = _stack(grids, 'distance', length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if axis == 'distance':
+            pace = np.diff(elapsed[:, boundaries], axis=1) / (split / 1000)
+        else:
+            pace = 1000 * split / np.diff(distance[:, boundaries], axis=1)
+    pace[~np.isfinite(pace) | (pace <= 0)] = np.nan
+
+    metrics = {
+        'pace': pace,
+        'heart_rate': _split_means(_stack(grids, 'heart_rate', length), per_split, splits),
+        'power': _split_means(_stack(grids, 'power', length), per_split, splits),
+    }
+    return {
+        'start': (boundaries[:-1] * step).tolist(),
+        'end': (boundaries[1:] * step).tolist(),
+        'values': {name: [_nan_to_none(row) for row in matrix] for name, matrix in metrics.items()},
+        'deltas': {
+            name: [_nan_to_none(row - matrix[0]) for row in matrix]
+            for name, matrix in metrics.items()
+        }
+    }
+
 
 class WorkoutComparator:
     @staticmethod
-    def compare_workouts(db: Session, workout_ids: List[int]) -> Dict[str, Any]:
-        workouts = db.query(Workout).filter(Workout.id.in_(workout_ids)).all()
-        
+    def compare_workouts(db: Session, workout_ids: List[int], axis: str = 'distance',
+                         split: Optional[float] = None, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Align the workouts' streams on a common grid and compare them split by split.
+
+        Workouts are ordered chronologically; deltas are relative to the
+        earliest one.
+        """
+        if axis not in AXES:
+            raise ValueError(f"Eixo inválido; use um de: {', '.join(AXES)}")
+        step = AXES[axis]['step']
+        split = split or AXES[axis]['split']
+        if split < step:
+            raise ValueError(f"O split deve ser de pelo menos {step:g}")
+
+        columns = [Workout.id, Workout.filename, Workout.start_time, Workout.activity_type,
+                   Workout.parser_version]
+        query = db.query(*columns, *[getattr(Workout, f) for f in SUMMARY_FIELDS]).filter(
+            Workout.id.in_(workout_ids)
+        )
+        if user_id is not None:
+            query = query.filter(Workout.user_id == user_id)
+        workouts = query.order_by(Workout.start_time, Workout.id).all()
+
         if len(workouts) < 2:
             raise ValueError("Pelo menos 2 workouts necessários para comparação")
-        
-        comparison_data = []
-        for workout in workouts:
-            comparison_data.append({
+
+        comparison_data = [
+            {
                 'id': workout.id,
                 'name': workout.filename,
                 'date': workout.start_time,
-                'distance': workout.distance,
-                'duration': workout.duration,
-                'avg_hr': workout.avg_hr,
-                'max_hr': workout.max_hr,
-                'ascent': workout.ascent,
-                'descent': workout.descent
-            })
-        
-        df = pd.DataFrame(comparison_data)
-        
-        # Análise comparativa
+                'activity_type': workout.activity_type,
+                **{field: getattr(workout, field) for field in SUMMARY_FIELDS}
+            }
+            for workout in workouts
+        ]
+
+        grids = [get_grid(db, workout.id, axis, step, workout.parser_version) for workout in workouts]
+        if max(len(g['axis']) for g in grids) < 2:
+            raise ValueError("Workouts sem séries temporais para comparar")
+
+        first, last = comparison_data[0], comparison_data[-1]
         analysis = {
-            'distance_improvement': (df['distance'].iloc[-1] - df['distance'].iloc[0]) / df['distance'].iloc[0] * 100,
-            'hr_trend': df['avg_hr'].mean()
+            'distance_improvement': (
+                (last['distance'] - first['distance']) / first['distance'] * 100
+                if first['distance'] and last['distance'] is not None else None
+            ),
+            'hr_trend': _mean([w['avg_hr'] for w in comparison_data])
         }
-        
+
         return {
+            'axis': axis,
+            'split': split,
             'workouts': comparison_data,
             'analysis': analysis,
-            'stats': df.describe().to_dict()
+            'stats': {field: _describe([w[field] for w in comparison_data]) for field in SUMMARY_FIELDS},
+            'splits': compare_splits(grids, axis, step, split)
         }
 
     @staticmethod
     def get_comparable_workouts(db: Session, user_id: int, activity_type: str = None):
         query = db.query(Workout).filter(Workout.user_id == user_id)
-        
+
         if activity_type:
             query = query.filter(Workout.activity_type == activity_type)
-            
-        return query.order_by(Workout.start_time.desc()).all()
\ No newline at end of file
+
+        return query.order_by(Workout.start_time.desc()).all()
+
+
+def _mean(values: List[Optional[float]]) -> Optional[float]:
+    present = [v for v in values if v is not None]
+    return float(np.mean(present)) if present else None
+
+
+def _describe(values: List[Optional[float]]) -> Dict[str, Any]:
+    present = np.array([v for v in values if v is not None], dtype=np.float64)
+    if not len(present):
+        return {'count': 0}
+    return {
+        'count': int(len(present)),
+        'mean': float(present.mean()),
+        'std': float(present.std(ddof=1)) if len(present) > 1 else None,
+        'min': float(present.min()),
+        'max': float(present.max())
+    }
@@ -0,0 +1,250 @@
+"""Curvas de média máxima (best efforts) e índice de recordes pessoais."""
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+import numpy as np
+from sqlalchemy import and_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import PersonalRecord, Workout, WorkoutCurve
+from streams import RecordStreams, monotonic_offsets
+
+# Configurações
+CURVE_CHANNELS = ('power', 'heart_rate', 'speed')
+
+# Janelas (segundos) em que as curvas são amostradas
+CURVE_DURATIONS = (
+    1, 2, 3, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 240, 300, 420, 600, 900,
+    1200, 1800, 2700, 3600, 5400, 7200, 10800, 14400, 18000, 21600
+)
+
+# Lacunas de até MAX_FILL_SECONDS repetem o último sample (gravação "smart");
+# lacunas maiores (pausas) interrompem as janelas
+MAX_FILL_SECONDS = 5
+
+# Workouts com timestamps espalhados por mais que isso são ignorados
+MAX_SPAN_SECONDS = 48 * 3600
+
+logger = logging.getLogger(__name__)
+
+# (duração, valor, offset em segundos do início da janela)
+CurvePoint = Tuple[int, float, int]
+
+
+def resample_1hz(timestamps: np.ndarray, values: np.ndarray, valid: np.ndarray,
+                 max_fill: int = MAX_FILL_SECONDS) -> np.ndarray:
+    """Place samples on a 1 Hz grid starting at ``timestamps[0]``.
+
+    Missing seconds are forward-filled for up to ``max_fill`` seconds and
+    NaN beyond that, so windows never average across a pause. If the
+    clock jumps backwards, samples are dropped until it passes the latest
+    time already seen, so no second of the grid is written twice.
+    """
+    offsets, monotonic = monotonic_offsets(timestamps)
+    size = int(offsets.max()) + 1
+    grid = np.full(size, np.nan)
+    keep = valid & monotonic
+    grid[offsets[keep]] = values[keep]
+
+    positions = np.arange(size)
+    last = np.where(~np.isnan(grid), positions, -1)
+    np.maximum.accumulate(last, out=last)
+    fill = (last >= 0) & (positions - last <= max_fill)
+    return np.where(fill, grid[np.maximum(last, 0)], np.nan)
+
+
+def mean_max(grid: np.ndarray, durations: Iterable[int] = CURVE_DURATIONS) -> List[CurvePoint]:
+    """Best average over every window duration, via cumulative sums.
+
+    Each duration costs one vectorized pass over the series, O(n) instead
+    of the O(n * d) sliding sum. Windows that contain a NaN are skipped.
+    """
+    missing = np.isnan(grid)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, grid))))
+    gaps = np.concatenate(([0], np.cumsum(missing)))
+
+    points = []
+    for duration in durations:
+        if duration > len(grid):
+            break
+        totals = sums[duration:] - sums[:-duration]
+        totals[gaps[duration:] - gaps[:-duration] > 0] = -np.inf
+        best = int(np.argmax(totals))
+        if np.isfinite(totals[best]):
+            points.append((duration, float(totals[best] / duration), best))
+    return points
+
+
+def compute_curves(streams: RecordStreams,
+                   channels: Iterable[str] = CURVE_CHANNELS) -> Dict[str, List[CurvePoint]]:
+    """Mean-max curves for every channel present in ``streams``."""
+    if 'timestamp' not in streams or len(streams) < 1:
+        return {}
+    timestamps = streams['timestamp']
+    if timestamps.max() - timestamps[0] > MAX_SPAN_SECONDS:
+        logger.warning("Workout com duração implausível; curvas ignoradas")
+        return {}
+
+    curves = {}
+    for channel in channels:
+        if channel not in streams:
+            continue
+        values = streams[channel].astype(np.float64)
+        valid = streams.valid(channel) & np.isfinite(values)
+        if not valid.any():
+            continue
+        points = mean_max(resample_1hz(timestamps, values, valid))
+        if points:
+            curves[channel] = points
+    return curves
+
+
+def store_curves(db: Session, workout: Workout, streams: RecordStreams) -> Dict[str, List[CurvePoint]]:
+    """Persist the workout's curves and fold them into the user's PR index (no commit)."""
+    curves = compute_curves(streams)
+    rows = [
+        {
+            'workout_id': workout.id,
+            'user_id': workout.user_id,
+            'channel': channel,
+            'duration': duration,
+            'value': value,
+            'start_offset': offset,
+            'start_time': workout.start_time
+        }
+        for channel, points in curves.items()
+        for duration, value, offset in points
+    ]
+    if rows:
+        db.execute(WorkoutCurve.__table__.insert(), rows)
+        update_personal_records(db, workout.user_id, rows)
+    return curves
+
+
+def update_personal_records(db: Session, user_id: int, rows: List[dict]):
+    """Raise the PRs beaten by ``rows``; only touches the changed entries."""
+    current = {
+        (pr.channel, pr.duration): pr.value
+        for pr in db.query(PersonalRecord.channel, PersonalRecord.duration, PersonalRecord.value)
+        .filter(PersonalRecord.user_id == user_id)
+    }
+    for row in rows:
+        key = (row['channel'], row['duration'])
+        if key in current and current[key] >= row['value']:
+            continue
+        values = {
+            PersonalRecord.value: row['value'],
+            PersonalRecord.workout_id: row['workout_id'],
+            PersonalRecord.start_offset: row['start_offset'],
+            PersonalRecord.achieved_at: row['start_time']
+        }
+        # UPDATE condicional: seguro com uploads concorrentes do mesmo usuário
+        updated = db.query(PersonalRecord).filter(
+            PersonalRecord.user_id == user_id,
+            PersonalRecord.channel == row['channel'],
+            PersonalRecord.duration == row['duration'],
+            PersonalRecord.value < row['value']
+        ).update(values, synchronize_session=False)
+        if updated or key in current:
+            continue
+        try:
+            with db.begin_nested():
+                db.add(PersonalRecord(
+                    user_id=user_id, channel=row['channel'], duration=row['duration'],
+                    value=row['value'], workout_id=row['workout_id'],
+                    start_offset=row['start_offset'], achieved_at=row['start_time']
+                ))
+        except IntegrityError:
+            # Outro upload criou o recorde entre a leitura e o insert
+            db.query(PersonalRecord).filter(
+                PersonalRecord.user_id == user_id,
+                PersonalRecord.channel == row['channel'],
+                PersonalRecord.duration == row['duration'],
+                PersonalRecord.value < row['value']
+            ).update(values, synchronize_session=False)
+
+
+def delete_curves(db: Session, workout: Workout):
+    """Remove the workout's curves, rebuilding the PR index if it held a record."""
+    db.query(WorkoutCurve).filter(WorkoutCurve.workout_id == workout.id).delete(synchronize_session=False)
+    held_record = db.query(PersonalRecord.id).filter(
+        PersonalRecord.user_id == workout.user_id,
+        PersonalRecord.workout_id == workout.id
+    ).first()
+    if held_record:
+        rebuild_personal_records(db, workout.user_id)
+
+
+def rebuild_personal_records(db: Session, user_id: int):
+    """Recompute a user's PR index from the stored curves (e.g. after a delete)."""
+    db.query(PersonalRecord).filter(PersonalRecord.user_id == user_id).delete(synchronize_session=False)
+    for channel in CURVE_CHANNELS:
+        # Sem PRs gravados, best_curve agrega direto de workout_curves
+        db.add_all(
+            PersonalRecord(
+                user_id=user_id, channel=channel, duration=p['duration'], value=p['value'],
+                workout_id=p['workout_id'], start_offset=p['start_offset'], achieved_at=p['start_time']
+            )
+            for p in best_curve(db, user_id, channel)
+        )
+
+
+def best_curve(db: Session, user_id: int, channel: str, start_date=None, end_date=None) -> List[dict]:
+    """Best value per duration, all-time (PR index) or within a date range.
+
+    Only the precomputed ``workout_curves`` / ``personal_records`` rows are
+    read; no stream data is touched.
+    """
+    if start_date is None and end_date is None:
+        records = (
+            db.query(PersonalRecord)
+            .filter(PersonalRecord.user_id == user_id, PersonalRecord.channel == channel)
+            .order_by(PersonalRecord.duration)
+            .all()
+        )
+        if records:
+            return [
+                {'duration': r.duration, 'value': r.value, 'workout_id': r.workout_id,
+                 'start_offset': r.start_offset, 'start_time': r.achieved_at}
+                for r in records
+            ]
+
+    filters = [WorkoutCurve.user_id == user_id, WorkoutCurve.channel == channel]
+    if start_date:
+        filters.append(WorkoutCurve.start_time >= start_date)
+    if end_date:
+        filters.append(WorkoutCurve.start_time <= end_date)
+
+    best = (
+        db.query(WorkoutCurve.duration, func.max(WorkoutCurve.value).label('value'))
+        .filter(*filters)
+        .group_by(WorkoutCurve.duration)
+        .subquery()
+    )
+    rows = (
+        db.query(WorkoutCurve)
+        .join(best, and_(WorkoutCurve.duration == best.c.duration, WorkoutCurve.value == best.c.value))
+        .filter(*filters)
+        .order_by(WorkoutCurve.duration, WorkoutCurve.start_time)
+    )
+    points: Dict[int, dict] = {}
+    for r in rows:
+        points.setdefault(r.duration, {
+            'duration': r.duration, 'value': r.value, 'workout_id': r.workout_id,
+            'start_offset': r.start_offset, 'start_time': r.start_time
+        })
+    return list(points.values())
+
+
+def workout_curve(db: Session, workout_id: int, channel: Optional[str] = None) -> Dict[str, List[dict]]:
+    """Stored curves of a single workout, grouped by channel."""
+    query = db.query(WorkoutCurve).filter(WorkoutCurve.workout_id == workout_id)
+    if channel:
+        query = query.filter(WorkoutCurve.channel == channel)
+    curves: Dict[str, List[dict]] = {}
+    for r in query.order_by(WorkoutCurve.channel, WorkoutCurve.duration):
+        curves.setdefault(r.channel, []).append(
+            {'duration': r.duration, 'value': r.value, 'start_offset': r.start_offset}
+        )
+    return curves
@@ -1,21 +1,140 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 
+# Configurações
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./workouts.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# SQLite: espera por locks em vez de falhar com "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# NORMAL é durável com WAL exceto em queda de energia; FULL faz fsync a cada commit
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-)
+# Drivers async correspondentes aos síncronos
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL (leitores não bloqueiam o escritor), busy_timeout e synchronous."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.close()
+
+
+def engine_options(url: str) -> dict:
+    """Keyword arguments for ``create_engine``/``create_async_engine``.
+
+    Server databases get a sized, pre-pinged and recycled pool. File-based
+    SQLite gets the same pool sizing and a driver timeout matching
+    ``busy_timeout``; in-memory SQLite keeps SQLAlchemy's default pool.
+    """
+    url = make_url(url)
+    options = {}
+    if url.get_backend_name() == 'sqlite':
+        connect_args = {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}
+        if not url.get_driver_name().startswith('aio'):
+            connect_args['check_same_thread'] = False
+        options['connect_args'] = connect_args
+        if _is_memory_sqlite(url):
+            return options
+    else:
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = DB_POOL_RECYCLE
+    options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+
+def _configure(engine: Engine) -> Engine:
+    url = engine.url
+    if url.get_backend_name() == 'sqlite' and not _is_memory_sqlite(url):
+        event.listen(engine, "connect", _sqlite_pragmas)
+    return engine
+
+
+def create_db_engine(url: str = DATABASE_URL, **overrides) -> Engine:
+    """Engine configured for the database behind ``url`` (see ``engine_options``)."""
+    return _configure(create_engine(url, **{**engine_options(url), **overrides}))
+
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """The same database with its async driver (``sqlite`` -> ``sqlite+aiosqlite``)."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if url.drivername in ASYNC_DRIVERS.values():
+        return url.render_as_string(hide_password=False)
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Sem driver async conhecido para '{backend}'")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def create_async_db_engine(url: str = DATABASE_URL, **overrides):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async_url = async_database_url(url)
+    engine = create_async_engine(async_url, **{**engine_options(async_url), **overrides})
+    _configure(engine.sync_engine)
+    return engine
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Engine async criada no primeiro uso (o driver async só é importado quando
+# uma rota abre uma sessão async)
+_async_engine = None
+_async_sessionmaker = None
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_db_engine()
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_sessionmaker = async_sessionmaker(get_async_engine(), autoflush=False,
+                                                 expire_on_commit=False)
+    return _async_sessionmaker()
+
+
+async def dispose_engines():
+    """Close pooled connections of both engines (on shutdown)."""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    engine.dispose()
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    """Async session for async routes; queries don't block the event loop."""
+    async with AsyncSessionLocal() as db:
+        yield db
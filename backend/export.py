@@ -0,0 +1,296 @@
+"""Exportação dos workouts de um usuário em CSV, GPX ou Parquet, em streaming.
+
+Os workouts são lidos com ``yield_per`` e as séries de um workout de cada
+vez, então a memória não cresce com o tamanho do histórico. Cada formato é
+um gerador de ``bytes`` para ``StreamingResponse``; pyarrow só é importado
+em exportações Parquet.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+from xml.sax.saxutils import escape
+import csv
+import io
+import os
+
+import numpy as np
+
+from database import SessionLocal
+from models import Workout
+from stream_store import read_streams
+from streams import CHANNEL_DTYPES
+
+# Configurações
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+# Bytes acumulados antes de enviar um pedaço da resposta
+EXPORT_FLUSH_BYTES = 64 * 1024
+# Linhas por row group no Parquet
+PARQUET_ROW_GROUP = 65536
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'gpx': ('application/gpx+xml', 'gpx'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+SUMMARY_COLUMNS = (
+    'id', 'filename', 'activity_type', 'start_time', 'end_time', 'duration', 'distance',
+    'calories', 'avg_hr', 'max_hr', 'avg_speed', 'max_speed', 'ascent', 'descent',
+    'training_stress'
+)
+
+RECORD_CHANNELS = tuple(c for c in CHANNEL_DTYPES if c != 'timestamp')
+
+
+class ExportUnavailableError(Exception):
+    """The requested format needs an optional dependency that is not installed."""
+
+
+def check_format(export_format: str):
+    if export_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ExportUnavailableError("Exportação Parquet requer o pacote pyarrow")
+
+
+def _workouts(db, user_id: int, start_date: Optional[date], end_date: Optional[date],
+              activity_type: Optional[str]):
+    """Summary rows of the user's workouts, oldest first, fetched in batches."""
+    query = db.query(*(getattr(Workout, c) for c in SUMMARY_COLUMNS)).filter(Workout.user_id == user_id)
+    if start_date:
+        query = query.filter(Workout.start_time >= datetime.combine(start_date, time.min))
+    if end_date:
+        query = query.filter(Workout.start_time < datetime.combine(end_date + timedelta(days=1), time.min))
+    if activity_type:
+        query = query.filter(Workout.activity_type == activity_type)
+    return query.order_by(Workout.start_time, Workout.id).yield_per(EXPORT_BATCH_SIZE)
+
+
+def _records(db, workout_id: int, channels=RECORD_CHANNELS) -> Dict[str, Any]:
+    """One workout's samples as float arrays with NaN where missing (None: no such channel)."""
+    streams = read_streams(db, workout_id, channels=channels)
+    if 'timestamp' not in streams or len(streams) == 0:
+        return {}
+    columns = {'timestamp': streams['timestamp']}
+    for channel in channels:
+        if channel not in streams:
+            columns[channel] = None
+            continue
+        values = streams[channel].astype(np.float64)
+        valid = streams.valid(channel) & np.isfinite(values)
+        columns[channel] = np.where(valid, values, np.nan)
+    return columns
+
+
+def _iso(value) -> str:
+    return value.isoformat() if isinstance(value, datetime) else ('' if value is None else value)
+
+
+def _csv_values(channel: str, values: Optional[np.ndarray], size: int) -> List[str]:
+    if values is None:
+        return [''] * size
+    spec = '.7f' if channel in ('position_lat', 'position_long') else 'g'
+    return ['' if np.isnan(v) else format(v, spec) for v in values.tolist()]
+
+
+def _session_stream(generate):
+    """Run ``generate(db)`` with its own session, closed when the response ends."""
+    def stream(*args, **kwargs) -> Iterator[bytes]:
+        db = SessionLocal()
+        try:
+            yield from generate(db, *args, **kwargs)
+        finally:
+            db.close()
+    return stream
+
+
+def _buffered(chunks: Iterator[str]) -> Iterator[bytes]:
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= EXPORT_FLUSH_BYTES:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+@_session_stream
+def export_csv(db, user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None,
+               activity_type: Optional[str] = None, records: bool = False) -> Iterator[bytes]:
+    """One line per workout, or one line per sample with ``records``."""
+    def lines():
+        out = io.StringIO()
+        writer = csv.writer(out)
+
+        def take() -> str:
+            text = out.getvalue()
+            out.seek(0)
+            out.truncate()
+            return text
+
+        if not records:
+            writer.writerow(SUMMARY_COLUMNS)
+            yield take()
+            for row in _workouts(db, user_id, start_date, end_date, activity_type):
+                writer.writerow([_iso(v) for v in row])
+                yield take()
+            return
+
+        writer.writerow(('workout_id', 'timestamp') + RECORD_CHANNELS)
+        yield take()
+        for row in _workouts(db, user_id, start_date, end_date, activity_type):
+            columns = _records(db, row.id)
+            if not columns:
+                continue
+            times = [datetime.fromtimestamp(int(t), timezone.utc).isoformat() for t in columns['timestamp']]
+            values = [_csv_values(c, columns[c], len(times)) for c in RECORD_CHANNELS]
+            writer.writerows([row.id, t, *sample] for t, *sample in zip(times, *values))
+            yield take()
+
+    return _buffered(lines())
+
+
+GPX_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<gpx version="1.1" creator="fit-tracker" xmlns="http://www.topografix.com/GPX/1/1"'
+    ' xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">\n'
+)
+GPX_CHANNELS = ('position_lat', 'position_long', 'altitude', 'heart_rate', 'cadence', 'power')
+
+
+def _trackpoint(t: int, lat: float, lon: float, ele: float, hr: float, cad: float, power: float) -> str:
+    parts = [f'<trkpt lat="{lat:.7f}" lon="{lon:.7f}">']
+    if not np.isnan(ele):
+        parts.append(f'<ele>{ele:.1f}</ele>')
+    parts.append(f'<time>{datetime.fromtimestamp(t, timezone.utc):%Y-%m-%dT%H:%M:%SZ}</time>')
+    extensions = []
+    if not np.isnan(power):
+        extensions.append(f'<power>{power:.0f}</power>')
+    tpx = ''.join(
+        f'<gpxtpx:{tag}>{value:.0f}</gpxtpx:{tag}>'
+        for tag, value in (('hr', hr), ('cad', cad)) if not np.isnan(value)
+    )
+    if tpx:
+        extensions.append(f'<gpxtpx:TrackPointExtension>{tpx}</gpxtpx:TrackPointExtension>')
+    if extensions:
+        parts.append(f'<extensions>{"".join(extensions)}</extensions>')
+    parts.append('</trkpt>\n')
+    return ''.join(parts)
+
+
+@_session_stream
+def export_gpx(db, user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None,
+               activity_type: Optional[str] = None, records: bool = True) -> Iterator[bytes]:
+    """One ``<trk>`` per workout with GPS; HR, cadence and power go in extensions."""
+    def lines():
+        yield GPX_HEADER
+        for row in _workouts(db, user_id, start_date, end_date, activity_type):
+            columns = _records(db, row.id, GPX_CHANNELS)
+            if not columns or columns['position_lat'] is None:
+                continue
+            has_position = ~np.isnan(columns['position_lat']) & ~np.isnan(columns['position_long'])
+            if not has_position.any():
+                continue
+            empty = np.full(len(has_position), np.nan)
+            series = [columns[c] if columns[c] is not None else empty for c in GPX_CHANNELS]
+            yield (f'<trk><name>{escape(row.filename or str(row.id))}</name>'
+                   f'<type>{escape(row.activity_type or "")}</type><trkseg>\n')
+            timestamps = columns['timestamp'][has_position].tolist()
+            for t, *sample in zip(timestamps, *(s[has_position].tolist() for s in series)):
+                yield _trackpoint(t, *sample)
+            yield '</trkseg></trk>\n'
+        yield '</gpx>\n'
+
+    return _buffered(lines())
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file collecting what pyarrow writes until it is drained."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+@_session_stream
+def export_parquet(db, user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                   activity_type: Optional[str] = None, records: bool = False) -> Iterator[bytes]:
+    """Same rows as the CSV export, written one row group at a time."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if records:
+        schema = pa.schema(
+            [('workout_id', pa.int64()), ('timestamp', pa.timestamp('s', tz='UTC'))]
+            + [(c, pa.float64()) for c in RECORD_CHANNELS]
+        )
+    else:
+        types = {'id': pa.int64(), 'filename': pa.string(), 'activity_type': pa.string(),
+                 'start_time': pa.timestamp('us'), 'end_time': pa.timestamp('us'),
+                 'calories': pa.int64(), 'avg_hr': pa.int64(), 'max_hr': pa.int64(),
+                 'ascent': pa.int64(), 'descent': pa.int64()}
+        schema = pa.schema([(c, types.get(c, pa.float64())) for c in SUMMARY_COLUMNS])
+
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    pending: List[Any] = []
+    pending_rows = 0
+
+    def flush() -> bytes:
+        nonlocal pending, pending_rows
+        if pending:
+            writer.write_table(pa.concat_tables(pending) if records else
+                               pa.Table.from_pylist(pending, schema=schema))
+        pending, pending_rows = [], 0
+        return sink.drain()
+
+    for row in _workouts(db, user_id, start_date, end_date, activity_type):
+        if records:
+            columns = _records(db, row.id)
+            if not columns:
+                continue
+            size = len(columns['timestamp'])
+            arrays = [pa.array(np.full(size, row.id, dtype=np.int64)),
+                      pa.array(columns['timestamp'].astype('datetime64[s]'), type=pa.timestamp('s', tz='UTC'))]
+            arrays += [
+                pa.nulls(size, pa.float64()) if columns[c] is None
+                else pa.array(columns[c], mask=np.isnan(columns[c]))
+                for c in RECORD_CHANNELS
+            ]
+            pending.append(pa.Table.from_arrays(arrays, schema=schema))
+            pending_rows += size
+        else:
+            pending.append(dict(zip(SUMMARY_COLUMNS, row)))
+            pending_rows += 1
+        if pending_rows >= PARQUET_ROW_GROUP:
+            yield flush()
+    yield flush()
+    writer.close()
+    yield sink.drain()
+
+
+EXPORTERS = {'csv': export_csv, 'gpx': export_gpx, 'parquet': export_parquet}
+
+
+def export_filename(export_format: str, records: bool) -> str:
+    kind = 'records' if records or export_format == 'gpx' else 'workouts'
+    return f"fit-tracker-{kind}-{datetime.now():%Y%m%d}.{EXPORT_FORMATS[export_format][1]}"
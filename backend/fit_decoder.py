@@ -0,0 +1,586 @@
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import mmap
+import struct
+import sys
+
+import fitparse
+import numpy as np
+
+from streams import FIT_EPOCH_OFFSET, SEMICIRCLES_TO_DEGREES
+
+# Base types FIT: número -> (formato struct, tamanho, valor inválido)
+BASE_TYPES = {
+    0x00: ('B', 1, 0xFF),          # enum
+    0x01: ('b', 1, 0x7F),          # sint8
+    0x02: ('B', 1, 0xFF),          # uint8
+    0x03: ('h', 2, 0x7FFF),        # sint16
+    0x04: ('H', 2, 0xFFFF),        # uint16
+    0x05: ('i', 4, 0x7FFFFFFF),    # sint32
+    0x06: ('I', 4, 0xFFFFFFFF),    # uint32
+    0x07: ('s', 1, None),          # string
+    0x08: ('f', 4, None),          # float32
+    0x09: ('d', 8, None),          # float64
+    0x0A: ('B', 1, 0x00),          # uint8z
+    0x0B: ('H', 2, 0x0000),        # uint16z
+    0x0C: ('I', 4, 0x00000000),    # uint32z
+    0x0D: ('B', 1, 0xFF),          # byte
+    0x0E: ('q', 8, 0x7FFFFFFFFFFFFFFF),  # sint64
+    0x0F: ('Q', 8, 0xFFFFFFFFFFFFFFFF),  # uint64
+    0x10: ('Q', 8, 0x0000000000000000),  # uint64z
+}
+
+SPORTS = {
+    0: 'generic', 1: 'running', 2: 'cycling', 3: 'transition', 4: 'fitness_equipment',
+    5: 'swimming', 6: 'basketball', 7: 'soccer', 8: 'tennis', 9: 'american_football',
+    10: 'training', 11: 'walking', 12: 'cross_country_skiing', 13: 'alpine_skiing',
+    14: 'snowboarding', 15: 'rowing', 16: 'mountaineering', 17: 'hiking',
+    18: 'multisport', 19: 'paddling', 20: 'flying', 21: 'e_biking', 22: 'motorcycling',
+    23: 'boating', 24: 'driving', 25: 'golf', 26: 'hang_gliding', 27: 'horseback_riding',
+    28: 'hunting', 29: 'fishing', 30: 'inline_skating', 31: 'rock_climbing',
+    32: 'sailing', 33: 'ice_skating', 34: 'sky_diving', 35: 'snowshoeing',
+    36: 'snowmobiling', 37: 'stand_up_paddleboarding', 38: 'surfing', 39: 'wakeboarding',
+    40: 'water_skiing', 41: 'kayaking', 42: 'rafting', 43: 'windsurfing', 44: 'kitesurfing',
+    45: 'tactical', 46: 'jumpmaster', 47: 'boxing', 48: 'floor_climbing', 254: 'all',
+}
+
+MANUFACTURERS = {1: 'garmin', 23: 'suunto', 32: 'wahoo_fitness', 255: 'development', 294: 'coros'}
+
+# Subconjunto do perfil FIT: mensagem -> (número global, {campo: (nome, tipo, escala, offset)})
+# tipo: 'date_time', 'semicircles', 'sport', 'manufacturer' ou None (valor numérico)
+PROFILE = {
+    'session': (18, {
+        253: ('timestamp', 'date_time', 1, 0),
+        2: ('start_time', 'date_time', 1, 0),
+        5: ('sport', 'sport', 1, 0),
+        7: ('total_elapsed_time', None, 1000, 0),
+        8: ('total_timer_time', None, 1000, 0),
+        9: ('total_distance', None, 100, 0),
+        11: ('total_calories', None, 1, 0),
+        14: ('avg_speed', None, 1000, 0),
+        15: ('max_speed', None, 1000, 0),
+        16: ('avg_heart_rate', None, 1, 0),
+        17: ('max_heart_rate', None, 1, 0),
+        22: ('total_ascent', None, 1, 0),
+        23: ('total_descent', None, 1, 0),
+        124: ('enhanced_avg_speed', None, 1000, 0),
+        125: ('enhanced_max_speed', None, 1000, 0),
+    }),
+    'lap': (19, {
+        253: ('timestamp', 'date_time', 1, 0),
+        2: ('start_time', 'date_time', 1, 0),
+        7: ('total_elapsed_time', None, 1000, 0),
+        8: ('total_timer_time', None, 1000, 0),
+        9: ('total_distance', None, 100, 0),
+        11: ('total_calories', None, 1, 0),
+    }),
+    'device_info': (23, {
+        253: ('timestamp', 'date_time', 1, 0),
+        0: ('device_index', None, 1, 0),
+        2: ('manufacturer', 'manufacturer', 1, 0),
+        3: ('serial_number', None, 1, 0),
+        4: ('product', None, 1, 0),
+        5: ('software_version', None, 100, 0),
+    }),
+    'record': (20, {
+        253: ('timestamp', 'date_time', 1, 0),
+        0: ('position_lat', 'semicircles', 1, 0),
+        1: ('position_long', 'semicircles', 1, 0),
+        2: ('altitude', None, 5, 500),
+        3: ('heart_rate', None, 1, 0),
+        4: ('cadence', None, 1, 0),
+        5: ('distance', None, 100, 0),
+        6: ('speed', None, 1000, 0),
+        7: ('power', None, 1, 0),
+        73: ('enhanced_speed', None, 1000, 0),
+        78: ('enhanced_altitude', None, 5, 500),
+    }),
+}
+
+TIMESTAMP_FIELD = 253
+
+# Códigos struct -> tipos NumPy (sem ordem de bytes)
+NUMPY_TYPES = {
+    'B': 'u1', 'b': 'i1', 'h': 'i2', 'H': 'u2', 'i': 'i4', 'I': 'u4',
+    'q': 'i8', 'Q': 'u8', 'f': 'f4', 'd': 'f8',
+}
+
+# Bytes copiados por vez no cálculo do CRC (par: palavras de 16 bits não cruzam blocos)
+CRC_CHUNK_SIZE = 1024 * 1024
+
+# Records copiados do arquivo por vez ao montar as colunas
+DECODE_CHUNK_RECORDS = 65536
+
+# Mensagens que o caminho rápido repassa ao fitparse (resumo e metadados de
+# campos de desenvolvedor); as demais são puladas pelo tamanho
+SUMMARY_MESSAGES = {18, 19, 23, 206, 207}
+
+# Tabela do CRC-16 do protocolo FIT, expandida para um byte por consulta
+_CRC_NIBBLES = (
+    0x0000, 0xCC01, 0xD801, 0x1400, 0xF001, 0x3C00, 0x2800, 0xE401,
+    0xA001, 0x6C00, 0x7800, 0xB401, 0x5000, 0x9C01, 0x8801, 0x4400,
+)
+
+
+def _crc_table():
+    table = []
+    for byte in range(256):
+        crc = 0
+        for nibble in (byte & 0xF, (byte >> 4) & 0xF):
+            tmp = _CRC_NIBBLES[crc & 0xF]
+            crc = ((crc >> 4) & 0x0FFF) ^ tmp ^ _CRC_NIBBLES[nibble]
+        table.append(crc)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+_CRC_TABLE_16 = None
+
+
+def _crc_table_16():
+    """Two bytes per lookup: the CRC after two steps depends only on ``crc ^ word``."""
+    global _CRC_TABLE_16
+    if _CRC_TABLE_16 is None:
+        table = np.array(_CRC_TABLE, dtype=np.uint32)
+        words = np.arange(65536, dtype=np.uint32)
+        first = table[words & 0xFF]
+        _CRC_TABLE_16 = ((first >> 8) ^ table[(words >> 8) ^ (first & 0xFF)]).tolist()
+    return _CRC_TABLE_16
+
+
+def fit_crc(data, crc: int = 0, start: int = 0, end: Optional[int] = None) -> int:
+    """FIT CRC-16 of ``data[start:end]``.
+
+    ``data`` may be any buffer, including a memory-mapped file: it is read
+    in chunks of ``CRC_CHUNK_SIZE``, so only one chunk is copied at a time.
+    """
+    end = len(data) if end is None else end
+    words_table = _crc_table_16() if end - start > 4096 else None
+    table = _CRC_TABLE
+    for chunk_start in range(start, end, CRC_CHUNK_SIZE):
+        chunk = data[chunk_start:min(chunk_start + CRC_CHUNK_SIZE, end)]
+        if words_table is not None:
+            even = len(chunk) // 2 * 2
+            words = array('H')
+            words.frombytes(chunk[:even])
+            if sys.byteorder == 'big':
+                words.byteswap()
+            for word in words:
+                crc = words_table[crc ^ word]
+            chunk = chunk[even:]
+        for byte in chunk:
+            crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def _open_buffer(fileish):
+    """``(buffer, close)``: bytes-like input as is, paths memory-mapped read-only."""
+    if isinstance(fileish, (bytes, bytearray, memoryview)):
+        return memoryview(fileish), lambda: None
+    f = open(fileish, 'rb')
+    try:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except Exception:
+        f.close()
+        raise
+
+    def close():
+        try:
+            mapped.close()
+        except BufferError:
+            # Ainda há views do arquivo (ex.: presas em um traceback); o GC fecha o mapa
+            pass
+        f.close()
+    return mapped, close
+
+
+class UnsupportedFitError(Exception):
+    """The file needs the generic fitparse decoder (e.g. compressed timestamps)."""
+
+
+def _read_definition(buffer, pos: int, has_dev_fields: bool):
+    """(global number, endian, [(field, size, base type)], developer bytes, next position)."""
+    architecture = buffer[pos + 1]
+    endian = '>' if architecture == 1 else '<'
+    global_num = struct.unpack_from(endian + 'H', buffer, pos + 2)[0]
+    num_fields = buffer[pos + 4]
+    pos += 5
+
+    field_defs = []
+    for _ in range(num_fields):
+        field_defs.append((buffer[pos], buffer[pos + 1], buffer[pos + 2]))
+        pos += 3
+    dev_size = 0
+    if has_dev_fields:
+        num_dev_fields = buffer[pos]
+        pos += 1
+        for _ in range(num_dev_fields):
+            dev_size += buffer[pos + 1]
+            pos += 3
+    return global_num, endian, field_defs, dev_size, pos
+
+
+class _Definition:
+    """Compiled local message definition."""
+
+    __slots__ = ('global_num', 'name', 'size', 'endian', 'timestamp_struct',
+                 'timestamp_offset', 'struct', 'fields', 'has_timestamp')
+
+    def __init__(self, global_num: int, size: int, endian: str):
+        self.global_num = global_num
+        self.name = None
+        self.size = size
+        self.endian = endian
+        self.timestamp_struct = None
+        self.timestamp_offset = None
+        self.struct = None
+        self.fields: List[Tuple[str, Optional[str], float, float, Any]] = []
+        self.has_timestamp = False
+
+
+class FitScanner:
+    """Walks the FIT structure and decodes only the requested messages/fields.
+
+    Data messages of other types are skipped by their definition size,
+    without decoding any field. Files are memory-mapped, so skipping a
+    large record stream costs neither reads into the heap nor CRC work
+    (CRC is not validated here; the full parse path still checks it).
+    """
+
+    def __init__(self, fileish, fields: Dict[str, Iterable[str]]):
+        self.fileish = fileish
+        self.wanted: Dict[int, Tuple[str, Dict[int, tuple]]] = {}
+        for name, names in fields.items():
+            global_num, profile = PROFILE[name]
+            names = set(names)
+            self.wanted[global_num] = (
+                name,
+                {num: spec for num, spec in profile.items() if spec[0] in names}
+            )
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        buffer, closer = _open_buffer(self.fileish)
+        try:
+            yield from self._scan(buffer)
+        finally:
+            closer()
+
+    def _scan(self, buffer):
+        pos = 0
+        total = len(buffer)
+        while pos + 12 <= total:
+            header_size = buffer[pos]
+            data_size = struct.unpack_from('<I', buffer, pos + 4)[0]
+            if bytes(buffer[pos + 8:pos + 12]) != b'.FIT':
+                raise ValueError("Cabeçalho .FIT inválido")
+            start = pos + header_size
+            end = start + data_size
+            yield from self._scan_messages(buffer, start, min(end, total))
+            pos = end + 2  # CRC do arquivo
+
+    def _scan_messages(self, buffer, pos: int, end: int):
+        definitions: Dict[int, _Definition] = {}
+        last_timestamp = None
+        unpack_from = struct.unpack_from
+
+        while pos < end:
+            header = buffer[pos]
+            pos += 1
+
+            if header & 0x80:
+                # Compressed timestamp header
+                local = (header >> 5) & 0x03
+                offset = header & 0x1F
+                definition = definitions[local]
+                if last_timestamp is not None:
+                    timestamp = (last_timestamp & ~0x1F) + offset
+                    if offset < (last_timestamp & 0x1F):
+                        timestamp += 0x20
+                    last_timestamp = timestamp
+                if definition.struct is not None:
+                    message = self._decode(definition, buffer, pos)
+                    if last_timestamp is not None and 'timestamp' not in message and self._wants_timestamp(definition):
+                        message['timestamp'] = _convert(last_timestamp, 'date_time')
+                    yield definition.name, message
+                pos += definition.size
+                continue
+
+            local = header & 0x0F
+            if header & 0x40:
+                definition, pos = self._parse_definition(buffer, pos, bool(header & 0x20))
+                definitions[local] = definition
+                continue
+
+            definition = definitions[local]
+            if definition.timestamp_struct is not None:
+                raw = definition.timestamp_struct.unpack_from(buffer, pos + definition.timestamp_offset)[0]
+                if raw != 0xFFFFFFFF:
+                    last_timestamp = raw
+            if definition.struct is not None:
+                yield definition.name, self._decode(definition, buffer, pos)
+            pos += definition.size
+
+    def _wants_timestamp(self, definition: _Definition) -> bool:
+        _, profile = self.wanted[definition.global_num]
+        return TIMESTAMP_FIELD in profile
+
+    def _parse_definition(self, buffer, pos: int, has_dev_fields: bool):
+        global_num, endian, field_defs, dev_size, pos = _read_definition(buffer, pos, has_dev_fields)
+        size = sum(f[1] for f in field_defs) + dev_size
+        definition = _Definition(global_num, size, endian)
+
+        offset = 0
+        for number, field_size, base_type in field_defs:
+            if number == TIMESTAMP_FIELD and field_size == 4:
+                definition.timestamp_struct = struct.Struct(endian + 'I')
+                definition.timestamp_offset = offset
+            offset += field_size
+
+        if global_num in self.wanted:
+            definition.name, profile = self.wanted[global_num]
+            fmt = [endian]
+            for number, field_size, base_type in field_defs:
+                spec = profile.get(number)
+                code, base_size, invalid = BASE_TYPES.get(base_type & 0x1F, ('B', 1, None))
+                if spec is None or (code != 's' and field_size != base_size):
+                    fmt.append(f'{field_size}x')
+                    continue
+                name, kind, scale, value_offset = spec
+                fmt.append(f'{field_size}s' if code == 's' else code)
+                definition.fields.append((name, kind, scale, value_offset, invalid))
+            if dev_size:
+                fmt.append(f'{dev_size}x')
+            definition.struct = struct.Struct(''.join(fmt))
+        return definition, pos
+
+    @staticmethod
+    def _decode(definition: _Definition, buffer, pos: int) -> Dict[str, Any]:
+        values = definition.struct.unpack_from(buffer, pos)
+        message = {}
+        for (name, kind, scale, offset, invalid), raw in zip(definition.fields, values):
+            if isinstance(raw, bytes):
+                raw = raw.split(b'\x00', 1)[0].decode('utf-8', errors='replace')
+                if raw:
+                    message[name] = raw
+                continue
+            if raw == invalid or raw != raw:  # raw != raw: NaN em floats
+                continue
+            if kind is not None:
+                message[name] = _convert(raw, kind)
+            elif scale != 1 or offset:
+                message[name] = raw / scale - offset
+            else:
+                message[name] = raw
+        return message
+
+
+def _convert(raw: int, kind: str) -> Any:
+    """Same conversions FITParser applies to fitparse values."""
+    if kind == 'date_time':
+        return datetime.fromtimestamp(raw + FIT_EPOCH_OFFSET, timezone.utc).replace(tzinfo=None).isoformat()
+    if kind == 'semicircles':
+        return raw * SEMICIRCLES_TO_DEGREES
+    if kind == 'sport':
+        return SPORTS.get(raw, raw)
+    if kind == 'manufacturer':
+        return MANUFACTURERS.get(raw, raw)
+    return raw
+
+
+class _RecordLayout:
+    """Record definition compiled to a NumPy dtype spanning header + message."""
+
+    __slots__ = ('dtype', 'fields', 'size')
+
+    def __init__(self, endian: str, field_defs, wanted: Dict[int, tuple]):
+        names, formats, offsets = [], [], []
+        self.fields = []
+        offset = 1  # byte de cabeçalho
+        for number, field_size, base_type in field_defs:
+            spec = wanted.get(number)
+            if spec is not None:
+                code, base_size, invalid = BASE_TYPES.get(base_type & 0x1F, ('s', 1, None))
+                if code not in NUMPY_TYPES or field_size != base_size:
+                    raise UnsupportedFitError(f"Campo {spec[0]} com tipo/tamanho não suportado")
+                names.append(spec[0])
+                formats.append(endian + NUMPY_TYPES[code])
+                offsets.append(offset)
+                self.fields.append((spec, invalid))
+            offset += field_size
+        self.size = offset
+        self.dtype = np.dtype({'names': names, 'formats': formats, 'offsets': offsets,
+                               'itemsize': offset})
+
+
+class RecordDecoder:
+    """Fast path for the record stream: one NumPy gather per record definition.
+
+    The file is memory-mapped and the message walk only notes where each
+    record starts. The records of each definition are then gathered from a
+    byte-strided view of the map through the compiled dtype, and validity,
+    scale and offset are applied per column. Only the gathered records and
+    the output columns are allocated, never a copy of the whole file.
+    Session, lap and device messages are copied into a small FIT file for
+    fitparse, so summaries are identical to the generic path. Compressed
+    timestamp headers and developer fields in records raise
+    ``UnsupportedFitError`` so the caller can fall back to fitparse.
+    """
+
+    def __init__(self, fileish, fields: Iterable[str]):
+        self.fileish = fileish
+        names = set(fields)
+        _, profile = PROFILE['record']
+        self.wanted = {num: spec for num, spec in profile.items() if spec[0] in names}
+        self.record_num = PROFILE['record'][0]
+
+    def decode(self) -> Tuple[Dict[str, Tuple[np.ndarray, np.ndarray]], bytes]:
+        """``({field: (values, valid)}, FIT file with the summary messages)``.
+
+        Timestamps and positions keep their raw integers, like fitparse's
+        ``raw_value``; other fields come scaled.
+        """
+        data, close = _open_buffer(self.fileish)
+        try:
+            groups: List[Tuple[_RecordLayout, array]] = []
+            summary = []
+            pos = 0
+            while pos + 12 <= len(data):
+                header_size = data[pos]
+                protocol, profile_version, data_size = struct.unpack_from('<BHI', data, pos + 1)
+                if data[pos + 8:pos + 12] != b'.FIT':
+                    raise ValueError("Cabeçalho .FIT inválido")
+                end = pos + header_size + data_size
+                if end + 2 > len(data):
+                    raise ValueError("Arquivo .FIT truncado")
+                if fit_crc(data, start=pos, end=end + 2) != 0:
+                    raise ValueError("CRC do arquivo .FIT inválido")
+                kept = self._walk(data, pos + header_size, end, groups)
+                header = struct.pack('<BBHI4s', 12, protocol, profile_version, len(kept), b'.FIT')
+                summary.append(header + kept + struct.pack('<H', fit_crc(header + kept)))
+                pos = end + 2
+
+            return self._columns(data, groups), b''.join(summary)
+        finally:
+            close()
+
+    def _walk(self, data, pos: int, end: int, groups) -> bytes:
+        """Note record positions and collect summary messages; returns the latter."""
+        layouts: Dict[int, Optional[_RecordLayout]] = {}
+        sizes: Dict[int, int] = {}
+        keep: Dict[int, bool] = {}
+        kept = []
+        positions = None
+        current = None
+
+        while pos < end:
+            header = data[pos]
+            if header & 0x80:
+                raise UnsupportedFitError("Cabeçalho com timestamp comprimido")
+            local = header & 0x0F
+
+            if header & 0x40:
+                global_num, endian, field_defs, dev_size, next_pos = _read_definition(
+                    data, pos + 1, bool(header & 0x20))
+                sizes[local] = sum(f[1] for f in field_defs) + dev_size
+                keep[local] = global_num in SUMMARY_MESSAGES
+                if global_num == self.record_num:
+                    if dev_size:
+                        raise UnsupportedFitError("Record com campos de desenvolvedor")
+                    layouts[local] = _RecordLayout(endian, field_defs, self.wanted)
+                else:
+                    layouts[local] = None
+                kept.append(bytes(data[pos:next_pos]))
+                pos = next_pos
+                continue
+
+            layout = layouts.get(local)
+            if local not in sizes:
+                raise ValueError(f"Mensagem sem definição (tipo local {local})")
+            stride = sizes[local] + 1
+            if layout is not None:
+                if layout is not current:
+                    # Posições em int64 compactos (8 bytes por record)
+                    positions = array('q')
+                    groups.append((layout, positions))
+                    current = layout
+                # Records consecutivos com o mesmo cabeçalho
+                while pos < end and data[pos] == header:
+                    positions.append(pos)
+                    pos += stride
+                continue
+            if keep[local]:
+                kept.append(bytes(data[pos:pos + stride]))
+            pos += stride
+
+        if pos != end:
+            raise ValueError("Mensagem ultrapassa o fim dos dados")
+        return b''.join(kept)
+
+    def _columns(self, data, groups) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Decode the noted records straight into one preallocated array per field.
+
+        Records are gathered ``DECODE_CHUNK_RECORDS`` at a time, so besides
+        the output only one chunk of records is ever copied out of the file.
+        """
+        total = sum(len(positions) for _, positions in groups)
+        result: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        offset = 0
+        for layout, positions in groups:
+            # Um item do dtype começando em cada byte do arquivo: indexar pelas
+            # posições copia apenas os records, sem índice por byte
+            rows = np.ndarray(shape=(len(data) - layout.size + 1,), dtype=layout.dtype,
+                              buffer=data, strides=(1,))
+            starts = np.frombuffer(positions, dtype=np.int64)
+            for first in range(0, len(starts), DECODE_CHUNK_RECORDS):
+                block = rows[starts[first:first + DECODE_CHUNK_RECORDS]]
+                self._decode_block(layout, block, result, total, slice(offset, offset + len(block)))
+                offset += len(block)
+            del rows, starts
+        return result
+
+    @staticmethod
+    def _decode_block(layout: _RecordLayout, block: np.ndarray, result, total: int, window: slice):
+        """Validity, scale and offset of one chunk of records, written into ``result``."""
+        for spec, invalid in layout.fields:
+            name, kind, scale, value_offset = spec
+            values = block[name]
+            scaled = kind is None and (scale != 1 or value_offset)
+            floating = scaled or values.dtype.kind == 'f'
+            if name not in result:
+                result[name] = (np.zeros(total, dtype=np.float64 if floating else np.int64),
+                                np.zeros(total, dtype=bool))
+            elif floating and result[name][0].dtype.kind != 'f':
+                result[name] = (result[name][0].astype(np.float64), result[name][1])
+            out, valid = result[name]
+            if values.dtype.kind == 'f':
+                np.isnan(values, out=valid[window])
+                np.logical_not(valid[window], out=valid[window])
+            elif invalid is not None:
+                np.not_equal(values, invalid, out=valid[window])
+            else:
+                valid[window] = True
+            if scaled:
+                np.divide(values, scale, out=out[window])
+                out[window] -= value_offset
+            else:
+                out[window] = values
+
+
+class _DiscardList(list):
+    """List that drops appended items, so fitparse keeps no message cache."""
+
+    def append(self, item):
+        pass
+
+
+class StreamingFitFile(fitparse.FitFile):
+    """fitparse.FitFile that decodes in a single pass without caching messages.
+
+    ``get_messages`` becomes a one-shot generator: memory stays bounded by
+    what the caller keeps, not by the size of the file.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._messages = _DiscardList()
@@ -1,45 +1,229 @@
 from datetime import datetime
-import fitparse
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 import logging
 import json
+import os
+import time
+
+import numpy as np
+
+import parse_cache
+from fit_decoder import FitScanner, RecordDecoder, StreamingFitFile, UnsupportedFitError
+from metrics import StageTimer
+from streams import (
+    CHANNEL_DTYPES,
+    MASKED_CHANNELS,
+    RecordStreams,
+    RecordStreamsBuilder,
+    FIT_EPOCH_OFFSET,
+    semicircles_to_degrees,
+)
+
+# Decoder NumPy para records no parse colunar (0 força o fitparse)
+FAST_RECORD_DECODER = os.getenv("FAST_RECORD_DECODER", "1") == "1"
+
+# Incrementar quando a saída do parser mudar (invalida o cache de parse e marca os
+# workouts gravados por versões anteriores para `python reprocess.py`)
+PARSER_VERSION = 2
 
 class FITParser:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.essential_fields = {
             'session': ['sport', 'start_time', 'total_distance', 'total_elapsed_time',
-                      'avg_heart_rate', 'max_heart_rate', 'total_calories'],
+                      'avg_heart_rate', 'max_heart_rate', 'total_calories',
+                      'avg_speed', 'max_speed', 'total_ascent', 'total_descent'],
             'record': ['timestamp', 'position_lat', 'position_long', 'altitude',
-                      'heart_rate', 'cadence', 'speed', 'power'],
-            'lap': ['start_time', 'end_time', 'total_distance', 'total_elapsed_time']
+                      'distance', 'heart_rate', 'cadence', 'speed', 'power'],
+            'lap': ['start_time', 'end_time', 'total_distance', 'total_elapsed_time'],
+            'device_info': ['manufacturer', 'product', 'serial_number', 'software_version']
+        }
+        # Campos "enhanced" substituem os equivalentes de 16 bits
+        self.record_aliases = {
+            'enhanced_speed': 'speed',
+            'enhanced_altitude': 'altitude'
+        }
+        self.session_aliases = {
+            'enhanced_avg_speed': 'avg_speed',
+            'enhanced_max_speed': 'max_speed'
         }
     
-    def parse(self, file_path: str) -> Dict[str, Any]:
-        """Parse a FIT file and return structured data with enhanced validation."""
+    def parse(self, file_path: str, columnar: bool = False,
+              timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+        """Parse a FIT file and return structured data with enhanced validation.
+
+        With ``columnar=True`` the records are returned as ``RecordStreams``
+        (one typed array per channel) instead of a list of dicts. ``timer``
+        receives the time spent opening the file, decoding messages,
+        converting records and building the summary.
+        """
+        timer = timer or StageTimer()
+        if columnar and FAST_RECORD_DECODER:
+            try:
+                return self._parse_fast(file_path, timer)
+            except UnsupportedFitError as e:
+                self.logger.info(f"Decoder rápido indisponível para {file_path} ({e}); usando fitparse")
+            except Exception as e:
+                self.logger.exception(f"FATAL: Failed to parse FIT file {file_path}")
+                raise ValueError(f"Falha na análise do arquivo FIT: {str(e)}") from e
         try:
-            fitfile = fitparse.FitFile(file_path)
+            with timer.stage('open'):
+                fitfile = StreamingFitFile(file_path)
+            summary = {'session': [], 'lap': [], 'device_info': []}
+            
+            # Um único passe pelo arquivo: records seguem direto para o
+            # processamento, as demais mensagens (poucas) ficam guardadas.
+            # O tempo dentro do decoder é separado do tempo de conversão.
+            decode_seconds = 0.0
+
+            def record_messages():
+                nonlocal decode_seconds
+                messages = fitfile.get_messages(['record', *summary])
+                while True:
+                    start = time.perf_counter()
+                    message = next(messages, None)
+                    decode_seconds += time.perf_counter() - start
+                    if message is None:
+                        return
+                    if message.name == 'record':
+                        yield message
+                    else:
+                        summary[message.name].append(message)
+            
+            start = time.perf_counter()
+            records = (self._process_records_columnar(record_messages()) if columnar
+                       else self._process_records(record_messages()))
+            timer.add('decode', decode_seconds)
+            timer.add('records', time.perf_counter() - start - decode_seconds)
             
-            # Enable data caching for better performance
-            fitfile.parse()
+            with timer.stage('summary'):
+                return {
+                    'metadata': self._process_session(summary['session']),
+                    'records': records,
+                    'laps': self._process_laps(summary['lap']),
+                    'device_info': self._process_device_info(summary['device_info'])
+                }
             
+        except Exception as e:
+            self.logger.exception(f"FATAL: Failed to parse FIT file {file_path}")
+            raise ValueError(f"Falha na análise do arquivo FIT: {str(e)}") from e
+
+    def _parse_fast(self, file_path: str, timer: StageTimer) -> Dict[str, Any]:
+        """Columnar parse with ``RecordDecoder``; summaries still go through fitparse."""
+        fields = self.essential_fields['record'] + list(self.record_aliases)
+        with timer.stage('decode'):
+            columns, summary_fit = RecordDecoder(file_path, fields).decode()
+        with timer.stage('records'):
+            records = self._streams_from_columns(columns)
+        self.logger.info(f"Processed {len(records)} valid records")
+
+        with timer.stage('summary'):
+            summary = {'session': [], 'lap': [], 'device_info': []}
+            for message in StreamingFitFile(summary_fit).get_messages(list(summary)):
+                summary[message.name].append(message)
             return {
-                'metadata': self._process_session(fitfile),
-                'records': self._process_records(fitfile),
-                'laps': self._process_laps(fitfile),
-                'device_info': self._process_device_info(fitfile)
+                'metadata': self._process_session(summary['session']),
+                'records': records,
+                'laps': self._process_laps(summary['lap']),
+                'device_info': self._process_device_info(summary['device_info'])
             }
-            
+
+    def _streams_from_columns(self, columns: Dict[str, tuple]) -> RecordStreams:
+        """Same streams as ``_process_records_columnar``, from decoded columns.
+
+        Applies the record aliases, drops records without timestamp,
+        position or heart rate and fills missing samples like
+        ``RecordStreamsBuilder``. ``columns`` is consumed: each decoded
+        column is released once its channel is built.
+        """
+        for enhanced, name in self.record_aliases.items():
+            if enhanced not in columns:
+                continue
+            values, valid = columns.pop(enhanced)
+            if name in columns:
+                base_values, base_valid = columns[name]
+                values = np.where(valid, values, base_values)
+                valid = valid | base_valid
+            columns[name] = (values, valid)
+
+        count = len(next(iter(columns.values()))[0]) if columns else 0
+        keep = np.zeros(count, dtype=bool)
+        for name in ('timestamp', 'position_lat', 'heart_rate'):
+            if name in columns:
+                keep |= columns[name][1]
+        # Sem records descartados não há por que copiar as colunas
+        keep = None if keep.all() else keep
+
+        streams, masks = {}, {}
+        for channel in self.essential_fields['record']:
+            dtype = np.dtype(CHANNEL_DTYPES.get(channel, np.float64))
+            values, valid = columns.pop(channel, (np.zeros(count), np.zeros(count, dtype=bool)))
+            if keep is not None:
+                values, valid = values[keep], valid[keep]
+            if dtype.kind == 'f':
+                streams[channel] = np.where(valid, values, np.nan).astype(dtype)
+            else:
+                streams[channel] = np.where(valid, values, 0).astype(dtype)
+                if channel in MASKED_CHANNELS:
+                    masks[channel] = valid
+        return self._finalize_streams(RecordStreams(streams, masks))
+
+    def parse_summary(self, file_path: str) -> Dict[str, Any]:
+        """Session, laps and device info without decoding the record stream.
+
+        Only the fields listed in ``essential_fields`` are decoded; record
+        messages are skipped by size.
+        """
+        try:
+            scanner = FitScanner(file_path, {
+                'session': self.essential_fields['session'] + list(self.session_aliases) + ['timestamp'],
+                'lap': self.essential_fields['lap'] + ['timestamp'],
+                'device_info': self.essential_fields['device_info'] + ['timestamp']
+            })
+            summary = {'session': [], 'lap': [], 'device_info': []}
+            for name, message in scanner:
+                summary[name].append(message)
+        except Exception as e:
+            self.logger.exception(f"FATAL: Failed to scan FIT file {file_path}")
+            raise ValueError(f"Falha na análise do arquivo FIT: {str(e)}") from e
+        
+        session_data = {}
+        for session in summary['session']:
+            session_data.update(session)
+        return {
+            'metadata': self._enhance_session_data(session_data),
+            'laps': summary['lap'],
+            'device_info': summary['device_info'][0] if summary['device_info'] else None
+        }
+
+    def iter_records(self, file_path: str, chunk_size: int = 4096) -> Iterator[RecordStreams]:
+        """Yield the record stream as columnar chunks of up to ``chunk_size`` samples.
+
+        Decoding is lazy: only as much of the file is read as the consumer pulls.
+        """
+        builder = RecordStreamsBuilder(self.essential_fields['record'])
+        try:
+            fitfile = StreamingFitFile(file_path)
+            for record in fitfile.get_messages("record"):
+                sample = self._record_sample(record)
+                if self._is_valid_record(sample):
+                    builder.append(sample)
+                if len(builder) >= chunk_size:
+                    yield self._finalize_streams(builder.build())
+                    builder = RecordStreamsBuilder(self.essential_fields['record'])
         except Exception as e:
             self.logger.exception(f"FATAL: Failed to parse FIT file {file_path}")
             raise ValueError(f"Falha na análise do arquivo FIT: {str(e)}") from e
+        
+        if len(builder):
+            yield self._finalize_streams(builder.build())
 
-    def _process_records(self, fitfile) -> List[Dict[str, Any]]:
+    def _process_records(self, messages: Iterable) -> List[Dict[str, Any]]:
         """Enhanced record processing with data validation."""
         records = []
         valid_records = 0
         
-        for record in fitfile.get_messages("record"):
+        for record in messages:
             try:
                 record_data = self._process_message(record)
                 
@@ -54,23 +238,66 @@ class FITParser:
         self.logger.info(f"Processed {valid_records} valid records")
         return records
 
-    def _process_session(self, fitfile) -> Dict[str, Any]:
+    def _process_records_columnar(self, messages: Iterable) -> RecordStreams:
+        """Record processing into typed per-channel arrays.
+
+        Raw values are collected per channel and converted in a single
+        vectorized pass (FIT epoch to Unix epoch, semicircles to degrees).
+        """
+        builder = RecordStreamsBuilder(self.essential_fields['record'])
+        
+        for record in messages:
+            sample = self._record_sample(record)
+            if self._is_valid_record(sample):
+                builder.append(sample)
+        
+        streams = self._finalize_streams(builder.build())
+        self.logger.info(f"Processed {len(streams)} valid records")
+        return streams
+
+    def _record_sample(self, record) -> Dict[str, Any]:
+        """Raw channel values of one record message (essential fields only)."""
+        wanted = self.essential_fields['record']
+        sample = {}
+        for field in record.fields:
+            if field.value is None:
+                continue
+            name = self.record_aliases.get(field.name, field.name)
+            if name not in wanted:
+                continue
+            if name in ('timestamp', 'position_lat', 'position_long'):
+                sample[name] = field.raw_value
+            else:
+                sample[name] = field.value
+        return sample
+
+    @staticmethod
+    def _finalize_streams(streams: RecordStreams) -> RecordStreams:
+        """Vectorized unit conversion of raw timestamp and position columns."""
+        if 'timestamp' in streams:
+            streams.columns['timestamp'] += FIT_EPOCH_OFFSET
+        for channel in ('position_lat', 'position_long'):
+            if channel in streams:
+                streams.columns[channel] = semicircles_to_degrees(streams[channel])
+        return streams
+
+    def _process_session(self, messages: Iterable) -> Dict[str, Any]:
         """Session data with complete workout summary."""
         session_data = {}
-        for session in fitfile.get_messages("session"):
+        for session in messages:
             session_data.update(self._process_message(session))
         
         # Convert and enhance session data
         session_data = self._enhance_session_data(session_data)
         return session_data
 
-    def _process_laps(self, fitfile) -> List[Dict[str, Any]]:
+    def _process_laps(self, messages: Iterable) -> List[Dict[str, Any]]:
         """Lap processing with additional metrics."""
-        return [self._process_message(lap) for lap in fitfile.get_messages("lap")]
+        return [self._process_message(lap) for lap in messages]
 
-    def _process_device_info(self, fitfile) -> Optional[Dict[str, Any]]:
+    def _process_device_info(self, messages: Iterable) -> Optional[Dict[str, Any]]:
         """Extract device information if available."""
-        for device in fitfile.get_messages("device_info"):
+        for device in messages:
             return self._process_message(device)
         return None
 
@@ -102,6 +329,11 @@ class FITParser:
 
     def _enhance_session_data(self, session_data: Dict[str, Any]) -> Dict[str, Any]:
         """Add derived metrics and ensure data completeness."""
+        # Fill 16-bit speed fields from their "enhanced" counterparts
+        for enhanced, field in self.session_aliases.items():
+            if session_data.get(field) is None and session_data.get(enhanced) is not None:
+                session_data[field] = session_data[enhanced]
+        
         # Calculate pace if available
         if 'speed' in session_data and session_data['speed']:
             session_data['avg_pace'] = self._calculate_pace(session_data['speed'])
@@ -127,4 +359,34 @@ class FITParser:
         pace_sec_per_km = 1000 / speed_mps
         minutes = int(pace_sec_per_km // 60)
         seconds = int(pace_sec_per_km % 60)
-        return f"{minutes}:{seconds:02d} min/km"
\ No newline at end of file
+        return f"{minutes}:{seconds:02d} min/km"
+
+def parse_fit_file(source, content_hash: Optional[str] = None,
+                   timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+    """Columnar parse entry point, picklable for use in worker processes.
+
+    When ``content_hash`` is given, results are shared through the
+    content-addressed parse cache, so identical files are parsed once.
+    The result carries ``parser_version``, stamped on the stored workout.
+    """
+    timer = timer or StageTimer()
+    if content_hash:
+        with timer.stage('cache_get'):
+            cached = parse_cache.get(content_hash, PARSER_VERSION)
+        if cached is not None:
+            cached['parser_version'] = PARSER_VERSION
+            return cached
+    
+    workout_data = FITParser().parse(source, columnar=True, timer=timer)
+    
+    if content_hash:
+        with timer.stage('cache_put'):
+            parse_cache.put(content_hash, PARSER_VERSION, workout_data)
+    workout_data['parser_version'] = PARSER_VERSION
+    return workout_data
+
+
+def parse_fit_file_timed(source, content_hash: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """``parse_fit_file`` plus its stage timings, returned to the calling process."""
+    timer = StageTimer()
+    return parse_fit_file(source, content_hash, timer), timer.timings
@@ -0,0 +1,90 @@
+"""Funções geográficas vetorizadas (NumPy) sobre trilhas GPS em graus."""
+from typing import Tuple
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in meters; arguments broadcast like NumPy arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def project(lat: np.ndarray, lon: np.ndarray, lat0: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Equirectangular projection to meters around latitude ``lat0``.
+
+    Accurate to well under a meter over the extent of a single workout.
+    """
+    scale = np.radians(1.0) * EARTH_RADIUS_M
+    return lon * scale * np.cos(np.radians(lat0)), lat * scale
+
+
+def simplify(lat: np.ndarray, lon: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """Douglas-Peucker simplification; returns the indices of the kept points.
+
+    Iterative (no recursion limit on long tracks), with the distances of
+    each span to its chord computed in one vectorized step.
+    """
+    n = len(lat)
+    if n < 3:
+        return np.arange(n)
+    x, y = project(lat, lon, float(np.mean(lat)))
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        length = np.hypot(dx, dy)
+        if length > 0:
+            distances = np.abs(dx * py - dy * px) / length
+        else:
+            distances = np.hypot(px, py)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            index = first + 1 + farthest
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return np.flatnonzero(keep)
+
+
+def grid_cells(lat: np.ndarray, lon: np.ndarray, cell_deg: float) -> np.ndarray:
+    """Unique ``(cell_lat, cell_lon)`` rows of the grid cells the points fall in."""
+    cells = np.column_stack((np.floor(lat / cell_deg), np.floor(lon / cell_deg))).astype(np.int64)
+    return np.unique(cells, axis=0)
+
+
+def cells_around(lat: float, lon: float, radius_m: float, cell_deg: float) -> np.ndarray:
+    """Grid cells overlapping the box of ``radius_m`` around a point."""
+    dlat = np.degrees(radius_m / EARTH_RADIUS_M)
+    dlon = dlat / max(np.cos(np.radians(lat)), 1e-6)
+    lat_range = np.arange(np.floor((lat - dlat) / cell_deg), np.floor((lat + dlat) / cell_deg) + 1)
+    lon_range = np.arange(np.floor((lon - dlon) / cell_deg), np.floor((lon + dlon) / cell_deg) + 1)
+    return np.array([(a, b) for a in lat_range for b in lon_range], dtype=np.int64)
+
+
+def bounding_box(lat: float, lon: float, radius_m: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) of a circle, for SQL prefiltering."""
+    dlat = float(np.degrees(radius_m / EARTH_RADIUS_M))
+    dlon = dlat / max(float(np.cos(np.radians(lat))), 1e-6)
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def passes(distances: np.ndarray, radius_m: float) -> np.ndarray:
+    """Index of the closest point of each separate pass within ``radius_m``."""
+    inside = distances <= radius_m
+    if not inside.any():
+        return np.empty(0, dtype=np.int64)
+    edges = np.diff(inside.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    return np.array([start + int(np.argmin(distances[start:stop])) for start, stop in zip(starts, stops)],
+                    dtype=np.int64)
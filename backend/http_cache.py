@@ -0,0 +1,90 @@
+"""GET condicional (ETag / 304) e cache de respostas serializadas.
+
+Cada usuário tem um contador ``User.data_version`` incrementado na mesma
+transação de uploads, exclusões e alterações da conta. O ETag de uma
+listagem combina usuário, versão e query string: enquanto a versão não
+muda, o cliente recebe 304 sem corpo e o servidor reaproveita o JSON já
+serializado (LRU limitado por memória), sem consultar nem serializar de
+novo.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import hashlib
+import json
+import os
+
+from fastapi import Request, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from cache import SizedLRUCache
+from models import User
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+# Configurações
+RESPONSE_CACHE_MB = float(os.getenv("RESPONSE_CACHE_MB", "64"))
+
+response_cache = SizedLRUCache("responses", max_bytes=int(RESPONSE_CACHE_MB * 2**20))
+
+
+def dumps(content: Any) -> bytes:
+    """JSON bytes; orjson when installed (datetimes em ISO 8601 nos dois casos)."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=lambda v: v.isoformat(), separators=(',', ':')).encode()
+
+
+def bump_data_version(db: Session, user_id: int):
+    """Invalidate the user's ETags and cached responses (no commit)."""
+    db.query(User).filter(User.id == user_id).update(
+        {User.data_version: func.coalesce(User.data_version, 0) + 1}, synchronize_session=False
+    )
+
+
+async def get_data_version(db: AsyncSession, user_id: int) -> int:
+    version = (await db.execute(select(User.data_version).where(User.id == user_id))).scalar()
+    return version or 0
+
+
+def make_etag(user_id: int, version: int, route: str, query: str) -> str:
+    digest = hashlib.sha1(f"{route}?{query}".encode()).hexdigest()[:16]
+    return f'"{user_id}-{version}-{digest}"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return etag in candidates or '*' in candidates
+
+
+async def conditional_json(request: Request, db: AsyncSession, user_id: int,
+                           build: Callable[[], Awaitable[Tuple[Any, Dict[str, str]]]]) -> Response:
+    """JSON response for a per-user GET, with ETag, 304 and cached serialization.
+
+    ``build`` returns the content and extra headers; it only runs when the
+    response for this version and query string is not cached.
+    """
+    version = await get_data_version(db, user_id)
+    route = request.scope.get('route')
+    path = getattr(route, 'path', request.url.path)
+    query = '&'.join(sorted(request.url.query.split('&'))) if request.url.query else ''
+    etag = make_etag(user_id, version, path, query)
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if _matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    key = (user_id, version, path, query)
+    cached: Optional[Tuple[bytes, Dict[str, str]]] = response_cache.get(key)
+    if cached is None:
+        content, extra = await build()
+        body = dumps(content)
+        cached = (body, extra)
+        response_cache.set(key, cached, len(body) + sum(len(k) + len(v) for k, v in extra.items()))
+    body, extra = cached
+    return Response(content=body, media_type='application/json', headers={**headers, **extra})
@@ -0,0 +1,177 @@
+from datetime import datetime
+from typing import Dict, Any, Optional
+import json
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from comparison import invalidate_grids
+from curves import delete_curves, store_curves
+from database import SessionLocal
+from http_cache import bump_data_version
+from metrics import stage
+from models import Workout
+import parse_cache
+from previews import delete_previews, store_previews
+from reports import delete_cached_reports
+from rollups import add_to_rollups, remove_from_rollups
+from stream_store import delete_streams, write_streams
+from tracks import delete_track, index_track
+from zones import delete_zone_times, store_zone_times
+
+
+def find_duplicate(db: Session, user_id: int, content_hash: str) -> Optional[Workout]:
+    """Workout já enviado pelo usuário com o mesmo conteúdo."""
+    return db.query(Workout).filter(
+        Workout.user_id == user_id,
+        Workout.content_hash == content_hash
+    ).first()
+
+
+def build_workout(user_id: int, filename: str, content_hash: Optional[str],
+                  workout_data: Dict[str, Any]) -> Workout:
+    """Monta o Workout (colunas de resumo) a partir do resultado do parser."""
+    metadata = workout_data['metadata']
+
+    # Converte datas para datetime (com tratamento de None)
+    start_time = datetime.fromisoformat(metadata['start_time']) if metadata.get('start_time') else None
+    end_time = datetime.fromisoformat(metadata['end_time']) if metadata.get('end_time') else None
+
+    # Cria o workout com tratamento de campos opcionais
+    return Workout(
+        user_id=user_id,
+        filename=filename,
+        content_hash=content_hash,
+        activity_type=metadata.get('sport', 'unknown'),
+        start_time=start_time,
+        end_time=end_time,
+        duration=metadata.get('total_elapsed_time'),
+        distance=metadata.get('total_distance'),
+        calories=metadata.get('total_calories', 0),
+        avg_hr=metadata.get('avg_heart_rate'),
+        max_hr=metadata.get('max_heart_rate'),
+        avg_speed=metadata.get('avg_speed'),
+        max_speed=metadata.get('max_speed'),
+        ascent=metadata.get('total_ascent'),
+        descent=metadata.get('total_descent'),
+        raw_data=json.dumps({k: v for k, v in workout_data.items() if k not in ('records', 'parser_version')}),
+        processed=True,
+        parser_version=workout_data.get('parser_version')
+    )
+
+
+def add_workout(db: Session, workout: Workout, workout_data: Dict[str, Any]) -> Workout:
+    """Adiciona o workout e seus dados derivados à sessão, sem commit.
+
+    Permite que importações em lote agrupem vários workouts por transação.
+    """
+    with stage('ingest', 'insert'):
+        db.add(workout)
+        db.flush()
+    _add_derived(db, workout, workout_data['records'])
+    return workout
+
+
+def _add_derived(db: Session, workout: Workout, records):
+    with stage('ingest', 'streams'):
+        write_streams(db, workout.id, records)
+    with stage('ingest', 'curves'):
+        store_curves(db, workout, records)
+    with stage('ingest', 'track'):
+        index_track(db, workout, records)
+    with stage('ingest', 'previews'):
+        store_previews(db, workout, records)
+    with stage('ingest', 'zones'):
+        store_zone_times(db, workout, records)
+    with stage('ingest', 'rollups'):
+        add_to_rollups(db, workout)
+    bump_data_version(db, workout.user_id)
+
+
+def remove_workout(db: Session, workout: Workout):
+    """Remove o workout e seus dados derivados, sem commit (inverso de add_workout).
+
+    O parse em cache é apagado junto com o último workout com o mesmo conteúdo.
+    """
+    _remove_derived(db, workout)
+    db.delete(workout)
+    if workout.content_hash and not _content_in_use(db, workout.content_hash, workout.id):
+        parse_cache.remove(workout.content_hash)
+
+
+def _content_in_use(db: Session, content_hash: str, excluded_id: int) -> bool:
+    """Outro workout (de qualquer usuário) tem o mesmo conteúdo."""
+    return db.query(Workout.id).filter(
+        Workout.content_hash == content_hash,
+        Workout.id != excluded_id
+    ).first() is not None
+
+
+def _remove_derived(db: Session, workout: Workout):
+    remove_from_rollups(db, workout)
+    delete_curves(db, workout)
+    delete_track(db, workout.id)
+    delete_previews(db, workout.id)
+    delete_zone_times(db, workout.id)
+    delete_cached_reports(workout.id)
+    delete_streams(db, workout.id)
+    invalidate_grids(workout.id)
+    bump_data_version(db, workout.user_id)
+
+
+# Colunas regravadas ao reprocessar (id, usuário, arquivo e hash são mantidos)
+REPROCESSED_COLUMNS = (
+    'activity_type', 'start_time', 'end_time', 'duration', 'distance', 'calories', 'avg_hr',
+    'max_hr', 'avg_speed', 'max_speed', 'ascent', 'descent', 'raw_data', 'processed', 'parser_version'
+)
+
+
+def replace_workout(db: Session, workout: Workout, workout_data: Dict[str, Any]) -> Workout:
+    """Regrava resumo, séries e dados derivados com um novo parse, sem commit.
+
+    O workout mantém o id, então links e relatórios continuam válidos.
+    """
+    _remove_derived(db, workout)
+    rebuilt = build_workout(workout.user_id, workout.filename, workout.content_hash, workout_data)
+    for column in REPROCESSED_COLUMNS:
+        setattr(workout, column, getattr(rebuilt, column))
+    workout.training_stress = None
+    workout.zones_version = None
+    db.flush()
+    _add_derived(db, workout, workout_data['records'])
+    return workout
+
+
+def store_workout(user_id: int, filename: str, content_hash: Optional[str],
+                  workout_data: Dict[str, Any]) -> Workout:
+    """Persiste um workout em uma sessão própria (executa no pool de threads)."""
+    db = SessionLocal()
+    try:
+        with stage('ingest', 'build'):
+            workout = build_workout(user_id, filename, content_hash, workout_data)
+        add_workout(db, workout, workout_data)
+        with stage('ingest', 'commit'):
+            db.commit()
+            db.refresh(workout)
+        return workout
+    except IntegrityError:
+        # Upload idêntico concorrente venceu a corrida: devolve o existente
+        db.rollback()
+        existing = find_duplicate(db, user_id, content_hash)
+        if existing is None:
+            raise
+        return existing
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def lookup_duplicate(user_id: int, content_hash: str) -> Optional[Workout]:
+    """find_duplicate em uma sessão própria (executa no pool de threads)."""
+    db = SessionLocal()
+    try:
+        return find_duplicate(db, user_id, content_hash)
+    finally:
+        db.close()
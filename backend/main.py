@@ -1,46 +1,105 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, status
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from datetime import timedelta, datetime
-from fastapi.responses import JSONResponse, FileResponse
-from pydantic import BaseModel
-from typing import List
+from datetime import date, timedelta, datetime, timezone
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Dict, Any, Optional
 import os
 import json
+import base64
+import asyncio
+from functools import partial
 from pathlib import Path
 
 # Importações locais
-from database import get_db, engine
-from models import Base, User, Workout
+from database import dispose_engines, get_async_db, get_db
+from models import User, Workout, WorkoutTrack, ImportJob
 from auth import (
+    AuthenticatedUser,
+    deactivate_user,
     get_current_user,
     create_access_token,
     authenticate_user,
-    get_password_hash,
+    hash_password,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
-from fit_parser import FITParser
-from report_service import PDFReportGenerator
-
-# Cria as tabelas no banco de dados
-Base.metadata.create_all(bind=engine)
+from cache import cache_stats
+import metrics
+from curves import CURVE_CHANNELS, best_curve, workout_curve
+from http_cache import conditional_json
+from export import EXPORT_FORMATS, EXPORTERS, ExportUnavailableError, check_format, export_filename
+from bulk_import import IMPORT_DIR, create_or_resume_job, import_status, is_import_running, run_import
+from ingest import remove_workout, store_workout, lookup_duplicate
+from reports import MAX_REPORT_WORKOUTS, cached_report, start_report
+from rollups import default_load_range, get_rollups, get_training_load
+from stream_store import read_streams
+from tracks import (
+    MAX_SEGMENT_POINTS, SIMPLIFY_TOLERANCE_M, load_polyline, segment_efforts, validate_segment,
+    workouts_near
+)
+from previews import MAX_POINTS, get_polyline, get_series
+from utils import save_upload, UploadTooLargeError
+from zones import ZONE_KINDS, get_zone_totals, get_zones, save_zones, start_recompute
+from workers import worker_pool, job_registry, QueueFullError
 
 app = FastAPI()
 
+MAX_PAGE_SIZE = 500
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+MAX_ARCHIVE_BYTES = int(os.getenv("MAX_ARCHIVE_BYTES", str(10 * 1024**3)))
+# Em produção o schema é criado por `python migrations.py` antes do deploy
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "1") == "1"
+
+# Latência por rota, requests em andamento e profiler de requests lentos
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Configuração CORS
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+@app.on_event("startup")
+def init_db():
+    """Cria/atualiza o schema na inicialização, fora do caminho de import."""
+    if AUTO_CREATE_SCHEMA:
+        from migrations import init_schema
+        init_schema()
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    worker_pool.shutdown()
+    await dispose_engines()
+
 # Modelos Pydantic para requisições/respostas
 class UserCreate(BaseModel):
     username: str
     password: str
 
+class SegmentQuery(BaseModel):
+    # [[lat, lon], ...] do início ao fim do segmento
+    points: List[List[float]] = Field(..., min_length=2, max_length=MAX_SEGMENT_POINTS)
+    radius: float = 25.0  # metros
+
+    @field_validator('points')
+    @classmethod
+    def check_points(cls, points: List[List[float]]) -> List[List[float]]:
+        validate_segment(points)
+        return points
+
+class ZonesUpdate(BaseModel):
+    # Limites entre zonas; null volta ao padrão, campo ausente não muda
+    heart_rate: Optional[List[float]] = None  # bpm, crescentes
+    power: Optional[List[float]] = None       # W, crescentes
+    pace: Optional[List[float]] = None        # s/km, decrescentes
+
 class WorkoutResponse(BaseModel):
     id: int
     filename: str
@@ -65,16 +124,19 @@ async def root():
 @app.post("/register", status_code=status.HTTP_201_CREATED)
 async def register_user(
     user_data: UserCreate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
+    existing_user = (await db.execute(
+        select(User.id).where(User.username == user_data.username)
+    )).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
-    
-    hashed_password = get_password_hash(user_data.password)
+    # Libera a conexão enquanto o bcrypt roda no pool de hashing
+    await db.rollback()
+    hashed_password = await hash_password(user_data.password)
     new_user = User(
         username=user_data.username,
         hashed_password=hashed_password,
@@ -82,16 +144,16 @@ async def register_user(
     )
     
     db.add(new_user)
-    db.commit()
+    await db.commit()
     return {"username": new_user.username, "message": "User created successfully"}
 
 # Autenticação
 @app.post("/token")
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -107,71 +169,564 @@ async def login_for_access_token(
 # Rotas protegidas
 @app.get("/users/me")
 async def read_users_me(
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # get_current_user já resolveu (e cacheou) o usuário
+    async def build():
+        return {"username": current_user.username, "is_active": current_user.is_active}, {}
+    return await conditional_json(request, db, current_user.id, build)
+
+@app.post("/users/me/deactivate")
+def deactivate_me(
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    deactivate_user(db, current_user.username)
+    return {"username": current_user.username, "is_active": False}
+
+@app.get("/users/me/zones")
+def read_my_zones(
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db_user = db.query(User).filter(User.username == current_user.username).first()
-    if not db_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    """Limites das zonas de FC, potência e pace (padrões onde não configurados)."""
+    return get_zones(db, current_user.id)
+
+@app.put("/users/me/zones", status_code=status.HTTP_202_ACCEPTED)
+async def update_my_zones(
+    zones: ZonesUpdate,
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """Salva as zonas e recalcula o tempo em zona dos workouts em background."""
+    try:
+        version = await worker_pool.run_db(save_zones, current_user.id, zones.model_dump(exclude_unset=True))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job_id = start_recompute(current_user.id)
     return {
-        "username": db_user.username,
-        "is_active": db_user.is_active
+        "version": version,
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}"
     }
 
-@app.post("/upload-workout/", response_model=WorkoutResponse)
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    """Métricas no formato texto do Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache-stats")
+async def get_cache_stats(
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """Taxa de acerto e latência de lookup dos caches em memória."""
+    return cache_stats()
+
+async def _ingest_workout(user_id: int, filename: str, content_hash: str,
+                          path: str) -> Workout:
+    """Parse no pool de processos e persistência no pool de threads.
+
+    Libera o slot de upload reservado pelo endpoint ao terminar.
+    """
+    from fit_parser import parse_fit_file_timed
+
+    try:
+        with metrics.stage('upload', 'parse'):
+            workout_data, timings = await worker_pool.run_cpu(parse_fit_file_timed, path, content_hash)
+        metrics.observe_stages('parse', timings)
+        with metrics.stage('upload', 'store'):
+            return await worker_pool.run_db(store_workout, user_id, filename, content_hash, workout_data)
+    finally:
+        worker_pool.release()
+
+@app.post(
+    "/upload-workout/",
+    response_model=WorkoutResponse,
+    responses={202: {"description": "Upload aceito para processamento em background"}}
+)
 async def upload_workout(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    background: bool = False,
+    current_user: AuthenticatedUser = Depends(get_current_user)
 ):
     if not file.filename.endswith('.fit'):
         raise HTTPException(status_code=400, detail="Apenas arquivos .FIT são aceitos")
     
     try:
-        # Processa o arquivo
-        contents = await file.read()
-        parser = FITParser()
-        workout_data = parser.parse(contents)
-        
-        # Converte datas para datetime (com tratamento de None)
-        start_time = datetime.fromisoformat(workout_data['metadata']['start_time']) if 'start_time' in workout_data['metadata'] else None
-        end_time = datetime.fromisoformat(workout_data['metadata']['end_time']) if 'end_time' in workout_data['metadata'] else None
-        
-        # Cria o workout com tratamento de campos opcionais
-        workout = Workout(
-            user_id=current_user.id,
-            filename=file.filename,
-            activity_type=workout_data['metadata'].get('sport', 'unknown'),
-            start_time=start_time,
-            end_time=end_time,
-            duration=workout_data['metadata'].get('total_elapsed_time'),
-            distance=workout_data['metadata'].get('total_distance'),
-            calories=workout_data['metadata'].get('total_calories', 0),
-            avg_hr=workout_data['metadata'].get('avg_heart_rate'),
-            max_hr=workout_data['metadata'].get('max_heart_rate'),
-            avg_speed=workout_data['metadata'].get('avg_speed'),
-            max_speed=workout_data['metadata'].get('max_speed'),
-            ascent=workout_data['metadata'].get('total_ascent'),
-            descent=workout_data['metadata'].get('total_descent'),
-            raw_data=json.dumps(workout_data),
-            processed=True
+        worker_pool.acquire()
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Fila de uploads cheia: {str(e)}",
+            headers={"Retry-After": "5"}
         )
-        
-        db.add(workout)
-        db.commit()
-        db.refresh(workout)
-        return workout
-        
-    except json.JSONDecodeError as e:
+    
+    try:
+        # Grava em disco em chunks calculando o hash do conteúdo
+        with metrics.stage('upload', 'save'):
+            path, content_hash = await save_upload(file, max_bytes=MAX_UPLOAD_BYTES)
+        with metrics.stage('upload', 'dedupe'):
+            duplicate = await worker_pool.run_db(lookup_duplicate, current_user.id, content_hash)
+    except UploadTooLargeError as e:
+        worker_pool.release()
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except Exception:
+        worker_pool.release()
+        raise
+    
+    if duplicate is not None:
+        worker_pool.release()
+        return duplicate
+    
+    ingest = _ingest_workout(current_user.id, file.filename, content_hash, str(path))
+    if background:
+        job_id = job_registry.submit(current_user.id, ingest)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"job_id": job_id, "status": "pending", "status_url": f"/jobs/{job_id}"}
+        )
+    
+    try:
+        return await ingest
+    except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Arquivo FIT inválido: {str(e)}")
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao processar arquivo: {str(e)}")
 
+@app.get("/jobs/{job_id}")
+async def get_job_status(
+    job_id: str,
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    job = job_registry.get(job_id)
+    if not job or job['user_id'] != current_user.id:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return {
+        "job_id": job['id'],
+        "status": job['status'],
+        "error": job['error'],
+        "workout": WorkoutResponse.model_validate(job['result']) if isinstance(job['result'], Workout) else None,
+        "result": job['result'] if isinstance(job['result'], dict) else None
+    }
+
+@app.post("/import-archive/", status_code=status.HTTP_202_ACCEPTED)
+async def import_archive(
+    file: UploadFile = File(...),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """Importa um ZIP com vários .FIT (ex.: export do Garmin) em background.
+
+    Reenviar o mesmo arquivo retoma a importação anterior.
+    """
+    if not file.filename.lower().endswith('.zip'):
+        raise HTTPException(status_code=400, detail="Apenas arquivos .ZIP são aceitos")
+    
+    try:
+        path, archive_hash = await save_upload(
+            file, max_bytes=MAX_ARCHIVE_BYTES, directory=IMPORT_DIR, suffix='.zip'
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    
+    job = await worker_pool.run_db(create_or_resume_job, current_user.id, str(path), archive_hash)
+    if job['status'] != 'done' and not is_import_running(job['id']):
+        loop = asyncio.get_running_loop()
+        job_registry.submit(current_user.id, loop.run_in_executor(
+            None, partial(run_import, job['id'], executor=worker_pool.cpu_executor,
+                          workers=worker_pool.parse_workers)
+        ))
+    return {"import_id": job['id'], "status_url": f"/imports/{job['id']}"}
+
+@app.get("/imports/{import_id}")
+def get_import_status(
+    import_id: int,
+    details: bool = False,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    job = db.query(ImportJob.id).filter(
+        ImportJob.id == import_id,
+        ImportJob.user_id == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Importação não encontrada")
+    return import_status(db, import_id, details=details)
+
+def _encode_cursor(start_time: datetime, workout_id: int) -> str:
+    raw = f"{start_time.isoformat()}|{workout_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        start_time, workout_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(start_time), int(workout_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
 @app.get("/workouts/", response_model=List[WorkoutResponse])
 async def get_workouts(
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    activity_type: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Lista paginada por cursor (keyset), do workout mais recente ao mais antigo.
+
+    Carrega apenas as colunas da resposta. O cursor da próxima página vem
+    no header ``X-Next-Cursor``; ele é omitido na última página. Responde
+    304 a ``If-None-Match`` enquanto os workouts do usuário não mudarem.
+    """
+    columns = [getattr(Workout, field) for field in WorkoutResponse.model_fields]
+    query = select(*columns).where(
+        Workout.user_id == current_user.id,
+        Workout.start_time.isnot(None)
+    )
+    
+    if activity_type:
+        query = query.where(Workout.activity_type == activity_type)
+    if start_date:
+        query = query.where(Workout.start_time >= start_date)
+    if end_date:
+        query = query.where(Workout.start_time <= end_date)
+    if cursor:
+        cursor_time, cursor_id = _decode_cursor(cursor)
+        query = query.where(or_(
+            Workout.start_time < cursor_time,
+            and_(Workout.start_time == cursor_time, Workout.id < cursor_id)
+        ))
+    
+    query = query.order_by(Workout.start_time.desc(), Workout.id.desc()).limit(limit + 1)
+
+    async def build():
+        rows = (await db.execute(query)).all()
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = _encode_cursor(rows[-1].start_time, rows[-1].id)
+        return [dict(row._mapping) for row in rows], headers
+
+    return await conditional_json(request, db, current_user.id, build)
+
+@app.get("/workouts/compare")
+def compare_workouts(
+    ids: str,
+    axis: str = Query("distance", pattern="^(distance|time)$"),
+    split: Optional[float] = Query(None, gt=0),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Compara workouts alinhados por distância ou tempo, split a split.
+
+    ``ids`` é uma lista separada por vírgulas; ``split`` em metros ou segundos.
+    """
+    from comparison import WorkoutComparator
+
+    try:
+        workout_ids = [int(i) for i in ids.split(',') if i.strip()]
+        return WorkoutComparator.compare_workouts(
+            db, workout_ids, axis=axis, split=split, user_id=current_user.id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.delete("/workouts/{workout_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_workout(
+    workout_id: int,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    workout = db.query(Workout).filter(
+        Workout.id == workout_id,
+        Workout.user_id == current_user.id
+    ).first()
+    if not workout:
+        raise HTTPException(status_code=404, detail="Workout não encontrado")
+    remove_workout(db, workout)
+    db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@app.get("/workouts/{workout_id}/streams")
+def get_workout_streams(
+    workout_id: int,
+    channels: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Séries temporais do workout, apenas dos canais e intervalo pedidos.
+
+    ``channels`` é uma lista separada por vírgulas (ex.: ``heart_rate,power``).
+    """
+    workout_exists = db.query(Workout.id).filter(
+        Workout.id == workout_id,
+        Workout.user_id == current_user.id
+    ).first()
+    if not workout_exists:
+        raise HTTPException(status_code=404, detail="Workout não encontrado")
+    
+    streams = read_streams(
+        db,
+        workout_id,
+        channels=channels.split(',') if channels else None,
+        start=_to_epoch(start),
+        end=_to_epoch(end)
+    )
+    return {"workout_id": workout_id, "streams": streams.to_dict()}
+
+@app.get("/workouts/{workout_id}/curves")
+def get_workout_curves(
+    workout_id: int,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Curvas de média máxima do workout, calculadas no upload."""
+    workout_exists = db.query(Workout.id).filter(
+        Workout.id == workout_id,
+        Workout.user_id == current_user.id
+    ).first()
+    if not workout_exists:
+        raise HTTPException(status_code=404, detail="Workout não encontrado")
+    return {"workout_id": workout_id, "curves": workout_curve(db, workout_id)}
+
+@app.get("/curves/{channel}")
+def get_best_curve(
+    channel: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    workouts = db.query(Workout).filter(Workout.user_id == current_user.id).all()
-    return workouts
\ No newline at end of file
+    """Melhor esforço por duração: recordes de todos os tempos ou do período."""
+    if channel not in CURVE_CHANNELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Canal inválido; use um de: {', '.join(CURVE_CHANNELS)}"
+        )
+    return {
+        "channel": channel,
+        "points": best_curve(db, current_user.id, channel, start_date, end_date)
+    }
+
+@app.get("/dashboard/rollups")
+def get_dashboard_rollups(
+    period: str = Query("week", pattern="^(day|week|month)$"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    activity_type: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Totais por período e tipo de atividade, lidos dos rollups materializados."""
+    return {
+        "period": period,
+        "rollups": get_rollups(db, current_user.id, period, start_date, end_date, activity_type)
+    }
+
+@app.get("/dashboard/training-load")
+def get_dashboard_training_load(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Série diária de fitness (CTL), fadiga (ATL) e forma (TSB); padrão: 90 dias."""
+    start_date, end_date = default_load_range(start_date, end_date)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date deve ser anterior a end_date")
+    return {"series": get_training_load(db, current_user.id, start_date, end_date)}
+
+@app.get("/dashboard/zones")
+def get_dashboard_zones(
+    kind: str = Query("heart_rate", pattern=f"^({'|'.join(ZONE_KINDS)})$"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    activity_type: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Tempo em cada zona somado no período, lido dos histogramas pré-calculados."""
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date deve ser anterior a end_date")
+    return get_zone_totals(db, current_user.id, kind, start_date, end_date, activity_type)
+
+@app.get("/workouts/{workout_id}/track")
+def get_workout_track(
+    workout_id: int,
+    tolerance: float = Query(SIMPLIFY_TOLERANCE_M, ge=1, le=1000),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Bounding box e polyline da trilha GPS simplificada (Douglas-Peucker).
+
+    ``tolerance`` é o desvio máximo em metros; valores maiores geram menos pontos.
+    """
+    row = db.query(WorkoutTrack, Workout.parser_version).join(
+        Workout, Workout.id == WorkoutTrack.workout_id
+    ).filter(
+        WorkoutTrack.workout_id == workout_id,
+        WorkoutTrack.user_id == current_user.id
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Trilha não encontrada")
+    track, parser_version = row
+    if tolerance == SIMPLIFY_TOLERANCE_M:
+        polyline = load_polyline(track)
+    else:
+        polyline = get_polyline(db, workout_id, tolerance, parser_version)
+    return {
+        "workout_id": workout_id,
+        "bbox": [track.min_lat, track.min_lon, track.max_lat, track.max_lon],
+        "tolerance": tolerance,
+        "polyline": polyline.tolist() if polyline is not None else []
+    }
+
+@app.get("/tracks/near")
+def get_workouts_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(500.0, gt=0, le=50000),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Workouts que começam a até ``radius`` metros do ponto."""
+    return {"workouts": workouts_near(db, current_user.id, lat, lon, radius)}
+
+@app.post("/segments/efforts")
+def get_segment_efforts(
+    segment: SegmentQuery,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Workouts que passam pelo segmento, com o tempo de cada passagem."""
+    if not 0 < segment.radius <= 500:
+        raise HTTPException(status_code=400, detail="radius deve estar entre 0 e 500 metros")
+    try:
+        efforts = segment_efforts(db, current_user.id, segment.points, segment.radius)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"efforts": efforts}
+
+@app.get("/workouts/{workout_id}/streams/downsampled")
+def get_downsampled_streams(
+    workout_id: int,
+    points: int = Query(1000, ge=3, le=MAX_POINTS),
+    channels: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Séries reduzidas a ``points`` pontos por LTTB, como pares [timestamp, valor].
+
+    Preserva a forma do gráfico com uma fração do payload de /streams.
+    """
+    workout = db.query(Workout.parser_version).filter(
+        Workout.id == workout_id,
+        Workout.user_id == current_user.id
+    ).first()
+    if not workout:
+        raise HTTPException(status_code=404, detail="Workout não encontrado")
+    series = get_series(db, workout_id, points, channels.split(',') if channels else None,
+                        workout.parser_version)
+    return {"workout_id": workout_id, "points": points, "series": series}
+
+def _report_response(user_id: int, workout_ids: List[int], report_url: str):
+    """PDF em cache, ou 202 com o job que está gerando o relatório."""
+    path = cached_report(workout_ids)
+    if path is not None:
+        return FileResponse(path, media_type="application/pdf", filename=path.name)
+    try:
+        job_id = start_report(user_id, workout_ids, report_url)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Fila de relatórios cheia: {str(e)}",
+            headers={"Retry-After": "5"}
+        )
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"job_id": job_id, "status": "pending", "status_url": f"/jobs/{job_id}"}
+    )
+
+@app.get(
+    "/workouts/{workout_id}/report",
+    responses={202: {"description": "Relatório em geração; consulte status_url e repita o pedido"}}
+)
+async def get_workout_report(
+    workout_id: int,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Relatório PDF do workout, gerado em background e mantido em cache."""
+    workout_exists = (await db.execute(select(Workout.id).where(
+        Workout.id == workout_id,
+        Workout.user_id == current_user.id
+    ))).first()
+    if not workout_exists:
+        raise HTTPException(status_code=404, detail="Workout não encontrado")
+    return _report_response(current_user.id, [workout_id], f"/workouts/{workout_id}/report")
+
+@app.get(
+    "/reports",
+    responses={202: {"description": "Relatório em geração; consulte status_url e repita o pedido"}}
+)
+async def get_multi_report(
+    ids: str,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Relatório PDF de vários workouts (``ids`` separados por vírgula), renderizados em paralelo."""
+    try:
+        workout_ids = sorted({int(i) for i in ids.split(',') if i.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids inválidos")
+    if not 0 < len(workout_ids) <= MAX_REPORT_WORKOUTS:
+        raise HTTPException(status_code=400, detail=f"Informe de 1 a {MAX_REPORT_WORKOUTS} workouts")
+    owned = (await db.execute(select(func.count(Workout.id)).where(
+        Workout.id.in_(workout_ids),
+        Workout.user_id == current_user.id
+    ))).scalar()
+    if owned != len(workout_ids):
+        raise HTTPException(status_code=404, detail="Workout não encontrado")
+    report_url = f"/reports?ids={','.join(map(str, workout_ids))}"
+    return _report_response(current_user.id, workout_ids, report_url)
+
+@app.get("/export")
+async def export_workouts(
+    format: str = Query("csv", pattern=f"^({'|'.join(EXPORT_FORMATS)})$"),
+    records: bool = False,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    activity_type: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """Workouts do usuário (e, com ``records``, as séries) em CSV, GPX ou Parquet.
+
+    A resposta é gerada em streaming, lendo os workouts em lotes; GPX
+    sempre inclui os pontos da trilha e omite workouts sem GPS.
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date deve ser anterior a end_date")
+    try:
+        check_format(format)
+    except ExportUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    media_type = EXPORT_FORMATS[format][0]
+    filename = export_filename(format, records)
+    return StreamingResponse(
+        EXPORTERS[format](current_user.id, start_date, end_date, activity_type, records=records),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _to_epoch(value: Optional[datetime]) -> Optional[int]:
+    """Converte datetime (naive = UTC, como no FIT) para epoch em segundos."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
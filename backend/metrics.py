@@ -0,0 +1,349 @@
+"""Métricas no formato texto do Prometheus e profiler de amostragem opcional.
+
+Latências são ``summary`` com quantis (p50/p95/p99) calculados sobre uma
+janela deslizante das últimas ``METRICS_WINDOW`` observações por série;
+``_sum`` e ``_count`` são totais desde o início do processo. Gauges como
+filas e caches são lidos no momento do scrape.
+"""
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+import sys
+import threading
+import time
+
+# Configurações
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1024"))
+# Profiler: requests mais lentos que isso (ms) têm as pilhas gravadas; 0 desliga
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", Path(__file__).parent / "profiles"))
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+logger = logging.getLogger(__name__)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Summary:
+    """Observations per label set: sliding-window quantiles plus running sum/count."""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._windows: Dict[Tuple[str, ...], Deque[float]] = {}
+        self._totals: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            window = self._windows.get(label_values)
+            if window is None:
+                window = self._windows[label_values] = deque(maxlen=METRICS_WINDOW)
+                self._totals[label_values] = [0.0, 0]
+            window.append(value)
+            totals = self._totals[label_values]
+            totals[0] += value
+            totals[1] += 1
+
+    @contextmanager
+    def time(self, *label_values: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} summary"
+        with self._lock:
+            series = [(key, sorted(window), list(self._totals[key])) for key, window in self._windows.items()]
+        for key, ordered, (total, count) in sorted(series):
+            for q in QUANTILES:
+                value = ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+                quantile = 'quantile="%s"' % q
+                yield f"{self.name}{_format_labels(self.labels, key, quantile)} {value:.6f}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {total:.6f}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {count}"
+
+
+class Gauge:
+    """Value read from ``callback`` at scrape time: a number or ``{label values: number}``."""
+
+    def __init__(self, name: str, help: str, callback: Callable, labels: Tuple[str, ...] = (),
+                 kind: str = 'gauge'):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.labels = labels
+        self.kind = kind
+
+    def render(self) -> Iterable[str]:
+        try:
+            values = self.callback()
+        except Exception:
+            logger.exception(f"Falha ao ler a métrica {self.name}")
+            return
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {float(value):g}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(Summary(
+    "fit_tracker_http_request_seconds", "Latência dos requests HTTP.", ("method", "route", "status")
+))
+STAGE_SECONDS = registry.register(Summary(
+    "fit_tracker_stage_seconds", "Latência por etapa de um pipeline (upload, parse, ingest).",
+    ("pipeline", "stage")
+))
+
+_in_flight = 0
+
+
+def stage(pipeline: str, name: str):
+    """Context manager timing one stage: ``with stage('upload', 'save'): ...``."""
+    return STAGE_SECONDS.time(pipeline, name)
+
+
+def observe_stages(pipeline: str, timings: Dict[str, float]):
+    """Record timings measured elsewhere (ex.: no processo de parse)."""
+    for name, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, pipeline, name)
+
+
+class StageTimer:
+    """Accumulates named stage durations in a plain dict (picklable across processes)."""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+
+class SamplingProfiler:
+    """Samples every thread's stack while requests are in flight.
+
+    Slow requests get the samples taken during their lifetime written as
+    folded stacks (``thread;frame;frame count``), the input format of
+    flamegraph.pl, speedscope and inferno. Requests running at the same
+    time share the window, so their stacks appear together. Parsing in the
+    process pool is not sampled.
+    """
+
+    def __init__(self, interval: float, directory: Path):
+        self.interval = interval
+        self.directory = directory
+        # (número da amostra, pilha dobrada) das amostras recentes
+        self.samples: Deque[Tuple[int, str]] = deque(maxlen=200_000)
+        self.sequence = 0
+        self.active = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+
+    def begin(self) -> int:
+        with self._lock:
+            self.active += 1
+            self._wake.set()
+            return self.sequence
+
+    def end(self):
+        with self._lock:
+            self.active -= 1
+            if not self.active:
+                self._wake.clear()
+
+    def stacks_since(self, since: int) -> List[str]:
+        with self._lock:
+            return [stack for sequence, stack in self.samples if sequence > since]
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            self._wake.wait()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stacks.append(';'.join([names.get(ident, str(ident))] + frames[::-1]))
+            with self._lock:
+                self.sequence += 1
+                self.samples.extend((self.sequence, stack) for stack in stacks)
+            time.sleep(self.interval)
+
+    def dump(self, stacks: List[str], method: str, path: str, seconds: float) -> Optional[Path]:
+        if not stacks:
+            return None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        slug = ''.join(c if c.isalnum() else '_' for c in path.strip('/')) or 'root'
+        target = self.directory / f"{datetime.now():%Y%m%d-%H%M%S-%f}-{method}-{slug}-{int(seconds * 1000)}ms.folded"
+        target.write_text(''.join(f"{stack} {count}\n" for stack, count in Counter(stacks).items()))
+        return target
+
+
+profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000, PROFILE_DIR) if PROFILE_SLOW_MS > 0 else None
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request latency by route template, in-flight count, slow-request profiles."""
+
+    def __init__(self, app):
+        self.app = app
+        if profiler is not None:
+            profiler.start()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        global _in_flight
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        since = profiler.begin() if profiler is not None else None
+        _in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            seconds = time.perf_counter() - start
+            _in_flight -= 1
+            route = scope.get('route')
+            path = getattr(route, 'path', 'unmatched')
+            REQUEST_SECONDS.observe(seconds, scope['method'], path, str(status_code))
+            if profiler is not None:
+                profiler.end()
+                if seconds * 1000 >= PROFILE_SLOW_MS:
+                    target = profiler.dump(profiler.stacks_since(since), scope['method'], path, seconds)
+                    logger.warning(f"Request lento {scope['method']} {path} ({seconds * 1000:.0f} ms): {target}")
+
+
+def _executor_queue(executor) -> int:
+    if executor is None:
+        return 0
+    if hasattr(executor, '_work_queue'):
+        return executor._work_queue.qsize()
+    # ProcessPoolExecutor: itens submetidos ainda não concluídos
+    return len(getattr(executor, '_pending_work_items', ()))
+
+
+def _pool_queues():
+    from workers import worker_pool
+
+    return {
+        ('upload_slots',): worker_pool.pending,
+        ('cpu',): _executor_queue(worker_pool._cpu_executor),
+        ('db',): _executor_queue(worker_pool._db_executor),
+        ('hash',): _executor_queue(worker_pool._hash_executor),
+        ('report',): _executor_queue(worker_pool._report_executor),
+    }
+
+
+def _db_connections():
+    import database
+
+    engines = [('sync', database.engine)]
+    if database._async_engine is not None:
+        engines.append(('async', database._async_engine.sync_engine))
+    values = {}
+    for name, engine in engines:
+        pool = engine.pool
+        if hasattr(pool, 'checkedout'):
+            values[(name, 'checked_out')] = pool.checkedout()
+            values[(name, 'idle')] = pool.checkedin()
+            values[(name, 'overflow')] = max(pool.overflow(), 0)
+    return values
+
+
+def _cache_values(field: str):
+    from cache import CACHES
+
+    def read():
+        return {(name,): cache.stats()[field] for name, cache in CACHES.items()}
+    return read
+
+
+def _jobs():
+    from workers import job_registry
+
+    return dict(Counter((job['status'],) for job in job_registry.jobs.values()))
+
+
+registry.register(Gauge("fit_tracker_http_requests_in_flight", "Requests HTTP em andamento.",
+                        lambda: _in_flight))
+registry.register(Gauge("fit_tracker_pool_queue_depth",
+                        "Trabalhos aguardando em cada pool (upload_slots: uploads reservados).",
+                        _pool_queues, ("pool",)))
+registry.register(Gauge("fit_tracker_db_connections", "Conexões do pool do banco por estado.",
+                        _db_connections, ("engine", "state")))
+registry.register(Gauge("fit_tracker_jobs", "Jobs em background por status.", _jobs, ("status",)))
+registry.register(Gauge("fit_tracker_cache_hits_total", "Acertos por cache.",
+                        _cache_values('hits'), ("cache",), kind='counter'))
+registry.register(Gauge("fit_tracker_cache_misses_total", "Faltas por cache.",
+                        _cache_values('misses'), ("cache",), kind='counter'))
+registry.register(Gauge("fit_tracker_cache_hit_ratio", "Taxa de acerto por cache.",
+                        _cache_values('hit_ratio'), ("cache",)))
+registry.register(Gauge("fit_tracker_cache_entries", "Entradas por cache.",
+                        _cache_values('size'), ("cache",)))
+
+
+def render() -> str:
+    """Todas as métricas no formato texto do Prometheus (0.0.4)."""
+    return registry.render()
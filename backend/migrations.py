@@ -0,0 +1,217 @@
+"""Migrações de dados do banco.
+
+Uso:
+    python migrations.py
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+import json
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine
+from curves import CURVE_CHANNELS, store_curves
+from models import Base, Workout, WorkoutCurve, WorkoutStream, WorkoutTrack
+from rollups import add_to_rollups
+from stream_store import read_streams, write_streams
+from tracks import POSITION_CHANNELS, index_track
+from zones import recompute_zone_times
+from streams import RecordStreams, RecordStreamsBuilder
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+
+
+def load_raw_data(workout: Workout) -> Dict[str, Any]:
+    """Decode ``Workout.raw_data``, which is stored as a JSON-encoded string."""
+    raw = workout.raw_data
+    if raw is None:
+        return {}
+    if isinstance(raw, str):
+        return json.loads(raw)
+    return dict(raw)
+
+
+def records_to_streams(records: Any) -> RecordStreams:
+    """Convert stored records (columnar dict or legacy list of dicts) to streams."""
+    if isinstance(records, dict):
+        return RecordStreams.from_dict(records)
+
+    builder = RecordStreamsBuilder()
+    for record in records:
+        sample = dict(record)
+        sample.setdefault('speed', sample.get('enhanced_speed'))
+        sample.setdefault('altitude', sample.get('enhanced_altitude'))
+        if isinstance(sample.get('timestamp'), str):
+            timestamp = datetime.fromisoformat(sample['timestamp'])
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            sample['timestamp'] = int(timestamp.timestamp())
+        builder.append(sample)
+    return builder.build()
+
+
+def migrate_records_to_stream_store(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    """Move the per-sample records out of ``raw_data`` into ``workout_streams``."""
+    migrated = 0
+    last_id = 0
+    while True:
+        batch: List[Workout] = (
+            db.query(Workout)
+            .filter(Workout.id > last_id)
+            .order_by(Workout.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        for workout in batch:
+            last_id = workout.id
+            data = load_raw_data(workout)
+            if 'records' not in data:
+                continue
+            write_streams(db, workout.id, records_to_streams(data.pop('records')))
+            workout.raw_data = json.dumps(data)
+            migrated += 1
+        db.commit()
+        db.expunge_all()
+    return migrated
+
+
+def backfill_curves(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    """Compute mean-max curves (and PRs) for workouts stored before they existed."""
+    done = 0
+    last_id = 0
+    has_curves = db.query(WorkoutCurve.id).filter(WorkoutCurve.workout_id == Workout.id).exists()
+    while True:
+        batch: List[Workout] = (
+            db.query(Workout)
+            .filter(Workout.id > last_id, ~has_curves)
+            .order_by(Workout.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        for workout in batch:
+            last_id = workout.id
+            store_curves(db, workout, read_streams(db, workout.id, channels=CURVE_CHANNELS))
+            done += 1
+        db.commit()
+        db.expunge_all()
+    return done
+
+
+def backfill_rollups(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    """Fold workouts stored before the rollups existed into them."""
+    done = 0
+    while True:
+        batch: List[Workout] = (
+            db.query(Workout)
+            .filter(Workout.training_stress.is_(None))
+            .order_by(Workout.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        for workout in batch:
+            add_to_rollups(db, workout)
+            done += 1
+        db.commit()
+        db.expunge_all()
+    return done
+
+
+def backfill_tracks(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    """Add workouts with GPS stored before the spatial index existed to it."""
+    done = 0
+    last_id = 0
+    has_track = db.query(WorkoutTrack.workout_id).filter(WorkoutTrack.workout_id == Workout.id).exists()
+    has_gps = db.query(WorkoutStream.id).filter(
+        WorkoutStream.workout_id == Workout.id,
+        WorkoutStream.channel == 'position_lat'
+    ).exists()
+    while True:
+        batch: List[Workout] = (
+            db.query(Workout)
+            .filter(Workout.id > last_id, has_gps, ~has_track)
+            .order_by(Workout.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        for workout in batch:
+            last_id = workout.id
+            if index_track(db, workout, read_streams(db, workout.id, channels=POSITION_CHANNELS)):
+                done += 1
+        db.commit()
+        db.expunge_all()
+    return done
+
+
+def backfill_zones(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    """Compute time-in-zone for workouts stored before it existed or under older zones."""
+    done = 0
+    user_ids = [user_id for (user_id,) in db.query(Workout.user_id).distinct()]
+    for user_id in user_ids:
+        done += recompute_zone_times(db, user_id, batch_size)
+    return done
+
+
+def add_missing_columns():
+    """create_all não altera tabelas existentes; adiciona colunas novas (nullable)."""
+    inspector = inspect(engine)
+    existing_tables = inspector.get_table_names()
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                logger.info(f"Coluna {table.name}.{column.name} adicionada")
+
+
+def create_missing_indexes():
+    """create_all não cria índices novos em tabelas que já existem."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def init_schema():
+    """Cria/atualiza o schema (tabelas, colunas e índices novos); idempotente."""
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    create_missing_indexes()
+
+
+def run_migrations():
+    init_schema()
+    db = SessionLocal()
+    try:
+        migrated = migrate_records_to_stream_store(db)
+        logger.info(f"{migrated} workouts migrados para o stream store")
+        backfilled = backfill_curves(db)
+        logger.info(f"Curvas calculadas para {backfilled} workouts")
+        rolled_up = backfill_rollups(db)
+        logger.info(f"{rolled_up} workouts adicionados aos rollups")
+        indexed = backfill_tracks(db)
+        logger.info(f"{indexed} trilhas adicionadas ao índice espacial")
+        zoned = backfill_zones(db)
+        logger.info(f"Tempo em zona calculado para {zoned} workouts")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_migrations()
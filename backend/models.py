@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, JSON, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from database import Base
 from pydantic import BaseModel, Field, EmailStr
@@ -15,15 +15,22 @@ class User(Base):
     email = Column(String(100), unique=True)
     hashed_password = Column(String(255))
     is_active = Column(Boolean, default=True)
+    # Incrementado a cada mudança nos dados do usuário (ETag das listagens)
+    data_version = Column(Integer, default=0)
     created_at = Column(DateTime, server_default=func.now())
 
 # Modelo SQLAlchemy para Workout
 class Workout(Base):
     __tablename__ = "workouts"
+    __table_args__ = (
+        Index('ix_workouts_user_start_time', 'user_id', 'start_time'),
+        Index('uq_workouts_user_content_hash', 'user_id', 'content_hash', unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, index=True)
     filename = Column(String(255))
+    content_hash = Column(String(64), nullable=True)  # SHA256 do arquivo .FIT
     activity_type = Column(String(50))
     start_time = Column(DateTime)
     end_time = Column(DateTime, nullable=True)  # Adicione nullable=True
@@ -36,10 +43,210 @@ class Workout(Base):
     max_speed = Column(Float, nullable=True)
     ascent = Column(Integer, nullable=True)
     descent = Column(Integer, nullable=True)
+    training_stress = Column(Float, nullable=True)  # None = ainda fora dos rollups
+    zones_version = Column(Integer, nullable=True)  # versão das zonas aplicada; None = sem histograma
     raw_data = Column(JSON)
     processed = Column(Boolean, default=False)
+    parser_version = Column(Integer, nullable=True)  # fit_parser.PARSER_VERSION; None = anterior ao controle
     created_at = Column(DateTime, server_default=func.now())
 
+# Modelo SQLAlchemy para as séries temporais (um chunk comprimido por canal)
+class WorkoutStream(Base):
+    __tablename__ = "workout_streams"
+    __table_args__ = (
+        UniqueConstraint('workout_id', 'channel', 'chunk_index'),
+        Index('ix_workout_streams_range', 'workout_id', 'channel', 'start_ts'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    workout_id = Column(Integer, index=True, nullable=False)
+    channel = Column(String(32), nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    start_ts = Column(Integer)  # epoch do primeiro sample do chunk
+    end_ts = Column(Integer)    # epoch do último sample do chunk
+    dtype = Column(String(16), nullable=False)
+    count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)  # zlib(array.tobytes())
+    mask = Column(LargeBinary, nullable=True)   # zlib(np.packbits(valid))
+
+# Modelos SQLAlchemy para importação em lote (retomável)
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    __table_args__ = (
+        UniqueConstraint('user_id', 'archive_hash'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, index=True, nullable=False)
+    archive_path = Column(String(1024), nullable=False)
+    archive_hash = Column(String(64), nullable=False)
+    status = Column(String(20), default='pending')  # pending, running, done, failed
+    error = Column(String(1024), nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime, nullable=True)
+
+class ImportItem(Base):
+    __tablename__ = "import_items"
+    __table_args__ = (
+        UniqueConstraint('job_id', 'member_name'),
+        Index('ix_import_items_job_status', 'job_id', 'status'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, nullable=False)
+    member_name = Column(String(1024), nullable=False)
+    status = Column(String(20), default='pending')  # pending, done, duplicate, failed
+    workout_id = Column(Integer, nullable=True)
+    error = Column(String(1024), nullable=True)
+
+# Modelos SQLAlchemy para curvas de média máxima (best efforts)
+class WorkoutCurve(Base):
+    """Mean-max value of one channel over one window duration in a workout."""
+    __tablename__ = "workout_curves"
+    __table_args__ = (
+        UniqueConstraint('workout_id', 'channel', 'duration'),
+        Index('ix_workout_curves_user_channel', 'user_id', 'channel', 'start_time'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    workout_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    channel = Column(String(32), nullable=False)
+    duration = Column(Integer, nullable=False)  # segundos
+    value = Column(Float, nullable=False)
+    start_offset = Column(Integer)  # segundos desde o início do workout
+    start_time = Column(DateTime)   # início do workout (filtro por período)
+
+class PersonalRecord(Base):
+    """All-time best ``WorkoutCurve`` per user, channel and duration."""
+    __tablename__ = "personal_records"
+    __table_args__ = (
+        UniqueConstraint('user_id', 'channel', 'duration'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    channel = Column(String(32), nullable=False)
+    duration = Column(Integer, nullable=False)
+    value = Column(Float, nullable=False)
+    workout_id = Column(Integer, nullable=False)
+    start_offset = Column(Integer)
+    achieved_at = Column(DateTime)
+
+# Modelos SQLAlchemy para rollups de carga de treino
+class TrainingRollup(Base):
+    """Totals per user, activity type and day/week/month, kept incrementally."""
+    __tablename__ = "training_rollups"
+    __table_args__ = (
+        UniqueConstraint('user_id', 'period', 'period_start', 'activity_type'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    period = Column(String(8), nullable=False)  # day, week, month
+    period_start = Column(Date, nullable=False)
+    activity_type = Column(String(50), nullable=False)
+    count = Column(Integer, default=0)
+    distance = Column(Float, default=0.0)
+    duration = Column(Float, default=0.0)
+    calories = Column(Float, default=0.0)
+    ascent = Column(Float, default=0.0)
+    stress = Column(Float, default=0.0)
+
+class TrainingLoad(Base):
+    """Fitness (CTL) and fatigue (ATL) at the end of each day with training.
+
+    Days without a row only decay from the previous row, so the series is
+    stored sparsely.
+    """
+    __tablename__ = "training_load"
+    __table_args__ = (
+        UniqueConstraint('user_id', 'day'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False)
+    stress = Column(Float, default=0.0)
+    ctl = Column(Float, default=0.0)
+    atl = Column(Float, default=0.0)
+
+# Modelos SQLAlchemy para o índice espacial das trilhas GPS
+class WorkoutTrack(Base):
+    """Bounding box, start point and simplified polyline of a workout's track."""
+    __tablename__ = "workout_tracks"
+    __table_args__ = (
+        Index('ix_workout_tracks_user_start', 'user_id', 'start_lat', 'start_lon'),
+    )
+
+    workout_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    min_lat = Column(Float)
+    max_lat = Column(Float)
+    min_lon = Column(Float)
+    max_lon = Column(Float)
+    start_lat = Column(Float)
+    start_lon = Column(Float)
+    points = Column(Integer)
+    polyline = Column(LargeBinary)  # zlib(float64 [lat, lon] * n) simplificado
+
+class TrackCell(Base):
+    """Grid cell crossed by a workout's track (see ``tracks.CELL_DEGREES``)."""
+    __tablename__ = "track_cells"
+    __table_args__ = (
+        UniqueConstraint('workout_id', 'cell_lat', 'cell_lon'),
+        Index('ix_track_cells_lookup', 'user_id', 'cell_lat', 'cell_lon'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    workout_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    cell_lat = Column(Integer, nullable=False)
+    cell_lon = Column(Integer, nullable=False)
+
+# Modelo SQLAlchemy para versões reduzidas das séries e da trilha
+class StreamPreview(Base):
+    """Precomputed downsampled series (LTTB) or simplified polyline."""
+    __tablename__ = "stream_previews"
+    __table_args__ = (
+        UniqueConstraint('workout_id', 'kind', 'channel', 'resolution'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    workout_id = Column(Integer, index=True, nullable=False)
+    kind = Column(String(16), nullable=False)     # series, polyline
+    channel = Column(String(32), nullable=False)  # canal da série ou 'track'
+    resolution = Column(Integer, nullable=False)  # pontos (series) ou tolerância em m (polyline)
+    data = Column(LargeBinary, nullable=False)    # zlib(float64 [x, y] * n)
+
+# Modelos SQLAlchemy para zonas de treino
+class UserZones(Base):
+    """Zone boundaries of a user; ``None`` per kind means the defaults in ``zones``."""
+    __tablename__ = "user_zones"
+
+    user_id = Column(Integer, primary_key=True)
+    heart_rate = Column(JSON, nullable=True)  # limites em bpm, crescentes
+    power = Column(JSON, nullable=True)       # limites em W, crescentes
+    pace = Column(JSON, nullable=True)        # limites em s/km, decrescentes (mais lento -> mais rápido)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class WorkoutZoneTime(Base):
+    """Seconds spent in one zone of one kind (heart_rate, power, pace) in a workout."""
+    __tablename__ = "workout_zone_times"
+    __table_args__ = (
+        UniqueConstraint('workout_id', 'kind', 'zone'),
+        Index('ix_workout_zone_times_user_kind', 'user_id', 'kind', 'start_time'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    workout_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    kind = Column(String(16), nullable=False)
+    zone = Column(Integer, nullable=False)  # 1 = zona mais fácil
+    seconds = Column(Float, nullable=False)
+    start_time = Column(DateTime)  # início do workout (filtro por período)
+
 # Schemas Pydantic
 class UserBase(BaseModel):
     username: str = Field(..., min_length=3, max_length=50)
@@ -0,0 +1,142 @@
+"""On-disk cache of parse results, addressed by (content hash, parser version).
+
+The directory is capped at ``PARSE_CACHE_MAX_MB``: entries of other parser
+versions are deleted and, above the cap, the least recently used ones
+(every read refreshes the mtime). The sweep runs after a write, at most
+once per ``PARSE_CACHE_SWEEP_SECONDS`` per process.
+"""
+from pathlib import Path
+from typing import Dict, Any, Optional
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+
+from streams import RecordStreams
+
+# Configurações
+PARSE_CACHE_DIR = Path(os.getenv("PARSE_CACHE_DIR", Path(__file__).parent / "cache" / "parse"))
+PARSE_CACHE_MAX_MB = float(os.getenv("PARSE_CACHE_MAX_MB", "2048"))
+PARSE_CACHE_SWEEP_SECONDS = float(os.getenv("PARSE_CACHE_SWEEP_SECONDS", "300"))
+# Temporários de gravações interrompidas mais antigos que isso são removidos
+STALE_TMP_SECONDS = 3600
+
+_ENTRY_NAME = re.compile(r'^([0-9a-f]+)-v(\d+)\.npz$')
+
+logger = logging.getLogger(__name__)
+
+_last_sweep = 0.0
+
+
+def cache_path(content_hash: str, parser_version: int) -> Path:
+    """Content-addressed location of a parse result (sharded by hash prefix)."""
+    return PARSE_CACHE_DIR / content_hash[:2] / f"{content_hash}-v{parser_version}.npz"
+
+
+def get(content_hash: str, parser_version: int) -> Optional[Dict[str, Any]]:
+    """Return the cached parse result, or None on a miss."""
+    path = cache_path(content_hash, parser_version)
+    try:
+        with np.load(path, allow_pickle=False) as archive:
+            columns = {}
+            masks = {}
+            for key in archive.files:
+                if key.startswith('col_'):
+                    columns[key[4:]] = archive[key]
+                elif key.startswith('mask_'):
+                    masks[key[5:]] = archive[key]
+            data = json.loads(archive['meta'].tobytes().decode())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Entrada de cache inválida {path}: {str(e)}")
+        return None
+
+    try:
+        # mtime = último uso, para a remoção LRU
+        os.utime(path)
+    except OSError:
+        pass
+    data['records'] = RecordStreams(columns, masks)
+    return data
+
+
+def put(content_hash: str, parser_version: int, workout_data: Dict[str, Any]):
+    """Store a columnar parse result atomically."""
+    path = cache_path(content_hash, parser_version)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    streams: RecordStreams = workout_data['records']
+    meta = json.dumps({k: v for k, v in workout_data.items() if k != 'records'}, default=str)
+    arrays = {f"col_{c}": v for c, v in streams.columns.items()}
+    arrays.update({f"mask_{c}": m for c, m in streams.masks.items()})
+    arrays['meta'] = np.frombuffer(meta.encode(), dtype=np.uint8)
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    maybe_sweep(parser_version)
+
+
+def remove(content_hash: str):
+    """Delete every cached version of ``content_hash``."""
+    shard = PARSE_CACHE_DIR / content_hash[:2]
+    for path in shard.glob(f"{content_hash}-v*.npz"):
+        path.unlink(missing_ok=True)
+
+
+def maybe_sweep(parser_version: int):
+    """``sweep`` if this process hasn't swept in ``PARSE_CACHE_SWEEP_SECONDS``."""
+    global _last_sweep
+    now = time.monotonic()
+    if _last_sweep and now - _last_sweep < PARSE_CACHE_SWEEP_SECONDS:
+        return
+    _last_sweep = now
+    try:
+        sweep(parser_version)
+    except Exception as e:
+        logger.warning(f"Falha na limpeza do cache de parse: {str(e)}")
+
+
+def sweep(parser_version: int, max_bytes: Optional[int] = None) -> Dict[str, int]:
+    """Drop entries of other parser versions, then the least recently used above ``max_bytes``."""
+    max_bytes = int(PARSE_CACHE_MAX_MB * 2**20) if max_bytes is None else max_bytes
+    removed = {'outdated': 0, 'evicted': 0, 'temporary': 0}
+    entries = []
+    now = time.time()
+    for path in PARSE_CACHE_DIR.glob('*/*'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.suffix == '.tmp':
+            if now - stat.st_mtime > STALE_TMP_SECONDS:
+                path.unlink(missing_ok=True)
+                removed['temporary'] += 1
+            continue
+        match = _ENTRY_NAME.match(path.name)
+        if match is None:
+            continue
+        if int(match.group(2)) != parser_version:
+            path.unlink(missing_ok=True)
+            removed['outdated'] += 1
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed['evicted'] += 1
+    return removed
@@ -0,0 +1,176 @@
+"""Downsampled series (LTTB) and simplified polylines for charts and maps.
+
+The common resolutions are computed at upload and stored in
+``stream_previews``; any other is computed on demand and cached, keyed by
+the workout's parser version (reprocessing, even from another process,
+changes the key), ``points`` clamped to ``MAX_POINTS`` and tolerance
+rounded to ``TOLERANCE_BUCKET_M``.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+import zlib
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from geo import simplify
+from models import StreamPreview, Workout
+from stream_store import read_streams
+from streams import RecordStreams
+
+# Configurações
+PREVIEW_CHANNELS = ('heart_rate', 'power', 'speed', 'altitude', 'cadence')
+PREVIEW_POINTS = (250, 1000)
+PREVIEW_TOLERANCES_M = (20, 50)
+MAX_POINTS = 10000
+TOLERANCE_BUCKET_M = 1.0
+
+preview_cache = TTLCache("stream_previews", maxsize=1024, ttl=600)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of ``threshold`` representative points.
+
+    Keeps the first and last samples and, per bucket, the sample forming
+    the largest triangle with the previously kept one and the next
+    bucket's average. Bucket averages are computed up front in one
+    vectorized pass.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    bucket_size = (n - 2) / (threshold - 2)
+    starts = (np.arange(threshold - 1) * bucket_size).astype(np.int64) + 1
+    starts[-1] = n - 1
+    counts = np.diff(starts)
+    avg_x = np.append(np.add.reduceat(x[1:n - 1], starts[:-1] - 1) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[1:n - 1], starts[:-1] - 1) / counts, y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        lo, hi = starts[bucket], starts[bucket + 1]
+        cx, cy = avg_x[bucket + 1], avg_y[bucket + 1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[bucket + 1] = a
+    return selected
+
+
+def downsample(streams: RecordStreams, channel: str, points: int) -> np.ndarray:
+    """(n, 2) array of [timestamp, value] for the channel's valid samples."""
+    values = streams[channel].astype(np.float64)
+    valid = streams.valid(channel) & np.isfinite(values)
+    x = streams['timestamp'][valid].astype(np.float64)
+    y = values[valid]
+    keep = lttb(x, y, points)
+    return np.column_stack((x[keep], y[keep]))
+
+
+def simplified_track(streams: RecordStreams, tolerance_m: float) -> np.ndarray:
+    """(n, 2) array of [lat, lon] simplified by Douglas-Peucker."""
+    if 'position_lat' not in streams or 'position_long' not in streams:
+        return np.empty((0, 2))
+    lat, lon = streams['position_lat'], streams['position_long']
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    lat, lon = lat[valid], lon[valid]
+    keep = simplify(lat, lon, tolerance_m)
+    return np.column_stack((lat[keep], lon[keep]))
+
+
+def _encode(array: np.ndarray) -> bytes:
+    return zlib.compress(np.ascontiguousarray(array, dtype='<f8').tobytes())
+
+
+def _decode(data: bytes) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(data), dtype='<f8').reshape(-1, 2)
+
+
+def store_previews(db: Session, workout: Workout, streams: RecordStreams):
+    """Precompute the common resolutions at upload (no commit)."""
+    rows = []
+    if 'timestamp' in streams and len(streams) > 0:
+        for channel in PREVIEW_CHANNELS:
+            if channel not in streams:
+                continue
+            for points in PREVIEW_POINTS:
+                series = downsample(streams, channel, points)
+                if len(series):
+                    rows.append({'workout_id': workout.id, 'kind': 'series', 'channel': channel,
+                                 'resolution': points, 'data': _encode(series)})
+    for tolerance in PREVIEW_TOLERANCES_M:
+        track = simplified_track(streams, tolerance)
+        if len(track):
+            rows.append({'workout_id': workout.id, 'kind': 'polyline', 'channel': 'track',
+                         'resolution': tolerance, 'data': _encode(track)})
+    if rows:
+        db.execute(StreamPreview.__table__.insert(), rows)
+
+
+def delete_previews(db: Session, workout_id: int):
+    db.query(StreamPreview).filter(StreamPreview.workout_id == workout_id).delete(synchronize_session=False)
+    preview_cache.pop_matching(lambda key: key[0] == workout_id)
+
+
+def get_series(db: Session, workout_id: int, points: int,
+               channels: Optional[Iterable[str]] = None,
+               parser_version: Optional[int] = None) -> Dict[str, List[List[float]]]:
+    """LTTB-downsampled ``[timestamp, value]`` pairs per channel."""
+    channels = tuple(channels or PREVIEW_CHANNELS)
+    points = min(max(int(points), 3), MAX_POINTS)
+    stored = {}
+    if points in PREVIEW_POINTS:
+        stored = {
+            row.channel: _decode(row.data)
+            for row in db.query(StreamPreview).filter(
+                StreamPreview.workout_id == workout_id,
+                StreamPreview.kind == 'series',
+                StreamPreview.resolution == points,
+                StreamPreview.channel.in_(channels)
+            )
+        }
+    missing = tuple(sorted(set(c for c in channels if c not in stored)))
+    if missing:
+        stored.update(preview_cache.get_or_load(
+            (workout_id, parser_version, 'series', missing, points),
+            lambda: _compute_series(db, workout_id, missing, points)
+        ))
+    return {channel: stored[channel].tolist() for channel in channels if channel in stored}
+
+
+def _compute_series(db: Session, workout_id: int, channels: Tuple[str, ...],
+                    points: int) -> Dict[str, np.ndarray]:
+    streams = read_streams(db, workout_id, channels=channels)
+    series = {
+        channel: downsample(streams, channel, points)
+        for channel in channels if channel in streams and len(streams) > 0
+    }
+    return {channel: values for channel, values in series.items() if len(values)}
+
+
+def tolerance_bucket(tolerance_m: float) -> float:
+    """Round a tolerance to the nearest ``TOLERANCE_BUCKET_M`` (at least one bucket)."""
+    return max(round(tolerance_m / TOLERANCE_BUCKET_M), 1) * TOLERANCE_BUCKET_M
+
+
+def get_polyline(db: Session, workout_id: int, tolerance_m: float,
+                 parser_version: Optional[int] = None) -> Optional[np.ndarray]:
+    """Track simplified with the bucketed tolerance, from storage when precomputed."""
+    tolerance_m = tolerance_bucket(tolerance_m)
+    if tolerance_m in PREVIEW_TOLERANCES_M:
+        row = db.query(StreamPreview).filter(
+            StreamPreview.workout_id == workout_id,
+            StreamPreview.kind == 'polyline',
+            StreamPreview.resolution == int(tolerance_m)
+        ).first()
+        if row is not None:
+            return _decode(row.data)
+
+    def compute():
+        streams = read_streams(db, workout_id, channels=('position_lat', 'position_long'))
+        track = simplified_track(streams, tolerance_m)
+        return track if len(track) else None
+
+    return preview_cache.get_or_load((workout_id, parser_version, 'polyline', tolerance_m), compute)
@@ -1,22 +1,122 @@
 from fpdf import FPDF
-from datetime import datetime
-from typing import Dict, Any
-import matplotlib.pyplot as plt
+from datetime import timedelta
+from typing import Dict, Any, List
+from matplotlib.figure import Figure
 from io import BytesIO
-import base64
+import numpy as np
+
+from previews import downsample
+from streams import monotonic_offsets
+
+# Pontos por gráfico: mais do que isso não muda a imagem, só o custo de plotar
+CHART_POINTS = 1000
+
+# Linhas da tabela de dados: as amostras são resumidas em intervalos
+RAW_DATA_ROWS = 120
+
+CHARTS = (
+    ('heart_rate', 'Frequência Cardíaca', 'bpm'),
+    ('power', 'Potência', 'W'),
+    ('altitude', 'Altitude', 'm'),
+)
+
+RAW_DATA_CHANNELS = ('heart_rate', 'speed', 'power', 'cadence', 'altitude')
+
+
+def render_chart(records, channel: str, title: str, unit: str) -> bytes:
+    """PNG of one channel over elapsed minutes.
+
+    Uses a standalone ``Figure`` instead of pyplot's global state, so
+    charts can be rendered from several threads at once.
+    """
+    series = downsample(records, channel, CHART_POINTS)
+    fig = Figure(figsize=(8, 3))
+    ax = fig.add_subplot()
+    ax.plot((series[:, 0] - series[0, 0]) / 60, series[:, 1], linewidth=0.8)
+    ax.set_title(title)
+    ax.set_xlabel('min')
+    ax.set_ylabel(unit)
+    buf = BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight', dpi=100)
+    return buf.getvalue()
+
+
+def summarize_records(records, rows: int = RAW_DATA_ROWS) -> Dict[str, Any]:
+    """Interval means of the main channels, at most ``rows`` intervals.
+
+    Samples recorded after a backwards clock jump are skipped until the
+    clock catches up, as in ``curves.resample_1hz``.
+    """
+    if 'timestamp' not in records or len(records) == 0:
+        return {'interval': 0, 'columns': [], 'rows': []}
+    elapsed, monotonic = monotonic_offsets(records['timestamp'])
+    span = int(elapsed.max())
+    interval = max(60, int(np.ceil((span + 1) / rows / 60)) * 60)
+    bucket = elapsed // interval
+    buckets = span // interval + 1
+
+    columns = [c for c in RAW_DATA_CHANNELS if c in records and records.valid(c).any()]
+    means = {}
+    for channel in columns:
+        values = records[channel].astype(np.float64)
+        valid = records.valid(channel) & monotonic & np.isfinite(values)
+        totals = np.bincount(bucket[valid], weights=values[valid], minlength=buckets)
+        counts = np.bincount(bucket[valid], minlength=buckets)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means[channel] = np.where(counts > 0, totals / np.maximum(counts, 1), np.nan)
+
+    table = [
+        [str(timedelta(seconds=i * interval))] + [
+            '-' if np.isnan(means[c][i]) else f"{means[c][i]:.1f}" for c in columns
+        ]
+        for i in range(buckets)
+    ]
+    return {'interval': interval, 'columns': columns, 'rows': table}
+
+
+def prepare_section(workout_data: Dict[str, Any]) -> Dict[str, Any]:
+    """CPU-heavy part of a report (charts and summaries), independent of the PDF.
+
+    Safe to run in parallel for several workouts; the result is laid out
+    by ``PDFReportGenerator.add_section``.
+    """
+    records = workout_data.get('records')
+    charts = []
+    if records is not None and 'timestamp' in records:
+        for channel, title, unit in CHARTS:
+            if channel in records and records.valid(channel).any():
+                charts.append(render_chart(records, channel, title, unit))
+    return {
+        'data': {k: v for k, v in workout_data.items() if k != 'records'},
+        'charts': charts,
+        'raw_data': summarize_records(records) if records is not None else None
+    }
+
 
 class PDFReportGenerator:
     def __init__(self):
         self.pdf = FPDF()
         self.pdf.set_auto_page_break(auto=True, margin=15)
-    
+
     def generate_report(self, workout_data: Dict[str, Any]) -> bytes:
+        self.add_section(prepare_section(workout_data))
+        return self.output()
+
+    def generate_multi_report(self, sections: List[Dict[str, Any]]) -> bytes:
+        for section in sections:
+            self.add_section(section)
+        return self.output()
+
+    def output(self) -> bytes:
+        return bytes(self.pdf.output())
+
+    def add_section(self, section: Dict[str, Any]):
         self.pdf.add_page()
-        self._add_header(workout_data)
-        self._add_summary(workout_data)
-        self._add_charts(workout_data)
-        self._add_raw_data(workout_data)
-        return self.pdf.output(dest='S').encode('latin1')
+        self._add_header(section['data'])
+        self._add_summary(section['data'])
+        self._add_charts(section['charts'])
+        if section['raw_data']:
+            self._add_raw_data(section['raw_data'])
 
     def _add_header(self, data: Dict[str, Any]):
         self.pdf.set_font('Arial', 'B', 16)
@@ -27,45 +127,35 @@ class PDFReportGenerator:
         self.pdf.set_font('Arial', 'B', 12)
         self.pdf.cell(0, 10, 'Resumo da Atividade', 0, 1)
         self.pdf.set_font('Arial', '', 10)
-        
+
         summary = [
             f"Data: {data['start_time']}",
-            f"Distância: {data['total_distance'] / 1000:.2f} km",
-            f"Duração: {datetime(seconds=data['total_elapsed_time'])}",
-            f"FC Média: {data.get('avg_heart_rate', 'N/A')} bpm"
+            f"Distância: {(data['total_distance'] or 0) / 1000:.2f} km",
+            f"Duração: {timedelta(seconds=round(data['total_elapsed_time'] or 0))}",
+            f"FC Média: {data.get('avg_heart_rate') or 'N/A'} bpm"
         ]
-        
+
         for line in summary:
             self.pdf.cell(0, 10, line, 0, 1)
 
-    def _add_charts(self, data: Dict[str, Any]):
-        if 'records' not in data:
+    def _add_charts(self, charts: List[bytes]):
+        if not charts:
             return
-            
-        df = data['records']
         self.pdf.set_font('Arial', 'B', 12)
         self.pdf.cell(0, 10, 'Gráficos de Performance', 0, 1)
-        
-        # Gráfico de FC
-        if 'heart_rate' in df.columns:
-            plt.figure()
-            df['heart_rate'].plot(title='Frequência Cardíaca')
-            self._insert_plot()
-
-    def _insert_plot(self):
-        buf = BytesIO()
-        plt.savefig(buf, format='png', bbox_inches='tight')
-        plt.close()
-        img = base64.b64encode(buf.getvalue()).decode('latin1')
-        self.pdf.image(BytesIO(base64.b64decode(img)), x=10, w=190)
-        self.pdf.ln(5)
+        for png in charts:
+            self.pdf.image(BytesIO(png), x=10, w=190)
+            self.pdf.ln(5)
 
-    def _add_raw_data(self, data: Dict[str, Any]):
+    def _add_raw_data(self, raw_data: Dict[str, Any]):
+        if not raw_data['rows']:
+            return
         self.pdf.add_page()
         self.pdf.set_font('Arial', 'B', 12)
-        self.pdf.cell(0, 10, 'Dados Brutos', 0, 1)
+        self.pdf.cell(0, 10, f"Dados (médias a cada {raw_data['interval'] // 60} min)", 0, 1)
         self.pdf.set_font('Courier', '', 8)
-        
-        if 'records' in data:
-            for _, row in data['records'].iterrows():
-                self.pdf.cell(0, 5, str(row.to_dict()), 0, 1)
\ No newline at end of file
+
+        header = ['tempo'] + raw_data['columns']
+        self.pdf.cell(0, 5, ''.join(f"{h:>12}" for h in header), 0, 1)
+        for row in raw_data['rows']:
+            self.pdf.cell(0, 5, ''.join(f"{v:>12}" for v in row), 0, 1)
@@ -0,0 +1,141 @@
+"""Geração de relatórios PDF em background, com cache em disco.
+
+O relatório fica em cache por workout (ou conjunto de workouts) e versão
+do layout; os de vários workouts têm ao lado um manifesto JSON com os ids
+incluídos. ``report_service`` (matplotlib) só é importado ao renderizar.
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from database import SessionLocal
+from models import Workout
+from stream_store import read_streams
+from workers import QueueFullError, job_registry, worker_pool
+
+# Configurações
+REPORT_CACHE_DIR = Path(os.getenv("REPORT_CACHE_DIR", Path(__file__).parent / "cache" / "reports"))
+MAX_PENDING_REPORTS = int(os.getenv("MAX_PENDING_REPORTS", "8"))
+MAX_REPORT_WORKOUTS = 50
+
+# Versão do layout; relatórios em cache de versões anteriores são ignorados
+REPORT_VERSION = 2
+
+REPORT_CHANNELS = ('heart_rate', 'power', 'altitude', 'speed', 'cadence')
+
+logger = logging.getLogger(__name__)
+
+# Relatórios em geração: chave -> job_id (pedidos repetidos reaproveitam o job)
+_in_flight: Dict[str, str] = {}
+
+
+def report_key(workout_ids: Iterable[int]) -> str:
+    ids = sorted(set(workout_ids))
+    if len(ids) == 1:
+        return f"workout-{ids[0]}"
+    digest = hashlib.sha1(','.join(map(str, ids)).encode()).hexdigest()[:16]
+    return f"multi-{digest}"
+
+
+def report_path(workout_ids: Iterable[int]) -> Path:
+    return REPORT_CACHE_DIR / f"{report_key(workout_ids)}-v{REPORT_VERSION}.pdf"
+
+
+def cached_report(workout_ids: Iterable[int]):
+    """Path of the finished PDF, or None if it still has to be rendered."""
+    path = report_path(workout_ids)
+    return path if path.exists() else None
+
+
+def _manifest_ids(path: Path):
+    """Ids listados no manifesto de um PDF de vários workouts, ou None se ilegível."""
+    try:
+        return set(json.loads(path.with_suffix('.json').read_text()))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def delete_cached_reports(workout_id: int):
+    """Remove os PDFs que incluem o workout."""
+    if not REPORT_CACHE_DIR.exists():
+        return
+    for path in REPORT_CACHE_DIR.glob(f"workout-{workout_id}-v*.pdf"):
+        path.unlink(missing_ok=True)
+    for path in REPORT_CACHE_DIR.glob("multi-*.pdf"):
+        ids = _manifest_ids(path)
+        # Sem manifesto não dá para saber o conteúdo: descarta
+        if ids is None or workout_id in ids:
+            path.unlink(missing_ok=True)
+            path.with_suffix('.json').unlink(missing_ok=True)
+
+
+def load_report_data(workout_id: int) -> Dict[str, Any]:
+    """Summary fields and streams of one workout (executa no pool de threads)."""
+    db = SessionLocal()
+    try:
+        workout = db.get(Workout, workout_id)
+        raw = workout.raw_data
+        raw = json.loads(raw) if isinstance(raw, str) else (raw or {})
+        return {
+            'sport': workout.activity_type,
+            'start_time': workout.start_time,
+            'total_distance': workout.distance,
+            'total_elapsed_time': workout.duration,
+            'avg_heart_rate': workout.avg_hr,
+            'laps': raw.get('laps', []),
+            'records': read_streams(db, workout_id, channels=REPORT_CHANNELS)
+        }
+    finally:
+        db.close()
+
+
+def _write_atomic(path: Path, data: bytes):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.part')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _assemble(sections: List[Dict[str, Any]], workout_ids: List[int]):
+    from report_service import PDFReportGenerator
+
+    pdf = PDFReportGenerator().generate_multi_report(sections)
+    path = report_path(workout_ids)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if len(workout_ids) > 1:
+        # Manifesto antes do PDF: todo PDF em cache tem seus ids registrados
+        _write_atomic(path.with_suffix('.json'), json.dumps(sorted(set(workout_ids))).encode())
+    _write_atomic(path, pdf)
+
+
+async def build_report(workout_ids: List[int], report_url: str) -> Dict[str, Any]:
+    """Load and render every workout in parallel, then lay the PDF out once."""
+    from report_service import prepare_section
+
+    key = report_key(workout_ids)
+    try:
+        data = await asyncio.gather(*[worker_pool.run_db(load_report_data, i) for i in workout_ids])
+        sections = await asyncio.gather(*[worker_pool.run_report(prepare_section, d) for d in data])
+        await worker_pool.run_report(_assemble, list(sections), workout_ids)
+        logger.info(f"Relatório {key} gerado ({len(workout_ids)} workouts)")
+        return {'report_url': report_url}
+    finally:
+        _in_flight.pop(key, None)
+
+
+def start_report(user_id: int, workout_ids: List[int], report_url: str) -> str:
+    """Job id rendering the report, reusing one already in progress."""
+    key = report_key(workout_ids)
+    job_id = _in_flight.get(key)
+    if job_id is not None:
+        return job_id
+    if len(_in_flight) >= MAX_PENDING_REPORTS:
+        raise QueueFullError(f"{len(_in_flight)} relatórios já em geração")
+    job_id = job_registry.submit(user_id, build_report(sorted(set(workout_ids)), report_url))
+    _in_flight[key] = job_id
+    return job_id
@@ -0,0 +1,285 @@
+"""Reprocessamento dos workouts gravados por versões anteriores do parser.
+
+Uso:
+    python reprocess.py [--workers 2] [--batch-size 20] [--max-rate 5] [--pause 0.5]
+    python reprocess.py --dry-run
+
+Os arquivos originais são relidos de ``uploads/<hash>.fit`` e parseados em
+um pool de processos com prioridade baixa; os resultados são gravados em
+transações pequenas, com pausas entre elas, para rodar ao lado do tráfego
+normal. Um checkpoint após cada lote permite interromper e retomar; sem
+``--retry-failed``, arquivos que falharam não são tentados de novo.
+"""
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from ingest import replace_workout
+from models import User, Workout
+from utils import UPLOAD_DIR, upload_path
+
+# Configurações
+REPROCESS_BATCH_SIZE = int(os.getenv("REPROCESS_BATCH_SIZE", "20"))
+REPROCESS_WORKERS = int(os.getenv("REPROCESS_WORKERS", str(max(1, (os.cpu_count() or 2) // 4))))
+# Niceness dos processos de parse (0 = mesma prioridade da API)
+REPROCESS_NICE = int(os.getenv("REPROCESS_NICE", "10"))
+CHECKPOINT_DIR = Path(os.getenv("REPROCESS_CHECKPOINT_DIR", Path(__file__).parent / "cache"))
+
+logger = logging.getLogger(__name__)
+
+
+def _lower_priority(nice: int):
+    """Inicializador dos workers: cede CPU aos processos da API."""
+    if nice and hasattr(os, 'nice'):
+        os.nice(nice)
+
+
+def source_path(workout) -> Optional[Path]:
+    """Original .fit of the workout (content-addressed, or by filename for old uploads)."""
+    candidates = []
+    if workout.content_hash:
+        candidates.append(upload_path(workout.content_hash))
+    if workout.filename:
+        candidates.append(UPLOAD_DIR / Path(workout.filename).name)
+    return next((path for path in candidates if path.exists()), None)
+
+
+def outdated_query(db: Session, parser_version: int, user_id: Optional[int] = None):
+    query = db.query(Workout).filter(or_(
+        Workout.parser_version.is_(None),
+        Workout.parser_version < parser_version
+    ))
+    if user_id is not None:
+        query = query.filter(Workout.user_id == user_id)
+    return query
+
+
+class Checkpoint:
+    """Last committed workout id and failures of a run, per parser version."""
+
+    def __init__(self, parser_version: int, directory: Path = CHECKPOINT_DIR):
+        self.path = directory / f"reprocess-v{parser_version}.json"
+        self.last_id = 0
+        self.failed: Dict[str, str] = {}
+
+    def load(self) -> 'Checkpoint':
+        if self.path.exists():
+            data = json.loads(self.path.read_text())
+            self.last_id = data.get('last_id', 0)
+            self.failed = data.get('failed', {})
+        return self
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'last_id': self.last_id, 'failed': self.failed}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+        self.last_id = 0
+        self.failed = {}
+
+
+class Throttle:
+    """Limits submissions to ``rate`` per second (0 = sem limite)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self.next_at:
+            time.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + self.interval
+
+
+def run_reprocess(executor: Optional[Executor] = None, workers: int = REPROCESS_WORKERS,
+                  batch_size: int = REPROCESS_BATCH_SIZE, max_rate: float = 0.0, pause: float = 0.0,
+                  user_id: Optional[int] = None, retry_failed: bool = False,
+                  restart: bool = False) -> Dict[str, Any]:
+    """Re-parse every outdated workout and write the results back in batches.
+
+    Workouts are visited in id order. At most ``2 * workers`` parse results
+    are in flight, each batch of ``batch_size`` is one transaction, and the
+    checkpoint is saved after every commit.
+    """
+    # fitparse só é necessário quando há reprocessamento
+    from fit_parser import PARSER_VERSION, parse_fit_file
+
+    checkpoint = Checkpoint(PARSER_VERSION)
+    if restart:
+        checkpoint.clear()
+    checkpoint.load()
+    skip = set() if retry_failed else {int(i) for i in checkpoint.failed}
+    if retry_failed:
+        checkpoint.failed = {}
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_lower_priority,
+                                       initargs=(REPROCESS_NICE,))
+    max_in_flight = 2 * workers
+    throttle = Throttle(max_rate)
+    counts = {'done': 0, 'failed': 0, 'missing': 0}
+    started = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        in_flight = deque()
+        batch: List[tuple] = []
+        # Sem --retry-failed, só retoma depois do último lote gravado
+        last_id = 0 if retry_failed else checkpoint.last_id
+
+        def commit_batch():
+            for workout_id, workout_data, error in batch:
+                workout = db.get(Workout, workout_id)
+                if workout is None:
+                    # Apagado durante o reprocessamento
+                    continue
+                if error is not None:
+                    checkpoint.failed[str(workout_id)] = error
+                    counts['failed'] += 1
+                    continue
+                replace_workout(db, workout, workout_data)
+                checkpoint.failed.pop(str(workout_id), None)
+                counts['done'] += 1
+            db.commit()
+            db.expunge_all()
+            checkpoint.last_id = max(checkpoint.last_id, batch[-1][0])
+            checkpoint.save()
+            elapsed = time.perf_counter() - started
+            logger.info(f"Reprocessados {counts['done']} workouts ({counts['failed']} falhas, "
+                        f"{counts['done'] / elapsed:.1f}/s); checkpoint id {checkpoint.last_id}")
+            batch.clear()
+            if pause:
+                # Libera o banco para as escritas da API entre os lotes
+                time.sleep(pause)
+
+        def drain(limit: int):
+            while len(in_flight) > limit:
+                workout_id, future = in_flight.popleft()
+                try:
+                    batch.append((workout_id, future.result(), None))
+                except Exception as e:
+                    batch.append((workout_id, None, str(e)[:1024]))
+                if len(batch) >= batch_size:
+                    commit_batch()
+
+        while True:
+            page = (
+                outdated_query(db, PARSER_VERSION, user_id)
+                .with_entities(Workout.id, Workout.content_hash, Workout.filename)
+                .filter(Workout.id > last_id)
+                .order_by(Workout.id)
+                .limit(batch_size)
+                .all()
+            )
+            # Não mantém a transação de leitura aberta enquanto espera o parse
+            db.rollback()
+            if not page:
+                break
+            for workout in page:
+                last_id = workout.id
+                if workout.id in skip:
+                    continue
+                path = source_path(workout)
+                if path is None:
+                    counts['missing'] += 1
+                    in_flight.append((workout.id, _failed("Arquivo original não encontrado")))
+                else:
+                    throttle.wait()
+                    in_flight.append((workout.id, executor.submit(
+                        parse_fit_file, str(path), workout.content_hash
+                    )))
+                drain(max_in_flight)
+        drain(0)
+        if batch:
+            commit_batch()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+
+    return {
+        'parser_version': PARSER_VERSION,
+        **counts,
+        'skipped_failed': len(skip),
+        'seconds': time.perf_counter() - started,
+        'checkpoint': str(checkpoint.path)
+    }
+
+
+def _failed(message: str) -> Future:
+    future = Future()
+    future.set_exception(FileNotFoundError(message))
+    return future
+
+
+def outdated_summary(user_id: Optional[int] = None) -> Dict[str, Any]:
+    """How many workouts are outdated and how many have their original file."""
+    from fit_parser import PARSER_VERSION
+
+    db = SessionLocal()
+    try:
+        total = 0
+        missing = 0
+        for workout in outdated_query(db, PARSER_VERSION, user_id).yield_per(500):
+            total += 1
+            if source_path(workout) is None:
+                missing += 1
+        return {'parser_version': PARSER_VERSION, 'outdated': total, 'missing_files': missing}
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    from migrations import init_schema
+
+    parser = argparse.ArgumentParser(description="Reprocessa workouts de versões antigas do parser")
+    parser.add_argument("--workers", type=int, default=REPROCESS_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=REPROCESS_BATCH_SIZE)
+    parser.add_argument("--max-rate", type=float, default=0.0, help="workouts por segundo (0 = sem limite)")
+    parser.add_argument("--pause", type=float, default=0.0, help="segundos de pausa entre lotes")
+    parser.add_argument("--username", help="apenas os workouts deste usuário")
+    parser.add_argument("--retry-failed", action="store_true", help="tenta de novo os que falharam")
+    parser.add_argument("--restart", action="store_true", help="ignora o checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="só conta os workouts desatualizados")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_schema()
+    user_id = None
+    if args.username:
+        db = SessionLocal()
+        user = db.query(User).filter(User.username == args.username).first()
+        db.close()
+        if user is None:
+            raise SystemExit(f"Usuário '{args.username}' não encontrado")
+        user_id = user.id
+
+    if args.dry_run:
+        result = outdated_summary(user_id)
+    else:
+        result = run_reprocess(workers=args.workers, batch_size=args.batch_size, max_rate=args.max_rate,
+                               pause=args.pause, user_id=user_id, retry_failed=args.retry_failed,
+                               restart=args.restart)
+    print(json.dumps(result, indent=2))
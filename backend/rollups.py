@@ -0,0 +1,249 @@
+"""Rollups de treino (dia/semana/mês) e carga crônica/aguda (CTL/ATL/TSB).
+
+Tudo é atualizado incrementalmente a cada workout inserido ou removido;
+as consultas do dashboard leem apenas essas tabelas.
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+import math
+import os
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import TrainingLoad, TrainingRollup, Workout
+
+# Configurações
+HR_REST = int(os.getenv("HR_REST", "60"))
+HR_MAX = int(os.getenv("HR_MAX", "190"))
+CTL_DAYS = 42
+ATL_DAYS = 7
+
+PERIODS = ('day', 'week', 'month')
+
+# Fatores das médias exponenciais (constante de tempo em dias)
+CTL_FACTOR = 1 - math.exp(-1 / CTL_DAYS)
+ATL_FACTOR = 1 - math.exp(-1 / ATL_DAYS)
+
+# Abaixo disso o impulso de um treino nos dias seguintes é desprezível
+LOAD_EPSILON = 1e-6
+
+MAX_LOAD_DAYS = 3660
+
+
+def training_stress(workout: Workout) -> float:
+    """Banister TRIMP from duration and average heart rate.
+
+    Workouts without heart rate count one point per minute, roughly an
+    easy aerobic effort.
+    """
+    minutes = (workout.duration or 0) / 60
+    if not workout.avg_hr:
+        return minutes
+    ratio = (workout.avg_hr - HR_REST) / (HR_MAX - HR_REST)
+    ratio = min(max(ratio, 0.0), 1.0)
+    return minutes * ratio * 0.64 * math.exp(1.92 * ratio)
+
+
+def period_start(day: date, period: str) -> date:
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def add_to_rollups(db: Session, workout: Workout):
+    """Fold a new workout into the rollups and the load series (no commit)."""
+    if workout.training_stress is None:
+        workout.training_stress = training_stress(workout)
+    _apply(db, workout, 1)
+
+
+def remove_from_rollups(db: Session, workout: Workout):
+    """Undo ``add_to_rollups`` for a workout about to be deleted (no commit)."""
+    if workout.training_stress is None:
+        return
+    _apply(db, workout, -1)
+
+
+def _apply(db: Session, workout: Workout, sign: int):
+    if workout.start_time is None:
+        return
+    day = workout.start_time.date()
+    deltas = {
+        'count': sign,
+        'distance': sign * (workout.distance or 0.0),
+        'duration': sign * (workout.duration or 0.0),
+        'calories': sign * (workout.calories or 0),
+        'ascent': sign * (workout.ascent or 0),
+        'stress': sign * workout.training_stress
+    }
+    for period in PERIODS:
+        keys = {
+            'user_id': workout.user_id,
+            'period': period,
+            'period_start': period_start(day, period),
+            'activity_type': workout.activity_type or 'unknown'
+        }
+        _increment(db, keys, deltas)
+    _apply_load(db, workout.user_id, day, sign * workout.training_stress)
+
+
+def _increment(db: Session, keys: Dict[str, Any], deltas: Dict[str, float]):
+    """Atomic ``SET col = col + delta`` upsert; rows left empty are removed."""
+    query = db.query(TrainingRollup).filter_by(**keys)
+    values = {getattr(TrainingRollup, k): getattr(TrainingRollup, k) + v for k, v in deltas.items()}
+    if not query.update(values, synchronize_session=False):
+        try:
+            with db.begin_nested():
+                db.add(TrainingRollup(**keys, **deltas))
+        except IntegrityError:
+            # Outro upload criou a linha entre o UPDATE e o insert
+            query.update(values, synchronize_session=False)
+    if deltas['count'] < 0:
+        query.filter(TrainingRollup.count <= 0).delete(synchronize_session=False)
+
+
+def _apply_load(db: Session, user_id: int, day: date, stress: float):
+    """Add ``stress`` on ``day`` to the CTL/ATL series.
+
+    Both averages are linear in the daily stress, so the change is the
+    impulse ``stress * k`` on ``day`` decaying by ``(1 - k)`` per day after
+    it. Only the rows from ``day`` on are touched, and the walk stops once
+    the impulse is negligible. Every change is an atomic
+    ``SET col = col + delta``, like ``_increment``, so concurrent uploads
+    for the same user don't overwrite each other.
+    """
+    query = db.query(TrainingLoad).filter_by(user_id=user_id, day=day)
+    values = {
+        TrainingLoad.stress: TrainingLoad.stress + stress,
+        TrainingLoad.ctl: TrainingLoad.ctl + stress * CTL_FACTOR,
+        TrainingLoad.atl: TrainingLoad.atl + stress * ATL_FACTOR
+    }
+    if not query.update(values, synchronize_session=False):
+        previous = (
+            db.query(TrainingLoad)
+            .filter(TrainingLoad.user_id == user_id, TrainingLoad.day < day)
+            .order_by(TrainingLoad.day.desc())
+            .first()
+        )
+        ctl, atl = _decay(previous, day)
+        try:
+            with db.begin_nested():
+                db.add(TrainingLoad(user_id=user_id, day=day, stress=stress,
+                                    ctl=ctl + stress * CTL_FACTOR, atl=atl + stress * ATL_FACTOR))
+        except IntegrityError:
+            # Outro upload criou a linha do dia entre o UPDATE e o insert
+            query.update(values, synchronize_session=False)
+
+    # Só id e dia são lidos; os valores são incrementados no próprio UPDATE
+    later = (
+        db.query(TrainingLoad.id, TrainingLoad.day)
+        .filter(TrainingLoad.user_id == user_id, TrainingLoad.day > day)
+        .order_by(TrainingLoad.day)
+        .yield_per(500)
+    )
+    deltas = []
+    for row_id, following_day in later:
+        gap = (following_day - day).days
+        ctl_delta = stress * CTL_FACTOR * (1 - CTL_FACTOR) ** gap
+        if abs(ctl_delta) < LOAD_EPSILON:
+            break
+        deltas.append({
+            'row_id': row_id,
+            'ctl_delta': ctl_delta,
+            'atl_delta': stress * ATL_FACTOR * (1 - ATL_FACTOR) ** gap
+        })
+    if deltas:
+        db.execute(
+            update(TrainingLoad.__table__)
+            .where(TrainingLoad.__table__.c.id == bindparam('row_id'))
+            .values(ctl=TrainingLoad.__table__.c.ctl + bindparam('ctl_delta'),
+                    atl=TrainingLoad.__table__.c.atl + bindparam('atl_delta')),
+            deltas
+        )
+
+    if stress <= 0:
+        # Sem treino restante no dia: a linha equivaleria ao decaimento da anterior
+        query.filter(func.abs(TrainingLoad.stress) < LOAD_EPSILON).delete(synchronize_session=False)
+
+
+def _decay(row: Optional[TrainingLoad], day: date):
+    if row is None:
+        return 0.0, 0.0
+    gap = (day - row.day).days
+    return row.ctl * (1 - CTL_FACTOR) ** gap, row.atl * (1 - ATL_FACTOR) ** gap
+
+
+def get_rollups(db: Session, user_id: int, period: str, start_date: Optional[date] = None,
+                end_date: Optional[date] = None, activity_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Rollup rows for the period type, one per (period_start, activity_type)."""
+    query = db.query(TrainingRollup).filter(
+        TrainingRollup.user_id == user_id,
+        TrainingRollup.period == period
+    )
+    if start_date:
+        query = query.filter(TrainingRollup.period_start >= period_start(start_date, period))
+    if end_date:
+        query = query.filter(TrainingRollup.period_start <= end_date)
+    if activity_type:
+        query = query.filter(TrainingRollup.activity_type == activity_type)
+    return [
+        {
+            'period_start': row.period_start,
+            'activity_type': row.activity_type,
+            'count': row.count,
+            'distance': row.distance,
+            'duration': row.duration,
+            'calories': row.calories,
+            'ascent': row.ascent,
+            'stress': row.stress
+        }
+        for row in query.order_by(TrainingRollup.period_start, TrainingRollup.activity_type)
+    ]
+
+
+def get_training_load(db: Session, user_id: int, start_date: date, end_date: date) -> List[Dict[str, Any]]:
+    """Daily stress, fitness (CTL), fatigue (ATL) and form (TSB) in [start, end].
+
+    TSB is the previous day's CTL minus ATL. Days between stored rows are
+    filled by decay, so the cost is one row read per training day plus
+    one step per day in the range.
+    """
+    end_date = min(end_date, start_date + timedelta(days=MAX_LOAD_DAYS))
+    previous = (
+        db.query(TrainingLoad)
+        .filter(TrainingLoad.user_id == user_id, TrainingLoad.day < start_date)
+        .order_by(TrainingLoad.day.desc())
+        .first()
+    )
+    rows = {
+        row.day: row for row in db.query(TrainingLoad).filter(
+            TrainingLoad.user_id == user_id,
+            TrainingLoad.day >= start_date,
+            TrainingLoad.day <= end_date
+        )
+    }
+
+    ctl, atl = _decay(previous, start_date - timedelta(days=1))
+    series = []
+    day = start_date
+    while day <= end_date:
+        form = ctl - atl
+        row = rows.get(day)
+        if row is not None:
+            stress, ctl, atl = row.stress, row.ctl, row.atl
+        else:
+            stress, ctl, atl = 0.0, ctl * (1 - CTL_FACTOR), atl * (1 - ATL_FACTOR)
+        series.append({'day': day, 'stress': stress, 'ctl': ctl, 'atl': atl, 'tsb': form})
+        day += timedelta(days=1)
+    return series
+
+
+def default_load_range(start_date: Optional[date], end_date: Optional[date]):
+    """Últimos 90 dias quando o período não é informado."""
+    end_date = end_date or datetime.utcnow().date()
+    start_date = start_date or end_date - timedelta(days=90)
+    return start_date, end_date
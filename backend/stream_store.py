@@ -0,0 +1,96 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+import os
+import zlib
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models import WorkoutStream
+from streams import RecordStreams, MASKED_CHANNELS
+
+# Configurações
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "4096"))
+COMPRESSION_LEVEL = 6
+
+
+def write_streams(db: Session, workout_id: int, streams: RecordStreams,
+                  chunk_size: int = STREAM_CHUNK_SIZE):
+    """Store each channel as compressed binary chunks.
+
+    All channels share the same chunk boundaries, so a chunk's
+    ``start_ts``/``end_ts`` describes the same samples in every channel.
+    The caller is responsible for committing.
+    """
+    timestamps = streams.columns.get('timestamp')
+    rows = []
+    for chunk_index, start in enumerate(range(0, len(streams), chunk_size)):
+        stop = min(start + chunk_size, len(streams))
+        start_ts = int(timestamps[start]) if timestamps is not None else None
+        end_ts = int(timestamps[stop - 1]) if timestamps is not None else None
+        for channel, values in streams.columns.items():
+            chunk = np.ascontiguousarray(values[start:stop])
+            mask = None
+            if channel in streams.masks:
+                valid = streams.masks[channel][start:stop]
+                if not valid.all():
+                    mask = zlib.compress(np.packbits(valid).tobytes(), COMPRESSION_LEVEL)
+            rows.append(WorkoutStream(
+                workout_id=workout_id,
+                channel=channel,
+                chunk_index=chunk_index,
+                start_ts=start_ts,
+                end_ts=end_ts,
+                dtype=chunk.dtype.str,
+                count=len(chunk),
+                data=zlib.compress(chunk.tobytes(), COMPRESSION_LEVEL),
+                mask=mask
+            ))
+    db.add_all(rows)
+
+
+def read_streams(db: Session, workout_id: int, channels: Optional[Iterable[str]] = None,
+                 start: Optional[int] = None, end: Optional[int] = None) -> RecordStreams:
+    """Load only the requested channels and the chunks overlapping [start, end].
+
+    ``start``/``end`` are epoch seconds. The timestamp channel is always
+    included so the result can be trimmed to the exact range.
+    """
+    query = db.query(WorkoutStream).filter(WorkoutStream.workout_id == workout_id)
+    if channels is not None:
+        query = query.filter(WorkoutStream.channel.in_(set(channels) | {'timestamp'}))
+    if start is not None:
+        query = query.filter(WorkoutStream.end_ts >= start)
+    if end is not None:
+        query = query.filter(WorkoutStream.start_ts <= end)
+
+    chunks: Dict[str, List[WorkoutStream]] = defaultdict(list)
+    for row in query.order_by(WorkoutStream.channel, WorkoutStream.chunk_index):
+        chunks[row.channel].append(row)
+
+    columns = {}
+    masks = {}
+    for channel, rows in chunks.items():
+        columns[channel] = np.concatenate([_decode_values(row) for row in rows])
+        if channel in MASKED_CHANNELS:
+            masks[channel] = np.concatenate([_decode_mask(row) for row in rows])
+
+    return RecordStreams(columns, masks).time_range(start, end)
+
+
+def delete_streams(db: Session, workout_id: int):
+    """Remove every stream chunk of a workout. The caller commits."""
+    db.query(WorkoutStream).filter(WorkoutStream.workout_id == workout_id).delete(
+        synchronize_session=False
+    )
+
+
+def _decode_values(row: WorkoutStream) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(row.data), dtype=np.dtype(row.dtype))
+
+
+def _decode_mask(row: WorkoutStream) -> np.ndarray:
+    if row.mask is None:
+        return np.ones(row.count, dtype=bool)
+    packed = np.frombuffer(zlib.decompress(row.mask), dtype=np.uint8)
+    return np.unpackbits(packed, count=row.count).astype(bool)
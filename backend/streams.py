@@ -0,0 +1,166 @@
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import numpy as np
+
+# Canais das séries temporais de um workout e seus tipos compactos.
+# Canais float usam NaN como ausente; canais inteiros usam máscara de validade.
+CHANNEL_DTYPES = {
+    'timestamp': np.int64,
+    'position_lat': np.float64,
+    'position_long': np.float64,
+    'altitude': np.float32,
+    'distance': np.float64,
+    'speed': np.float32,
+    'heart_rate': np.uint8,
+    'cadence': np.uint8,
+    'power': np.uint16,
+}
+
+MASKED_CHANNELS = ('heart_rate', 'cadence', 'power')
+
+# Diferença entre a época FIT (1989-12-31 00:00:00 UTC) e a época Unix
+FIT_EPOCH_OFFSET = 631065600
+
+SEMICIRCLES_TO_DEGREES = 180 / 2**31
+
+
+class RecordStreams:
+    """Columnar record streams: one typed NumPy array per channel."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], masks: Optional[Dict[str, np.ndarray]] = None):
+        self.columns = columns
+        self.masks = masks or {}
+
+    def __len__(self) -> int:
+        timestamps = self.columns.get('timestamp')
+        if timestamps is not None:
+            return len(timestamps)
+        return len(next(iter(self.columns.values()), ()))
+
+    def __getitem__(self, channel: str) -> np.ndarray:
+        return self.columns[channel]
+
+    def __contains__(self, channel: str) -> bool:
+        return channel in self.columns
+
+    @property
+    def channels(self) -> List[str]:
+        return list(self.columns)
+
+    def valid(self, channel: str) -> np.ndarray:
+        """Boolean mask of samples holding a real value for the channel."""
+        if channel in self.masks:
+            return self.masks[channel]
+        values = self.columns[channel]
+        if values.dtype.kind == 'f':
+            return ~np.isnan(values)
+        return np.ones(len(values), dtype=bool)
+
+    def select(self, channels: Optional[Iterable[str]] = None) -> 'RecordStreams':
+        """Return a view restricted to the requested channels."""
+        if channels is None:
+            return self
+        wanted = [c for c in channels if c in self.columns]
+        return RecordStreams(
+            {c: self.columns[c] for c in wanted},
+            {c: self.masks[c] for c in wanted if c in self.masks}
+        )
+
+    def slice(self, start: int, stop: int) -> 'RecordStreams':
+        """Return the samples in the positional range [start, stop)."""
+        return RecordStreams(
+            {c: v[start:stop] for c, v in self.columns.items()},
+            {c: m[start:stop] for c, m in self.masks.items()}
+        )
+
+    def time_range(self, start: Optional[int] = None, end: Optional[int] = None) -> 'RecordStreams':
+        """Return the samples whose epoch timestamp falls in [start, end]."""
+        if 'timestamp' not in self.columns or (start is None and end is None):
+            return self
+        timestamps = self.columns['timestamp']
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side='right'))
+        return self.slice(lo, hi)
+
+    def to_dict(self) -> Dict[str, List[Any]]:
+        """JSON-friendly representation, with None for missing samples."""
+        result = {}
+        for channel, values in self.columns.items():
+            valid = self.valid(channel)
+            items = values.tolist()
+            if not valid.all():
+                items = [v if ok else None for v, ok in zip(items, valid.tolist())]
+            result[channel] = items
+        return result
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, List[Any]]) -> 'RecordStreams':
+        """Inverse of to_dict."""
+        builder = RecordStreamsBuilder(channels=list(data))
+        for channel, values in data.items():
+            builder.values[channel] = list(values)
+        return builder.build()
+
+    @classmethod
+    def concatenate(cls, parts: List['RecordStreams']) -> 'RecordStreams':
+        """Join consecutive chunks into a single set of streams."""
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls({})
+        channels = parts[0].channels
+        columns = {c: np.concatenate([p.columns[c] for p in parts]) for c in channels}
+        masks = {
+            c: np.concatenate([p.valid(c) for p in parts])
+            for c in channels if c in parts[0].masks
+        }
+        return cls(columns, masks)
+
+
+class RecordStreamsBuilder:
+    """Accumulates raw sample values and converts them to arrays in one pass."""
+
+    def __init__(self, channels: Optional[Iterable[str]] = None):
+        self.channels = list(channels or CHANNEL_DTYPES)
+        self.values: Dict[str, List[Any]] = {c: [] for c in self.channels}
+
+    def append(self, sample: Dict[str, Any]):
+        for channel in self.channels:
+            self.values[channel].append(sample.get(channel))
+
+    def __len__(self) -> int:
+        return len(self.values[self.channels[0]]) if self.channels else 0
+
+    def build(self) -> RecordStreams:
+        columns = {}
+        masks = {}
+        for channel in self.channels:
+            dtype = CHANNEL_DTYPES.get(channel, np.float64)
+            raw = self.values[channel]
+            if np.dtype(dtype).kind == 'f':
+                columns[channel] = np.array(
+                    [np.nan if v is None else v for v in raw], dtype=dtype
+                )
+            else:
+                mask = np.array([v is not None for v in raw], dtype=bool)
+                columns[channel] = np.array(
+                    [0 if v is None else v for v in raw], dtype=dtype
+                )
+                if channel in MASKED_CHANNELS:
+                    masks[channel] = mask
+        return RecordStreams(columns, masks)
+
+
+def semicircles_to_degrees(values: np.ndarray) -> np.ndarray:
+    """Vectorized conversion of FIT semicircles to decimal degrees."""
+    return values.astype(np.float64) * SEMICIRCLES_TO_DEGREES
+
+
+def monotonic_offsets(timestamps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Offsets in seconds from ``timestamps[0]`` and the mask of samples to keep.
+
+    If the clock jumps backwards, samples are dropped until it passes the
+    latest time already seen, so kept offsets are strictly increasing and
+    never negative.
+    """
+    offsets = (timestamps - timestamps[0]).astype(np.int64)
+    latest = np.maximum.accumulate(offsets)
+    return offsets, np.concatenate(([True], offsets[1:] > latest[:-1]))
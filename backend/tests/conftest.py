@@ -0,0 +1,80 @@
+"""Fixtures da suíte do backend.
+
+Banco, uploads e caches vão para um diretório temporário; as variáveis de
+ambiente precisam estar definidas antes do primeiro import dos módulos do
+backend, que leem a configuração no import.
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SAMPLE_FIT = BACKEND_DIR / "uploads" / "1.fit"
+
+_tmp = Path(tempfile.mkdtemp(prefix="fit-tracker-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp / 'workouts.db'}"
+os.environ["UPLOAD_DIR"] = str(_tmp / "uploads")
+os.environ["PARSE_CACHE_DIR"] = str(_tmp / "cache" / "parse")
+os.environ["REPORT_CACHE_DIR"] = str(_tmp / "cache" / "reports")
+os.environ["REPROCESS_CHECKPOINT_DIR"] = str(_tmp / "cache")
+os.environ["PROFILE_DIR"] = str(_tmp / "profiles")
+# Hash barato: os testes não medem o custo do bcrypt
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+sys.path.insert(0, str(BACKEND_DIR))
+
+_usernames = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def tmp_root() -> Path:
+    return _tmp
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers(client):
+    """Token de um usuário novo a cada teste, para isolar os dados."""
+    username = f"atleta{next(_usernames)}"
+    password = "senha-de-teste"
+    assert client.post("/register", json={"username": username, "password": password}).status_code == 201
+    token = client.post("/token", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def synthetic_fit(tmp_path):
+    """Gera atividades sintéticas: ``synthetic_fit(start_time=..., duration=...)``."""
+    from synthetic_fit import write_activity
+
+    counter = itertools.count()
+
+    def make(start_time: datetime = datetime(2025, 1, 1, 7, 0, tzinfo=timezone.utc),
+             duration: int = 1800, **kwargs) -> Path:
+        path = tmp_path / f"atividade{next(counter)}.fit"
+        write_activity(str(path), duration=duration, start_time=start_time, **kwargs)
+        return path
+
+    return make
+
+
+def upload(client, headers, path: Path, filename: str = None):
+    with open(path, "rb") as f:
+        return client.post(
+            "/upload-workout/",
+            files={"file": (filename or path.name, f.read())},
+            headers=headers
+        )
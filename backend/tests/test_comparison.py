@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta, timezone
+
+from comparison import grid_cache
+from conftest import upload
+from fit_parser import PARSER_VERSION
+
+START = datetime(2025, 6, 2, 7, 0, tzinfo=timezone.utc)
+
+
+def test_grid_cache_is_sized_and_versioned(client, auth_headers, synthetic_fit):
+    ids = [
+        upload(client, auth_headers, synthetic_fit(start_time=START + timedelta(days=days), duration=1200)).json()["id"]
+        for days in (0, 1)
+    ]
+    grid_cache.clear()
+    response = client.get("/workouts/compare", params={"ids": ",".join(map(str, ids)), "axis": "time"},
+                          headers=auth_headers)
+    assert response.status_code == 200
+
+    stats = grid_cache.stats()
+    assert stats["size"] == 2
+    assert 0 < stats["bytes"] <= stats["max_bytes"]
+    assert {key[:2] for key in grid_cache._data} == {(i, PARSER_VERSION) for i in ids}
+
+    assert client.delete(f"/workouts/{ids[0]}", headers=auth_headers).status_code == 204
+    assert [key[0] for key in grid_cache._data] == [ids[1]]
+    assert grid_cache.stats()["bytes"] < stats["bytes"]
@@ -0,0 +1,58 @@
+import numpy as np
+
+from curves import compute_curves, mean_max, resample_1hz
+from streams import RecordStreams
+
+
+def test_resample_fills_short_gaps_only():
+    timestamps = np.array([100, 101, 104, 120], dtype=np.int64)
+    values = np.array([1.0, 2.0, 3.0, 4.0])
+    grid = resample_1hz(timestamps, values, np.ones(4, dtype=bool), max_fill=5)
+    assert len(grid) == 21
+    np.testing.assert_array_equal(grid[:5], [1.0, 2.0, 2.0, 2.0, 3.0])
+    assert np.isnan(grid[10:20]).all()
+    assert grid[20] == 4.0
+
+
+def test_resample_survives_backwards_clock_jump():
+    # O relógio volta 30 s no meio da gravação e segue de lá
+    timestamps = np.concatenate([np.arange(1000, 1060), np.arange(1030, 1100)]).astype(np.int64)
+    values = np.concatenate([np.full(60, 100.0), np.full(70, 300.0)])
+    grid = resample_1hz(timestamps, values, np.ones(len(values), dtype=bool))
+
+    assert len(grid) == 100
+    # Os segundos já gravados não são sobrescritos pelos samples repetidos
+    assert (grid[:60] == 100.0).all()
+    assert (grid[60:] == 300.0).all()
+
+
+def test_resample_when_last_sample_is_behind():
+    timestamps = np.array([0, 1, 2, 3, 1, 2], dtype=np.int64)
+    grid = resample_1hz(timestamps, np.arange(6.0), np.ones(6, dtype=bool))
+    np.testing.assert_array_equal(grid, [0.0, 1.0, 2.0, 3.0])
+
+
+def test_resample_ignores_samples_before_the_first():
+    timestamps = np.array([1000, 990, 1001, 1002], dtype=np.int64)
+    grid = resample_1hz(timestamps, np.array([1.0, 9.0, 2.0, 3.0]), np.ones(4, dtype=bool))
+    np.testing.assert_array_equal(grid, [1.0, 2.0, 3.0])
+
+
+def test_curves_with_backwards_clock_jump():
+    timestamps = np.concatenate([np.arange(0, 600), np.arange(300, 900)]).astype(np.int64)
+    power = np.concatenate([np.full(600, 200), np.full(600, 250)]).astype(np.uint16)
+    streams = RecordStreams({'timestamp': timestamps, 'power': power},
+                            {'power': np.ones(len(power), dtype=bool)})
+    curves = compute_curves(streams, channels=('power',))
+    best = dict((duration, value) for duration, value, _ in curves['power'])
+    assert best[1] == 250.0
+    assert best[600] == (300 * 200 + 300 * 250) / 600
+    assert 1200 not in best
+
+
+def test_mean_max_skips_windows_across_pauses():
+    grid = np.array([1.0, 5.0, np.nan, 4.0, 4.0])
+    points = {duration: (value, offset) for duration, value, offset in mean_max(grid, (1, 2, 3))}
+    assert points[1] == (5.0, 1)
+    assert points[2] == (4.0, 3)
+    assert 3 not in points
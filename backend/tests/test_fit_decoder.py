@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import fit_parser
+from conftest import SAMPLE_FIT
+from fit_decoder import RecordDecoder, fit_crc
+from fit_parser import FITParser
+from metrics import StageTimer
+
+
+def _generic_parse(path, monkeypatch):
+    monkeypatch.setattr(fit_parser, "FAST_RECORD_DECODER", False)
+    return FITParser().parse(str(path), columnar=True)
+
+
+def _assert_same_parse(fast, generic):
+    assert fast['metadata'] == generic['metadata']
+    assert fast['laps'] == generic['laps']
+    assert fast['device_info'] == generic['device_info']
+
+    fast_records, generic_records = fast['records'], generic['records']
+    assert len(fast_records) == len(generic_records) > 0
+    assert fast_records.channels == generic_records.channels
+    for channel in generic_records.channels:
+        assert fast_records[channel].dtype == generic_records[channel].dtype, channel
+        np.testing.assert_array_equal(fast_records[channel], generic_records[channel], err_msg=channel)
+    assert fast_records.masks.keys() == generic_records.masks.keys()
+    for channel, mask in generic_records.masks.items():
+        np.testing.assert_array_equal(fast_records.masks[channel], mask, err_msg=channel)
+
+
+def test_fast_decoder_matches_fitparse_on_sample(monkeypatch):
+    fast = FITParser()._parse_fast(str(SAMPLE_FIT), StageTimer())
+    _assert_same_parse(fast, _generic_parse(SAMPLE_FIT, monkeypatch))
+
+
+def test_fast_decoder_matches_fitparse_on_synthetic(synthetic_fit, monkeypatch):
+    path = synthetic_fit(duration=3 * 3600, channels=('gps', 'heart_rate', 'power'))
+    fast = FITParser()._parse_fast(str(path), StageTimer())
+    _assert_same_parse(fast, _generic_parse(path, monkeypatch))
+
+
+def test_decoder_accepts_bytes():
+    data = SAMPLE_FIT.read_bytes()
+    fields = ['timestamp', 'heart_rate']
+    from_bytes, summary_bytes = RecordDecoder(data, fields).decode()
+    from_path, summary_path = RecordDecoder(str(SAMPLE_FIT), fields).decode()
+    assert summary_bytes == summary_path
+    for name, (values, valid) in from_path.items():
+        np.testing.assert_array_equal(from_bytes[name][0], values)
+        np.testing.assert_array_equal(from_bytes[name][1], valid)
+
+
+def test_decoder_rejects_bad_crc(tmp_path):
+    data = bytearray(SAMPLE_FIT.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    path = tmp_path / "corrompido.fit"
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="CRC"):
+        RecordDecoder(str(path), ['timestamp']).decode()
+
+
+def test_fit_crc_of_whole_file_is_zero():
+    assert fit_crc(SAMPLE_FIT.read_bytes()) == 0
@@ -0,0 +1,13 @@
+from benchmark import INGEST_MAX_RSS_MB, measure_ingest_rss
+from synthetic_fit import write_activity
+
+
+def test_full_ingest_of_50mb_file_stays_under_rss_ceiling(tmp_path):
+    source = tmp_path / "grande.fit"
+    # ~25 bytes por record com todos os canais
+    write_activity(str(source), duration=50 * 2**20 // 25)
+    assert source.stat().st_size >= 50 * 2**20
+
+    result = measure_ingest_rss(source, tmp_path)
+    assert result['records'] == 50 * 2**20 // 25
+    assert result['peak_growth_mb'] <= INGEST_MAX_RSS_MB, result
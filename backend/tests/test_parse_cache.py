@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+import parse_cache
+from conftest import upload
+from fit_parser import PARSER_VERSION
+from models import Workout
+from streams import RecordStreams
+
+
+def _entry(content_hash, version=PARSER_VERSION, mtime=None, samples=1000):
+    streams = RecordStreams({'timestamp': np.arange(samples, dtype=np.int64)}, {})
+    parse_cache.put(content_hash, version, {'records': streams, 'metadata': {}})
+    path = parse_cache.cache_path(content_hash, version)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def _content_hash(workout_id):
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return db.get(Workout, workout_id).content_hash
+    finally:
+        db.close()
+
+
+def test_sweep_drops_other_versions_and_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, "PARSE_CACHE_DIR", tmp_path)
+    old = _entry('aa' * 32, mtime=1_000_000)
+    used = _entry('ab' * 32, mtime=1_000_100)
+    recent = _entry('ac' * 32, mtime=2_000_000)
+    outdated = _entry('ad' * 32, version=PARSER_VERSION - 1)
+
+    # Uma leitura conta como uso recente
+    assert parse_cache.get('ab' * 32, PARSER_VERSION) is not None
+    max_bytes = used.stat().st_size + recent.stat().st_size
+
+    removed = parse_cache.sweep(PARSER_VERSION, max_bytes=max_bytes)
+    assert removed['outdated'] == 1 and removed['evicted'] == 1
+    assert not old.exists() and not outdated.exists()
+    assert used.exists() and recent.exists()
+
+
+def test_delete_removes_entry_with_last_workout(client, auth_headers, synthetic_fit):
+    from conftest import _usernames
+
+    path = synthetic_fit(duration=600, seed=7)
+    first = upload(client, auth_headers, path).json()["id"]
+    entry = parse_cache.cache_path(_content_hash(first), PARSER_VERSION)
+    assert entry.exists()
+
+    username = f"atleta{next(_usernames)}"
+    client.post("/register", json={"username": username, "password": "senha-de-teste"})
+    token = client.post("/token", data={"username": username, "password": "senha-de-teste"}).json()["access_token"]
+    other_headers = {"Authorization": f"Bearer {token}"}
+    other = upload(client, other_headers, path).json()["id"]
+
+    # O outro usuário ainda tem o mesmo arquivo
+    assert client.delete(f"/workouts/{first}", headers=auth_headers).status_code == 204
+    assert entry.exists()
+
+    assert client.delete(f"/workouts/{other}", headers=other_headers).status_code == 204
+    assert not entry.exists()
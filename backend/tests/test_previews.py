@@ -0,0 +1,53 @@
+from conftest import upload
+from fit_parser import PARSER_VERSION
+from previews import MAX_POINTS, preview_cache
+
+
+def _keys(workout_id):
+    return [key for key in preview_cache._data if key[0] == workout_id]
+
+
+def test_track_tolerances_share_a_bucket(client, auth_headers, synthetic_fit):
+    workout_id = upload(client, auth_headers, synthetic_fit(duration=900)).json()["id"]
+    polylines = [
+        client.get(f"/workouts/{workout_id}/track", params={"tolerance": tolerance}, headers=auth_headers).json()
+        for tolerance in (12.3, 12.4, 11.6)
+    ]
+    assert polylines[0]["polyline"]
+    assert polylines[0]["polyline"] == polylines[1]["polyline"] == polylines[2]["polyline"]
+    assert _keys(workout_id) == [(workout_id, PARSER_VERSION, 'polyline', 12.0)]
+
+
+def test_series_points_are_clamped(client, auth_headers, synthetic_fit):
+    from database import SessionLocal
+    from previews import get_series
+
+    workout_id = upload(client, auth_headers, synthetic_fit(duration=MAX_POINTS + 2000)).json()["id"]
+    db = SessionLocal()
+    try:
+        beyond = get_series(db, workout_id, MAX_POINTS * 10, ['power', 'heart_rate', 'power'])
+        clamped = get_series(db, workout_id, MAX_POINTS, ['heart_rate', 'power'])
+    finally:
+        db.close()
+    assert beyond == clamped
+    assert len(clamped['power']) == MAX_POINTS
+    assert _keys(workout_id) == [(workout_id, None, 'series', ('heart_rate', 'power'), MAX_POINTS)]
+
+
+def test_reprocessed_workout_misses_the_preview_cache(client, auth_headers, synthetic_fit):
+    from database import SessionLocal
+    from models import Workout
+
+    workout_id = upload(client, auth_headers, synthetic_fit(duration=900)).json()["id"]
+    url = f"/workouts/{workout_id}/streams/downsampled"
+    assert client.get(url, params={"points": 300}, headers=auth_headers).status_code == 200
+
+    # Reprocessado por outro processo (reprocess.py): só a versão no banco muda aqui
+    db = SessionLocal()
+    try:
+        db.query(Workout).filter(Workout.id == workout_id).update({Workout.parser_version: PARSER_VERSION + 1})
+        db.commit()
+    finally:
+        db.close()
+    assert client.get(url, params={"points": 300}, headers=auth_headers).status_code == 200
+    assert {key[1] for key in _keys(workout_id)} == {PARSER_VERSION, PARSER_VERSION + 1}
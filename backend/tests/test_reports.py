@@ -0,0 +1,76 @@
+import numpy as np
+
+from report_service import prepare_section, summarize_records
+from streams import RecordStreams
+
+
+def _records(timestamps, power):
+    power = np.asarray(power, dtype=np.uint16)
+    return RecordStreams({'timestamp': np.asarray(timestamps, dtype=np.int64), 'power': power},
+                         {'power': np.ones(len(power), dtype=bool)})
+
+
+def test_summary_skips_samples_before_a_backwards_clock_jump():
+    summary = summarize_records(_records([1000, 900, 1100, 1200], [100, 999, 200, 300]))
+    assert summary['interval'] == 60
+    assert summary['columns'] == ['power']
+    assert [row[1] for row in summary['rows']] == ['100.0', '200.0', '-', '300.0']
+
+
+def test_summary_keeps_the_latest_sample_when_the_last_one_is_behind():
+    records = _records(np.concatenate([np.arange(0, 600), np.arange(300, 400)]),
+                       np.concatenate([np.full(600, 200), np.full(100, 900)]))
+    summary = summarize_records(records)
+    assert len(summary['rows']) == 10
+    assert {row[1] for row in summary['rows']} == {'200.0'}
+    assert records.valid('power').all()
+
+
+def test_report_section_with_backwards_clock_jump():
+    timestamps = np.concatenate([np.arange(1000, 1600), np.arange(1300, 2200)])
+    section = prepare_section({'sport': 'cycling', 'records': _records(timestamps, np.full(1500, 180))})
+    assert len(section['charts']) == 1
+    assert len(section['raw_data']['rows']) == 20
+
+
+def _render(client, headers, url):
+    import time
+
+    response = client.get(url, headers=headers)
+    if response.status_code == 202:
+        status_url = response.json()["status_url"]
+        for _ in range(200):
+            job = client.get(status_url, headers=headers).json()
+            if job["status"] in ("done", "failed"):
+                break
+            time.sleep(0.05)
+        assert job["status"] == "done", job["error"]
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+
+
+def test_delete_drops_only_reports_with_the_workout(client, auth_headers, synthetic_fit):
+    from datetime import datetime, timedelta, timezone
+
+    from conftest import upload
+    from reports import report_path
+
+    start = datetime(2025, 7, 1, 7, 0, tzinfo=timezone.utc)
+    a, b, c = [
+        upload(client, auth_headers, synthetic_fit(start_time=start + timedelta(days=days), duration=600)).json()["id"]
+        for days in range(3)
+    ]
+    for ids in ([a, b], [b, c]):
+        _render(client, auth_headers, f"/reports?ids={ids[0]},{ids[1]}")
+    _render(client, auth_headers, f"/workouts/{c}/report")
+
+    assert client.delete(f"/workouts/{a}", headers=auth_headers).status_code == 204
+    assert not report_path([a, b]).exists()
+    assert not report_path([a, b]).with_suffix('.json').exists()
+    assert report_path([b, c]).exists()
+    assert report_path([c]).exists()
+
+    assert client.delete(f"/workouts/{c}", headers=auth_headers).status_code == 204
+    assert not report_path([b, c]).exists()
+    assert not report_path([c]).exists()
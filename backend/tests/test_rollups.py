@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import upload
+
+START = datetime(2025, 2, 3, 7, 0, tzinfo=timezone.utc)
+RANGE = {"start_date": "2025-01-27", "end_date": "2025-04-30"}
+
+
+def _dashboard(client, headers):
+    rollups = {
+        period: client.get("/dashboard/rollups", params={"period": period, **RANGE}, headers=headers).json()["rollups"]
+        for period in ("day", "week", "month")
+    }
+    load = client.get("/dashboard/training-load", params=RANGE, headers=headers).json()["series"]
+    return rollups, load
+
+
+def _assert_same_dashboard(actual, expected):
+    actual_rollups, actual_load = actual
+    expected_rollups, expected_load = expected
+    for period, rows in expected_rollups.items():
+        assert len(actual_rollups[period]) == len(rows), period
+        for got, want in zip(actual_rollups[period], rows):
+            assert got.keys() == want.keys()
+            for key, value in want.items():
+                assert got[key] == (pytest.approx(value, abs=1e-6) if isinstance(value, float) else value), key
+    assert [d["day"] for d in actual_load] == [d["day"] for d in expected_load]
+    for got, want in zip(actual_load, expected_load):
+        for key in ("stress", "ctl", "atl", "tsb"):
+            assert got[key] == pytest.approx(want[key], abs=1e-4), (got["day"], key)
+
+
+def test_delete_restores_rollups_and_training_load(client, auth_headers, synthetic_fit):
+    empty = _dashboard(client, auth_headers)
+    assert all(rows == [] for rows in empty[0].values())
+
+    first = upload(client, auth_headers, synthetic_fit(start_time=START, duration=3600)).json()["id"]
+    baseline = _dashboard(client, auth_headers)
+    assert baseline[0]["day"][0]["count"] == 1
+    assert any(d["ctl"] > 0 for d in baseline[1])
+
+    later = [
+        upload(client, auth_headers, synthetic_fit(start_time=START + timedelta(days=days), duration=2700)).json()["id"]
+        for days in (0, 3, 20)
+    ]
+    loaded = _dashboard(client, auth_headers)
+    assert loaded[0]["day"][0]["count"] == 2
+    assert loaded[1][-1]["ctl"] > baseline[1][-1]["ctl"]
+
+    for workout_id in later:
+        assert client.delete(f"/workouts/{workout_id}", headers=auth_headers).status_code == 204
+    _assert_same_dashboard(_dashboard(client, auth_headers), baseline)
+
+    assert client.delete(f"/workouts/{first}", headers=auth_headers).status_code == 204
+    _assert_same_dashboard(_dashboard(client, auth_headers), empty)
+
+
+def test_training_load_is_independent_of_upload_order(client, auth_headers, synthetic_fit):
+    paths = [synthetic_fit(start_time=START + timedelta(days=days), duration=1800) for days in (10, 0, 5)]
+    for path in paths:
+        assert upload(client, auth_headers, path).status_code == 200
+    shuffled = _dashboard(client, auth_headers)
+
+    for workout in client.get("/workouts/", headers=auth_headers).json():
+        client.delete(f"/workouts/{workout['id']}", headers=auth_headers)
+    for path in (paths[1], paths[2], paths[0]):
+        assert upload(client, auth_headers, path).status_code == 200
+    _assert_same_dashboard(_dashboard(client, auth_headers), shuffled)
+
+
+def test_training_load_upsert_when_row_appears_before_insert(client, monkeypatch):
+    from datetime import date
+
+    import rollups
+    from database import SessionLocal
+    from models import TrainingLoad
+
+    db = SessionLocal()
+    user_id, day = 10**6, date(2025, 5, 1)
+    decay = rollups._decay
+
+    def racing_decay(previous, when):
+        # Outro upload grava a linha do dia entre o UPDATE e o insert
+        db.add(TrainingLoad(user_id=user_id, day=day, stress=10.0,
+                            ctl=10.0 * rollups.CTL_FACTOR, atl=10.0 * rollups.ATL_FACTOR))
+        db.flush()
+        return decay(previous, when)
+
+    monkeypatch.setattr(rollups, "_decay", racing_decay)
+    try:
+        rollups._apply_load(db, user_id, day, 5.0)
+        row = db.query(TrainingLoad).filter_by(user_id=user_id, day=day).one()
+        db.refresh(row)
+        assert row.stress == pytest.approx(15.0)
+        assert row.ctl == pytest.approx(15.0 * rollups.CTL_FACTOR)
+        assert row.atl == pytest.approx(15.0 * rollups.ATL_FACTOR)
+    finally:
+        db.rollback()
+        db.close()
@@ -0,0 +1,41 @@
+import asyncio
+import hashlib
+import io
+import threading
+
+import pytest
+
+import utils
+from utils import UploadTooLargeError, save_upload
+
+
+class _Upload:
+    def __init__(self, data: bytes):
+        self.file = io.BytesIO(data)
+
+    async def read(self, size: int) -> bytes:
+        return self.file.read(size)
+
+
+def test_save_upload_writes_off_the_event_loop(tmp_path, monkeypatch):
+    data = bytes(range(256)) * 10000
+    threads = set()
+    write = utils._HashingWriter.write
+
+    def record(self, chunk):
+        threads.add(threading.current_thread())
+        return write(self, chunk)
+
+    monkeypatch.setattr(utils._HashingWriter, "write", record)
+    path, content_hash = asyncio.run(save_upload(_Upload(data), directory=tmp_path))
+
+    assert content_hash == hashlib.sha256(data).hexdigest()
+    assert path.read_bytes() == data
+    assert threads and threading.main_thread() not in threads
+
+
+def test_save_upload_over_limit_leaves_no_file(tmp_path):
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(save_upload(_Upload(b"x" * (3 * utils.UPLOAD_CHUNK_SIZE)), max_bytes=utils.UPLOAD_CHUNK_SIZE,
+                                directory=tmp_path))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,14 @@
+from benchmark import LAZY_MODULES, STARTUP_BUDGET_MS, measure_import_main
+
+
+def test_import_main_loads_no_heavy_dependency():
+    _, _, loaded = measure_import_main()
+    assert loaded == [], f"main importa {loaded} na inicialização"
+    for module in ('matplotlib', 'fpdf', 'aiosqlite', 'pyarrow'):
+        assert module in LAZY_MODULES
+
+
+def test_import_main_within_budget():
+    # Melhor de três: o primeiro import a frio também paga o cache de bytecode
+    import_ms, top_level, _ = min((measure_import_main() for _ in range(3)), key=lambda s: s[0])
+    assert import_ms <= STARTUP_BUDGET_MS, f"import main levou {import_ms:.0f} ms: {top_level}"
@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from conftest import upload
+from database import SessionLocal
+from stream_store import read_streams
+from tracks import MAX_SEGMENT_POINTS
+
+
+@contextmanager
+def _track_cell_queries():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'track_cells' in statement and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+
+
+def test_segment_efforts_resolve_candidates_in_one_query(client, auth_headers, synthetic_fit):
+    workout_id = upload(client, auth_headers, synthetic_fit(duration=1800)).json()["id"]
+    db = SessionLocal()
+    try:
+        streams = read_streams(db, workout_id, channels=('position_lat', 'position_long'))
+    finally:
+        db.close()
+    # 30 pontos ao longo de um trecho do meio da trilha
+    segment = [[float(streams['position_lat'][i]), float(streams['position_long'][i])]
+               for i in range(300, 1500, 40)]
+
+    with _track_cell_queries() as statements:
+        response = client.post("/segments/efforts", json={"points": segment}, headers=auth_headers)
+    assert response.status_code == 200
+    assert [e["workout_id"] for e in response.json()["efforts"]] == [workout_id]
+    assert len(statements) == 1
+
+    # Um ponto longe da trilha elimina o candidato
+    away = segment + [[segment[-1][0] + 1.0, segment[-1][1]]]
+    response = client.post("/segments/efforts", json={"points": away}, headers=auth_headers)
+    assert response.json()["efforts"] == []
+
+
+def test_segment_points_are_capped_and_validated(client, auth_headers):
+    def post(points):
+        return client.post("/segments/efforts", json={"points": points}, headers=auth_headers)
+
+    assert post([[-18.9, -48.2]] * (MAX_SEGMENT_POINTS + 1)).status_code == 422
+    assert post([[-18.9, -48.2]]).status_code == 422
+    assert post([[95.0, -48.2], [-18.9, -48.2]]).status_code == 422
+    assert post([[-18.9, -48.2], [-18.9, 181.0]]).status_code == 422
+    assert post([[-18.9, -48.2, 10.0], [-18.9, -48.2]]).status_code == 422
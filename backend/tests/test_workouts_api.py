@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+
+from conftest import SAMPLE_FIT, upload
+
+
+def _workout_ids(client, headers, **params):
+    response = client.get("/workouts/", params={"limit": 500, **params}, headers=headers)
+    assert response.status_code == 200
+    return [w["id"] for w in response.json()]
+
+
+def test_duplicate_upload_returns_existing_workout(client, auth_headers):
+    first = upload(client, auth_headers, SAMPLE_FIT)
+    assert first.status_code == 200
+    again = upload(client, auth_headers, SAMPLE_FIT, filename="copia.fit")
+    assert again.status_code == 200
+    assert again.json()["id"] == first.json()["id"]
+    assert again.json()["filename"] == "1.fit"
+    assert _workout_ids(client, auth_headers) == [first.json()["id"]]
+
+
+def test_same_file_is_not_shared_between_users(client, auth_headers):
+    from conftest import _usernames
+
+    first = upload(client, auth_headers, SAMPLE_FIT).json()["id"]
+    username = f"atleta{next(_usernames)}"
+    client.post("/register", json={"username": username, "password": "senha-de-teste"})
+    token = client.post("/token", data={"username": username, "password": "senha-de-teste"}).json()["access_token"]
+    other = upload(client, {"Authorization": f"Bearer {token}"}, SAMPLE_FIT).json()["id"]
+    assert other != first
+
+
+def test_keyset_cursor_round_trip(client, auth_headers, synthetic_fit):
+    start = datetime(2025, 3, 1, 7, 0, tzinfo=timezone.utc)
+    # Dois workouts no mesmo horário: o id desempata a ordenação
+    paths = [synthetic_fit(start_time=start + timedelta(days=i), duration=600) for i in range(4)]
+    paths.append(synthetic_fit(start_time=start + timedelta(days=2), duration=600, seed=1))
+    for path in paths:
+        assert upload(client, auth_headers, path).status_code == 200
+    expected = _workout_ids(client, auth_headers)
+    assert len(expected) == 5
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/workouts/", params=params, headers=auth_headers)
+        assert response.status_code == 200
+        seen.extend(w["id"] for w in response.json())
+        pages += 1
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert seen == expected
+    assert pages == 3
+
+    times = [w["start_time"] for w in client.get("/workouts/", headers=auth_headers).json()]
+    assert times == sorted(times, reverse=True)
+
+
+def test_invalid_cursor_is_rejected(client, auth_headers):
+    response = client.get("/workouts/", params={"cursor": "nao-e-um-cursor"}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_workouts_etag_and_304(client, auth_headers):
+    response = client.get("/workouts/", headers=auth_headers)
+    etag = response.headers["etag"]
+    assert response.json() == []
+
+    cached = client.get("/workouts/", headers={**auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    # Outra query string, outro ETag
+    assert client.get("/workouts/?limit=1", headers=auth_headers).headers["etag"] != etag
+
+    workout_id = upload(client, auth_headers, SAMPLE_FIT).json()["id"]
+    changed = client.get("/workouts/", headers={**auth_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert [w["id"] for w in changed.json()] == [workout_id]
+    new_etag = changed.headers["etag"]
+    assert new_etag != etag
+    assert client.get("/workouts/", headers={**auth_headers, "If-None-Match": f'W/{new_etag}'}).status_code == 304
+
+    assert client.delete(f"/workouts/{workout_id}", headers=auth_headers).status_code == 204
+    after_delete = client.get("/workouts/", headers={**auth_headers, "If-None-Match": new_etag})
+    assert after_delete.status_code == 200
+    assert after_delete.json() == []
+
+
+def test_users_me_etag_and_304(client, auth_headers):
+    response = client.get("/users/me", headers=auth_headers)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert client.get("/users/me", headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+    assert client.get("/users/me", headers={**auth_headers, "If-None-Match": '"outro"'}).status_code == 200
+
+
+def test_etag_is_per_user(client, auth_headers):
+    from conftest import _usernames
+
+    etag = client.get("/workouts/", headers=auth_headers).headers["etag"]
+    username = f"atleta{next(_usernames)}"
+    client.post("/register", json={"username": username, "password": "senha-de-teste"})
+    token = client.post("/token", data={"username": username, "password": "senha-de-teste"}).json()["access_token"]
+    other = client.get("/workouts/", headers={"Authorization": f"Bearer {token}", "If-None-Match": etag})
+    assert other.status_code == 200
@@ -0,0 +1,193 @@
+"""Índice espacial das trilhas GPS: células de grade, bbox e polylines simplificadas.
+
+As buscas ("passa por este segmento", "começa perto daqui") consultam
+apenas o índice para escolher candidatos; só as trilhas candidatas são
+lidas do stream store.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import os
+import zlib
+
+import numpy as np
+from sqlalchemy import Integer, and_, column, func, select, values
+from sqlalchemy.orm import Session
+
+from geo import bounding_box, cells_around, grid_cells, haversine, passes, simplify
+from models import TrackCell, Workout, WorkoutTrack
+from stream_store import read_streams
+from streams import RecordStreams
+
+# Configurações
+CELL_DEGREES = float(os.getenv("TRACK_CELL_DEGREES", "0.005"))  # ~550 m
+SIMPLIFY_TOLERANCE_M = float(os.getenv("TRACK_SIMPLIFY_TOLERANCE_M", "5"))
+SEGMENT_RADIUS_M = 25.0
+MAX_SEGMENT_POINTS = 100
+# Células consultadas por busca de segmento (perto dos polos cada ponto cobre muitas)
+MAX_SEGMENT_CELLS = 5000
+
+POSITION_CHANNELS = ('position_lat', 'position_long')
+
+
+def _positions(streams: RecordStreams) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Valid (lat, lon, timestamp) samples of the streams."""
+    if not all(channel in streams for channel in POSITION_CHANNELS):
+        return np.empty(0), np.empty(0), np.empty(0, dtype=np.int64)
+    lat, lon = streams['position_lat'], streams['position_long']
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    return lat[valid], lon[valid], streams['timestamp'][valid]
+
+
+def index_track(db: Session, workout: Workout, streams: RecordStreams) -> Optional[WorkoutTrack]:
+    """Add the workout's track and grid cells to the spatial index (no commit)."""
+    lat, lon, _ = _positions(streams)
+    if len(lat) < 2:
+        return None
+
+    keep = simplify(lat, lon, SIMPLIFY_TOLERANCE_M)
+    polyline = np.column_stack((lat[keep], lon[keep])).astype('<f8')
+    track = WorkoutTrack(
+        workout_id=workout.id,
+        user_id=workout.user_id,
+        min_lat=float(lat.min()), max_lat=float(lat.max()),
+        min_lon=float(lon.min()), max_lon=float(lon.max()),
+        start_lat=float(lat[0]), start_lon=float(lon[0]),
+        points=len(polyline),
+        polyline=zlib.compress(polyline.tobytes())
+    )
+    db.add(track)
+    db.execute(TrackCell.__table__.insert(), [
+        {'workout_id': workout.id, 'user_id': workout.user_id,
+         'cell_lat': int(cell_lat), 'cell_lon': int(cell_lon)}
+        for cell_lat, cell_lon in grid_cells(lat, lon, CELL_DEGREES)
+    ])
+    return track
+
+
+def delete_track(db: Session, workout_id: int):
+    db.query(TrackCell).filter(TrackCell.workout_id == workout_id).delete(synchronize_session=False)
+    db.query(WorkoutTrack).filter(WorkoutTrack.workout_id == workout_id).delete(synchronize_session=False)
+
+
+def load_polyline(track: WorkoutTrack) -> np.ndarray:
+    """Simplified track as an (n, 2) array of [lat, lon]."""
+    return np.frombuffer(zlib.decompress(track.polyline), dtype='<f8').reshape(-1, 2)
+
+
+def workouts_near(db: Session, user_id: int, lat: float, lon: float,
+                  radius_m: float) -> List[Dict[str, Any]]:
+    """Workouts starting within ``radius_m`` of the point, nearest first."""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_m)
+    rows = (
+        db.query(WorkoutTrack.workout_id, WorkoutTrack.start_lat, WorkoutTrack.start_lon,
+                 Workout.filename, Workout.activity_type, Workout.start_time)
+        .join(Workout, Workout.id == WorkoutTrack.workout_id)
+        .filter(
+            WorkoutTrack.user_id == user_id,
+            WorkoutTrack.start_lat.between(min_lat, max_lat),
+            WorkoutTrack.start_lon.between(min_lon, max_lon)
+        )
+        .all()
+    )
+    if not rows:
+        return []
+    distances = haversine([r.start_lat for r in rows], [r.start_lon for r in rows], lat, lon)
+    found = [
+        {'workout_id': r.workout_id, 'filename': r.filename, 'activity_type': r.activity_type,
+         'start_time': r.start_time, 'distance_m': round(float(d), 1)}
+        for r, d in zip(rows, distances) if d <= radius_m
+    ]
+    return sorted(found, key=lambda w: w['distance_m'])
+
+
+def validate_segment(points: Sequence[Sequence[float]]) -> np.ndarray:
+    """Segment as an (n, 2) array of [lat, lon]; ValueError if malformed or out of range."""
+    segment = np.asarray(points, dtype=np.float64)
+    if segment.ndim != 2 or segment.shape[1] != 2 or len(segment) < 2:
+        raise ValueError("O segmento precisa de pelo menos 2 pontos [lat, lon]")
+    if len(segment) > MAX_SEGMENT_POINTS:
+        raise ValueError(f"O segmento pode ter no máximo {MAX_SEGMENT_POINTS} pontos")
+    if not np.isfinite(segment).all() or (np.abs(segment[:, 0]) > 90).any() \
+            or (np.abs(segment[:, 1]) > 180).any():
+        raise ValueError("Coordenadas inválidas: lat entre -90 e 90, lon entre -180 e 180")
+    return segment
+
+
+def candidate_workouts(db: Session, user_id: int, points: np.ndarray, radius_m: float) -> List[int]:
+    """Workouts whose tracks cross the grid cells around every segment point.
+
+    All points are resolved in one query: the (point, cell) pairs are
+    joined against the index and a workout qualifies when it matches
+    every point.
+    """
+    rows = [
+        (i, int(a), int(b))
+        for i, (lat, lon) in enumerate(points)
+        for a, b in cells_around(lat, lon, radius_m, CELL_DEGREES)
+    ]
+    if len(rows) > MAX_SEGMENT_CELLS:
+        raise ValueError("Segmento abrange células demais; use menos pontos ou um raio menor")
+    cells = values(
+        column('point', Integer), column('cell_lat', Integer), column('cell_lon', Integer),
+        name='segment_cells'
+    ).data(rows).cte()
+    query = (
+        select(TrackCell.workout_id)
+        .join(cells, and_(TrackCell.cell_lat == cells.c.cell_lat, TrackCell.cell_lon == cells.c.cell_lon))
+        .where(TrackCell.user_id == user_id)
+        .group_by(TrackCell.workout_id)
+        .having(func.count(cells.c.point.distinct()) == len(points))
+        .order_by(TrackCell.workout_id)
+    )
+    return list(db.execute(query).scalars())
+
+
+def match_segment(lat: np.ndarray, lon: np.ndarray,
+                  segment: np.ndarray, radius_m: float) -> List[Tuple[int, int]]:
+    """``(start, end)`` sample indices of every traversal of the segment.
+
+    A traversal is a pass near the segment's first point followed by the
+    next pass near its last point, with every intermediate segment point
+    approached in between. All distances are computed vectorized over the
+    whole track.
+    """
+    starts = passes(haversine(lat, lon, segment[0, 0], segment[0, 1]), radius_m)
+    ends = passes(haversine(lat, lon, segment[-1, 0], segment[-1, 1]), radius_m)
+    if not len(starts) or not len(ends):
+        return []
+
+    efforts = []
+    previous_end = -1
+    for end in ends:
+        # Passagem pelo início mais recente antes deste fim
+        position = int(np.searchsorted(starts, end)) - 1
+        if position < 0 or starts[position] <= previous_end:
+            continue
+        start = int(starts[position])
+        window = slice(start, int(end) + 1)
+        if all(haversine(lat[window], lon[window], p_lat, p_lon).min() <= radius_m
+               for p_lat, p_lon in segment[1:-1]):
+            efforts.append((start, int(end)))
+            previous_end = int(end)
+    return efforts
+
+
+def segment_efforts(db: Session, user_id: int, points: Sequence[Sequence[float]],
+                    radius_m: float = SEGMENT_RADIUS_M) -> List[Dict[str, Any]]:
+    """Every workout passing through the segment with its efforts, fastest first."""
+    segment = validate_segment(points)
+
+    results = []
+    for workout_id in candidate_workouts(db, user_id, segment, radius_m):
+        lat, lon, timestamps = _positions(read_streams(db, workout_id, channels=POSITION_CHANNELS))
+        efforts = match_segment(lat, lon, segment, radius_m)
+        if not efforts:
+            continue
+        elapsed = [int(timestamps[end] - timestamps[start]) for start, end in efforts]
+        best = int(np.argmin(elapsed))
+        results.append({
+            'workout_id': workout_id,
+            'best_elapsed': elapsed[best],
+            'best_start_offset': int(timestamps[efforts[best][0]] - timestamps[0]),
+            'efforts': elapsed
+        })
+    return sorted(results, key=lambda r: r['best_elapsed'])
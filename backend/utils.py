@@ -1,9 +1,19 @@
 from datetime import datetime, timedelta
+from pathlib import Path
 import hashlib
 import os
-from typing import Dict, Any
+import tempfile
+from typing import Dict, Any, Optional, Tuple
 import json
 
+from workers import worker_pool
+
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", Path(__file__).parent / "uploads"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+class UploadTooLargeError(Exception):
+    """Upload excede o tamanho máximo permitido"""
+
 def generate_file_hash(file_path: str) -> str:
     """Gera hash SHA256 do arquivo"""
     sha256 = hashlib.sha256()
@@ -12,6 +22,70 @@ def generate_file_hash(file_path: str) -> str:
             sha256.update(chunk)
     return sha256.hexdigest()
 
+def upload_path(content_hash: str) -> Path:
+    """Caminho do arquivo original, endereçado pelo hash do conteúdo"""
+    return UPLOAD_DIR / f"{content_hash}.fit"
+
+class _HashingWriter:
+    """Grava chunks em um arquivo temporário calculando o SHA256 no caminho"""
+    def __init__(self, directory: Path, max_bytes: Optional[int] = None):
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        fd, self.tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        self.file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise UploadTooLargeError(f"Arquivo maior que {self.max_bytes} bytes")
+        self.sha256.update(chunk)
+        self.file.write(chunk)
+
+    def commit(self, suffix: str) -> Tuple[Path, str]:
+        self.file.close()
+        content_hash = self.sha256.hexdigest()
+        path = self.directory / f"{content_hash}{suffix}"
+        # Mesmo hash, mesmo conteúdo: substituir um arquivo existente é inofensivo
+        os.replace(self.tmp_path, path)
+        return path, content_hash
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.unlink(self.tmp_path)
+
+async def save_upload(upload, max_bytes: Optional[int] = None, directory: Optional[Path] = None,
+                      suffix: str = '.fit') -> Tuple[Path, str]:
+    """Grava o upload em disco em chunks, calculando o SHA256 no caminho.
+
+    A memória usada é limitada a um chunk, independente do tamanho do arquivo.
+    Gravação e hash de cada chunk rodam no pool de hash, fora do event loop.
+    """
+    writer = _HashingWriter(directory or UPLOAD_DIR, max_bytes)
+    try:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            await worker_pool.run_hash(writer.write, chunk)
+        return await worker_pool.run_hash(writer.commit, suffix)
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def save_stream(fileobj, max_bytes: Optional[int] = None, directory: Optional[Path] = None,
+                suffix: str = '.fit') -> Tuple[Path, str]:
+    """Versão síncrona de save_upload para arquivos já abertos (ex.: membros de ZIP)"""
+    writer = _HashingWriter(directory or UPLOAD_DIR, max_bytes)
+    try:
+        while chunk := fileobj.read(UPLOAD_CHUNK_SIZE):
+            writer.write(chunk)
+        return writer.commit(suffix)
+    except BaseException:
+        writer.abort()
+        raise
+
 def format_timedelta(delta: timedelta) -> str:
     """Formata timedelta para string HH:MM:SS"""
     total_seconds = int(delta.total_seconds())
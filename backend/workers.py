@@ -0,0 +1,170 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import logging
+import os
+import threading
+import uuid
+
+# Configurações
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", os.cpu_count() or 2))
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+MAX_PENDING_UPLOADS = int(os.getenv("MAX_PENDING_UPLOADS", "16"))
+JOB_TTL_MINUTES = int(os.getenv("JOB_TTL_MINUTES", "60"))
+
+
+class QueueFullError(Exception):
+    """Raised when the upload queue is at capacity."""
+
+
+class WorkerPool:
+    """Process pool for CPU-bound parsing and thread pools for blocking work.
+
+    Password hashing gets its own small thread pool (bcrypt releases the
+    GIL), so a login burst is capped at ``hash_workers`` concurrent hashes
+    and never starves the DB pool. PDF reports render on their own pool
+    for the same reason.
+
+    ``PARSE_WORKERS=0`` runs parsing on the thread pool instead, which is
+    useful for debugging and for environments without multiprocessing.
+    """
+
+    def __init__(self, parse_workers: int = PARSE_WORKERS, db_workers: int = DB_WORKERS,
+                 max_pending: int = MAX_PENDING_UPLOADS, hash_workers: int = HASH_WORKERS,
+                 report_workers: int = REPORT_WORKERS):
+        self.logger = logging.getLogger(__name__)
+        self.parse_workers = parse_workers
+        self.db_workers = db_workers
+        self.hash_workers = hash_workers
+        self.report_workers = report_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._cpu_executor: Optional[Executor] = None
+        self._db_executor: Optional[Executor] = None
+        self._hash_executor: Optional[Executor] = None
+        self._report_executor: Optional[Executor] = None
+
+    @property
+    def cpu_executor(self) -> Executor:
+        if self._cpu_executor is None:
+            if self.parse_workers > 0:
+                self._cpu_executor = ProcessPoolExecutor(max_workers=self.parse_workers)
+            else:
+                self._cpu_executor = self.db_executor
+        return self._cpu_executor
+
+    @property
+    def db_executor(self) -> Executor:
+        if self._db_executor is None:
+            self._db_executor = ThreadPoolExecutor(max_workers=self.db_workers,
+                                                   thread_name_prefix="db")
+        return self._db_executor
+
+    @property
+    def hash_executor(self) -> Executor:
+        if self._hash_executor is None:
+            self._hash_executor = ThreadPoolExecutor(max_workers=self.hash_workers,
+                                                     thread_name_prefix="hash")
+        return self._hash_executor
+
+    @property
+    def report_executor(self) -> Executor:
+        if self._report_executor is None:
+            self._report_executor = ThreadPoolExecutor(max_workers=self.report_workers,
+                                                       thread_name_prefix="report")
+        return self._report_executor
+
+    def acquire(self):
+        """Reserve one of the bounded upload slots, failing fast when full."""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise QueueFullError(f"{self.pending} uploads já em processamento")
+            self.pending += 1
+
+    def release(self):
+        with self._lock:
+            self.pending -= 1
+
+    async def run_cpu(self, func: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cpu_executor, func, *args)
+
+    async def run_db(self, func: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.db_executor, func, *args)
+
+    async def run_hash(self, func: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.hash_executor, func, *args)
+
+    async def run_report(self, func: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.report_executor, func, *args)
+
+    def shutdown(self):
+        for executor in (self._cpu_executor, self._db_executor, self._hash_executor,
+                         self._report_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._cpu_executor = None
+        self._db_executor = None
+        self._hash_executor = None
+        self._report_executor = None
+
+
+class JobRegistry:
+    """In-memory registry of background upload jobs."""
+
+    def __init__(self, ttl: timedelta = timedelta(minutes=JOB_TTL_MINUTES)):
+        self.ttl = ttl
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def submit(self, user_id: int, coro) -> str:
+        """Schedule ``coro`` on the running loop and return its job id."""
+        self._prune()
+        job_id = uuid.uuid4().hex
+        self.jobs[job_id] = {
+            'id': job_id,
+            'user_id': user_id,
+            'status': 'pending',
+            'result': None,
+            'error': None,
+            'created_at': datetime.utcnow(),
+            'finished_at': None
+        }
+        self._tasks[job_id] = asyncio.create_task(self._run(job_id, coro))
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(job_id)
+
+    async def _run(self, job_id: str, coro):
+        job = self.jobs[job_id]
+        job['status'] = 'running'
+        try:
+            job['result'] = await coro
+            job['status'] = 'done'
+        except Exception as e:
+            job['error'] = str(e)
+            job['status'] = 'failed'
+        finally:
+            job['finished_at'] = datetime.utcnow()
+            self._tasks.pop(job_id, None)
+
+    def _prune(self):
+        limit = datetime.utcnow() - self.ttl
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job['finished_at'] is not None and job['finished_at'] < limit
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+
+worker_pool = WorkerPool()
+job_registry = JobRegistry()
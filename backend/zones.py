@@ -0,0 +1,267 @@
+"""Zonas de treino por usuário e histogramas de tempo em zona.
+
+O tempo em cada zona (FC, potência e pace) é calculado a partir das séries
+no upload e gravado em ``workout_zone_times``; o dashboard só soma essas
+linhas. Quando o usuário edita as zonas, os histogramas são recalculados
+por um job em background.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+import asyncio
+import logging
+import os
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from curves import MAX_FILL_SECONDS
+from database import SessionLocal
+from models import UserZones, Workout, WorkoutZoneTime
+from rollups import HR_MAX
+from stream_store import read_streams
+from streams import RecordStreams
+from workers import job_registry, worker_pool
+
+# Configurações
+FTP = float(os.getenv("FTP", "200"))
+THRESHOLD_PACE = float(os.getenv("THRESHOLD_PACE", "300"))  # s/km
+MAX_ZONES = 10
+BATCH_SIZE = 50
+
+ZONE_KINDS = ('heart_rate', 'power', 'pace')
+
+# Canal das séries usado por cada tipo de zona (pace vem da velocidade)
+ZONE_CHANNELS = {'heart_rate': 'heart_rate', 'power': 'power', 'pace': 'speed'}
+
+# Pace só faz sentido para esportes a pé
+PACE_ACTIVITIES = ('running', 'walking', 'hiking')
+
+# Limites padrão: % da FC máxima, % do FTP (Coggan) e % do pace de limiar
+DEFAULT_ZONES = {
+    'heart_rate': [round(HR_MAX * f) for f in (0.6, 0.7, 0.8, 0.9)],
+    'power': [round(FTP * f) for f in (0.55, 0.75, 0.9, 1.05, 1.2, 1.5)],
+    'pace': [round(THRESHOLD_PACE * f) for f in (1.29, 1.14, 1.06, 0.99)],
+}
+
+logger = logging.getLogger(__name__)
+
+# Um recálculo por usuário de cada vez; edições seguidas esperam o anterior
+_recompute_locks: Dict[int, asyncio.Lock] = {}
+
+
+def validate_bounds(kind: str, bounds: Sequence[float]) -> List[float]:
+    """Check one kind's boundaries; pace is in s/km and decreases (faster zones)."""
+    if kind not in ZONE_KINDS:
+        raise ValueError(f"Tipo de zona inválido; use um de: {', '.join(ZONE_KINDS)}")
+    bounds = [float(b) for b in bounds]
+    if not 1 <= len(bounds) < MAX_ZONES:
+        raise ValueError(f"{kind}: informe entre 1 e {MAX_ZONES - 1} limites")
+    if any(b <= 0 or not np.isfinite(b) for b in bounds):
+        raise ValueError(f"{kind}: limites devem ser positivos")
+    steps = np.diff(bounds)
+    if kind == 'pace' and (steps >= 0).any():
+        raise ValueError("pace: limites devem ser decrescentes (s/km)")
+    if kind != 'pace' and (steps <= 0).any():
+        raise ValueError(f"{kind}: limites devem ser crescentes")
+    return bounds
+
+
+def get_zones(db: Session, user_id: int) -> Dict[str, Any]:
+    """The user's boundaries per kind (defaults where unset) and their version."""
+    row = db.get(UserZones, user_id)
+    zones = {
+        kind: (getattr(row, kind) if row is not None and getattr(row, kind) else DEFAULT_ZONES[kind])
+        for kind in ZONE_KINDS
+    }
+    return {'version': row.version if row is not None else 0, 'zones': zones}
+
+
+def set_zones(db: Session, user_id: int, changes: Dict[str, Optional[Sequence[float]]]) -> int:
+    """Replace the given kinds' boundaries (``None`` restores the default); returns the new version.
+
+    Commits, so the background recompute sees the new boundaries.
+    """
+    values = {kind: validate_bounds(kind, b) if b is not None else None for kind, b in changes.items()}
+    query = db.query(UserZones).filter(UserZones.user_id == user_id)
+    if not query.update({**values, UserZones.version: UserZones.version + 1}, synchronize_session=False):
+        try:
+            with db.begin_nested():
+                db.add(UserZones(user_id=user_id, version=1, **values))
+        except IntegrityError:
+            # Outra edição criou a linha entre o UPDATE e o insert
+            query.update({**values, UserZones.version: UserZones.version + 1}, synchronize_session=False)
+    db.commit()
+    return db.query(UserZones.version).filter(UserZones.user_id == user_id).scalar()
+
+
+def save_zones(user_id: int, changes: Dict[str, Optional[Sequence[float]]]) -> int:
+    """set_zones em uma sessão própria (executa no pool de threads)."""
+    db = SessionLocal()
+    try:
+        return set_zones(db, user_id, changes)
+    finally:
+        db.close()
+
+
+def _speed_bounds(pace_bounds: Sequence[float]) -> np.ndarray:
+    """Pace limits (s/km, decreasing) as speed limits (m/s, increasing)."""
+    return 1000.0 / np.asarray(pace_bounds, dtype=np.float64)
+
+
+def time_in_zones(streams: RecordStreams, zones: Dict[str, Sequence[float]],
+                  activity_type: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Seconds per zone for every kind with data, in one vectorized pass per channel.
+
+    Each sample counts until the next one, capped at ``MAX_FILL_SECONDS``
+    so pauses don't inflate the zone the recording stopped in (the same
+    rule as the mean-max curves). Pace ignores stopped samples.
+    """
+    if 'timestamp' not in streams or len(streams) < 1:
+        return {}
+    timestamps = streams['timestamp'].astype(np.int64)
+    weights = np.minimum(np.diff(timestamps, append=timestamps[-1] + 1), MAX_FILL_SECONDS)
+    weights = np.maximum(weights, 0).astype(np.float64)
+
+    histograms = {}
+    for kind, bounds in zones.items():
+        channel = ZONE_CHANNELS[kind]
+        if channel not in streams:
+            continue
+        if kind == 'pace' and activity_type not in PACE_ACTIVITIES:
+            continue
+        values = streams[channel].astype(np.float64)
+        valid = streams.valid(channel) & np.isfinite(values) & (values > 0)
+        if not valid.any():
+            continue
+        edges = _speed_bounds(bounds) if kind == 'pace' else np.asarray(bounds, dtype=np.float64)
+        zone = np.searchsorted(edges, values[valid], side='right')
+        seconds = np.bincount(zone, weights=weights[valid], minlength=len(edges) + 1)
+        if seconds.any():
+            histograms[kind] = seconds
+    return histograms
+
+
+def store_zone_times(db: Session, workout: Workout, streams: RecordStreams,
+                     config: Optional[Dict[str, Any]] = None):
+    """Persist the workout's time-in-zone rows under the user's current zones (no commit)."""
+    config = config or get_zones(db, workout.user_id)
+    histograms = time_in_zones(streams, config['zones'], workout.activity_type)
+    rows = [
+        {
+            'workout_id': workout.id,
+            'user_id': workout.user_id,
+            'kind': kind,
+            'zone': index + 1,
+            'seconds': float(value),
+            'start_time': workout.start_time
+        }
+        for kind, seconds in histograms.items()
+        for index, value in enumerate(seconds)
+        if value > 0
+    ]
+    if rows:
+        db.execute(WorkoutZoneTime.__table__.insert(), rows)
+    workout.zones_version = config['version']
+
+
+def delete_zone_times(db: Session, workout_id: int):
+    db.query(WorkoutZoneTime).filter(WorkoutZoneTime.workout_id == workout_id).delete(synchronize_session=False)
+
+
+def recompute_zone_times(db: Session, user_id: int, batch_size: int = BATCH_SIZE) -> int:
+    """Rebuild the histograms of every workout computed under older zones.
+
+    Works in batches of ``batch_size`` with one commit each, so an
+    interrupted run resumes where it stopped. The zones are re-read per
+    batch: an edit made meanwhile applies to the remaining workouts, and
+    the ones already done are picked up by the edit's own job.
+    """
+    done = 0
+    last_id = 0
+    while True:
+        config = get_zones(db, user_id)
+        batch: List[Workout] = (
+            db.query(Workout)
+            .filter(
+                Workout.user_id == user_id,
+                Workout.id > last_id,
+                (Workout.zones_version.is_(None)) | (Workout.zones_version != config['version'])
+            )
+            .order_by(Workout.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        for workout in batch:
+            last_id = workout.id
+            delete_zone_times(db, workout.id)
+            store_zone_times(db, workout, read_streams(db, workout.id, channels=ZONE_CHANNELS.values()),
+                             config)
+            done += 1
+        db.commit()
+        db.expunge_all()
+    return done
+
+
+def _recompute_job(user_id: int) -> Dict[str, Any]:
+    """recompute_zone_times em uma sessão própria (executa no pool de threads)."""
+    db = SessionLocal()
+    try:
+        done = recompute_zone_times(db, user_id)
+        logger.info(f"Zonas recalculadas para {done} workouts do usuário {user_id}")
+        return {'recomputed': done, 'version': get_zones(db, user_id)['version']}
+    finally:
+        db.close()
+
+
+async def _run_recompute(user_id: int) -> Dict[str, Any]:
+    lock = _recompute_locks.setdefault(user_id, asyncio.Lock())
+    async with lock:
+        return await worker_pool.run_db(_recompute_job, user_id)
+
+
+def start_recompute(user_id: int) -> str:
+    """Job id recomputing the user's histograms in the background."""
+    return job_registry.submit(user_id, _run_recompute(user_id))
+
+
+def get_zone_totals(db: Session, user_id: int, kind: str, start_date: Optional[date] = None,
+                    end_date: Optional[date] = None, activity_type: Optional[str] = None) -> Dict[str, Any]:
+    """Seconds per zone summed over the workouts started in [start_date, end_date].
+
+    Reads only the precomputed ``workout_zone_times`` rows. ``from``/``to``
+    are the zone's limits in the kind's unit (s/km for pace).
+    """
+    filters = [WorkoutZoneTime.user_id == user_id, WorkoutZoneTime.kind == kind]
+    if start_date:
+        filters.append(WorkoutZoneTime.start_time >= datetime.combine(start_date, time.min))
+    if end_date:
+        filters.append(WorkoutZoneTime.start_time < datetime.combine(end_date + timedelta(days=1), time.min))
+    query = db.query(WorkoutZoneTime.zone, func.sum(WorkoutZoneTime.seconds)).filter(*filters)
+    if activity_type:
+        query = query.join(Workout, Workout.id == WorkoutZoneTime.workout_id).filter(
+            Workout.activity_type == activity_type
+        )
+    totals = {zone: seconds for zone, seconds in query.group_by(WorkoutZoneTime.zone)}
+    workouts = query.with_entities(func.count(WorkoutZoneTime.workout_id.distinct())).scalar()
+
+    bounds = get_zones(db, user_id)['zones'][kind]
+    edges = [None] + list(bounds) + [None]
+    zones = [
+        {'zone': i, 'from': edges[i - 1], 'to': edges[i], 'seconds': float(totals.get(i, 0.0))}
+        for i in range(1, len(bounds) + 2)
+    ]
+    # Zonas acima das atuais (de limites antigos ainda em recálculo)
+    zones.extend(
+        {'zone': i, 'from': None, 'to': None, 'seconds': float(s)}
+        for i, s in sorted(totals.items()) if i > len(bounds) + 1
+    )
+    return {
+        'kind': kind,
+        'zones': zones,
+        'total_seconds': float(sum(totals.values())),
+        'workouts': workouts or 0
+    }
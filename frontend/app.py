@@ -5,6 +5,7 @@ from typing import Optional
 
 # Configurações
 BACKEND_URL = "http://localhost:8000"  # Altere se necessário
+WORKOUTS_PAGE_SIZE = 50
 st.set_page_config(page_title="Workouts Tracker", layout="centered")
 
 # Estado da sessão
@@ -66,6 +67,8 @@ def logout():
         "username": None,
         "logged_in": False
     }
+    st.session_state.pop("etag_cache", None)
+    st.session_state.pop("workout_listing", None)
     st.success("Você foi desconectado")
 
 def get_auth_header() -> Optional[dict]:
@@ -74,6 +77,55 @@ def get_auth_header() -> Optional[dict]:
         return {"Authorization": f"Bearer {st.session_state.auth['token']}"}
     return None
 
+def _cache_key(path: str, params: Optional[dict] = None) -> tuple:
+    return (path, tuple(sorted((params or {}).items())))
+
+def cached_get(headers: dict, path: str, params: Optional[dict] = None):
+    """GET condicional: reenvia o ETag da última resposta e reaproveita os dados no 304"""
+    cache = st.session_state.setdefault("etag_cache", {})
+    key = _cache_key(path, params)
+    request_headers = dict(headers or {})
+    if key in cache:
+        request_headers["If-None-Match"] = cache[key][0]
+    response = requests.get(f"{BACKEND_URL}{path}", headers=request_headers, params=params)
+    if response.status_code == 304 and key in cache:
+        return cache[key][1]
+    response.raise_for_status()
+    data = response.json()
+    if response.headers.get("ETag"):
+        cache[key] = (response.headers["ETag"], data, response.headers.get("X-Next-Cursor"))
+    return data
+
+def load_workouts(headers: dict) -> list:
+    """Workouts listados até agora: a primeira página e as pedidas em 'Carregar mais'"""
+    params = {"limit": WORKOUTS_PAGE_SIZE}
+    first_page = cached_get(headers, "/workouts/", params)
+    etag, _, cursor = st.session_state.etag_cache.get(_cache_key("/workouts/", params), (None, None, None))
+    listing = st.session_state.get("workout_listing")
+    if listing is None or listing["etag"] != etag:
+        # A primeira página mudou (upload ou remoção): recomeça a paginação
+        listing = {"etag": etag, "rows": [], "cursor": cursor}
+        st.session_state.workout_listing = listing
+    return first_page + listing["rows"]
+
+def load_more_workouts(headers: dict):
+    """Busca a próxima página seguindo o cursor (X-Next-Cursor) da anterior"""
+    listing = st.session_state.workout_listing
+    response = requests.get(
+        f"{BACKEND_URL}/workouts/",
+        headers=headers,
+        params={"limit": WORKOUTS_PAGE_SIZE, "cursor": listing["cursor"]}
+    )
+    response.raise_for_status()
+    listing["rows"].extend(response.json())
+    listing["cursor"] = response.headers.get("X-Next-Cursor")
+
+def fetch_dashboard(headers: dict, path: str, params: Optional[dict] = None) -> dict:
+    """Busca dados agregados do dashboard (sem ETag: o período padrão depende da data de hoje)"""
+    response = requests.get(f"{BACKEND_URL}{path}", headers=headers, params=params)
+    response.raise_for_status()
+    return response.json()
+
 # --- Páginas ---
 def login_register_page():
     """Página de login/registro"""
@@ -135,26 +187,33 @@ def main_app_page():
     st.header("Seus Workouts")
     try:
         headers = get_auth_header()
-        response = requests.get(f"{BACKEND_URL}/workouts/", headers=headers)
-        
-        if response.status_code == 200:
-            workouts = response.json()
-            if workouts:
-                st.dataframe(workouts)
-                
-                # Gráficos (exemplo simples)
-                if len(workouts) > 0:
-                    import pandas as pd
-                    import plotly.express as px
-                    
-                    df = pd.DataFrame(workouts)
-                    fig = px.bar(df, x="start_time", y="distance", 
-                                color="activity_type", title="Distância por Atividade")
-                    st.plotly_chart(fig)
-            else:
-                st.info("Nenhum workout encontrado. Faça upload de arquivos FIT.")
+        # A cada rerun o backend responde 304 se nada mudou desde a última listagem
+        workouts = load_workouts(headers)
+        if workouts:
+            st.caption(f"{len(workouts)} workouts mais recentes")
+            st.dataframe(workouts)
+            if st.session_state.workout_listing["cursor"] and st.button("Carregar mais"):
+                load_more_workouts(headers)
+                st.rerun()
+            
+            # Gráficos servidos pelos rollups do backend (sem agregar no cliente)
+            import plotly.express as px
+            
+            rollups = fetch_dashboard(headers, "/dashboard/rollups", {"period": "week"})["rollups"]
+            if rollups:
+                fig = px.bar(rollups, x="period_start", y="distance",
+                            color="activity_type", title="Distância por Semana")
+                st.plotly_chart(fig)
+            
+            series = fetch_dashboard(headers, "/dashboard/training-load")["series"]
+            if series:
+                fig = px.line(series, x="day", y=["ctl", "atl", "tsb"],
+                              title="Fitness (CTL), Fadiga (ATL) e Forma (TSB)")
+                st.plotly_chart(fig)
         else:
-            st.error(f"Erro ao buscar workouts: {response.json().get('detail', 'Erro desconhecido')}")
+            st.info("Nenhum workout encontrado. Faça upload de arquivos FIT.")
+    except requests.HTTPError as e:
+        st.error(f"Erro ao buscar workouts: {e.response.json().get('detail', 'Erro desconhecido')}")
     except Exception as e:
         st.error(f"Erro de conexão: {str(e)}")
 